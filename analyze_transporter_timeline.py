@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Analysoi kaikkien nostimien aikajanat vektoroidusti:
+- transporters_movement.csv: liikkeet, jotka alkavat ennen edellisen liikkeen loppua,
+  sekä liikkeet, joiden loppuaika on ennen alkuaikaa
+- ordered vs stretched: saman nostimen peräkkäisten tehtävien konfliktit, aikamuutokset
+  ja järjestysmuutokset (batch + stage -tunnisteella)
+
+Kaikki rikkeet tallennetaan koneluettavaan raporttiin logs/transporter_timeline_violations.csv.
+VALIDITY_CHECKS ovat aikataulun pätevyyden tarkistukset: pätevässä aikataulussa
+niitä ei ole yhtään (ordered-listan konfliktit ja järjestysmuutokset ovat
+venytystä edeltävää tietoa eivätkä rikkeitä).
+"""
+
+import os
+import pandas as pd
+import numpy as np
+from table_io import read_table, table_exists
+
+VIOLATION_COLUMNS = [
+    "Check", "Transporter", "Batch", "Stage", "Phase", "From_Station", "To_Station",
+    "Prev_End", "Start", "Gap", "Ordered_pos", "Stretched_pos", "Lift_shift", "Sink_shift"
+]
+
+# Tarkistukset, joita pätevässä aikataulussa ei saa olla
+VALIDITY_CHECKS = ["MOVEMENT_OVERLAP", "NEGATIVE_DURATION", "TASK_CONFLICT_STRETCHED", "MISSING_TASK"]
+
+def find_movement_overlaps(movement_df):
+    """
+    Etsii nostinkohtaisesti liikkeet, joiden Start_Time < minkä tahansa aiemman
+    liikkeen End_Time (järjestys Start_Time mukaan; Prev_End on aiempien liikkeiden
+    myöhäisin loppuaika, joten myös pitkän liikkeen sisään jäävät liikkeet löytyvät).
+    Palauttaa rikkeet DataFrameena.
+    """
+    df = movement_df.sort_values(["Transporter", "Start_Time"], kind="stable")
+    prev_end = df.groupby("Transporter", sort=False)["End_Time"].cummax().groupby(df["Transporter"]).shift()
+    mask = prev_end.notna() & (df["Start_Time"] < prev_end)
+    bad = df[mask]
+    return pd.DataFrame({
+        "Check": "MOVEMENT_OVERLAP",
+        "Transporter": bad["Transporter"],
+        "Batch": bad["Batch"] if "Batch" in bad.columns else np.nan,
+        "Phase": bad["Phase"] if "Phase" in bad.columns else np.nan,
+        "From_Station": bad["From_Station"] if "From_Station" in bad.columns else np.nan,
+        "To_Station": bad["To_Station"] if "To_Station" in bad.columns else np.nan,
+        "Prev_End": prev_end[mask],
+        "Start": bad["Start_Time"],
+        "Gap": bad["Start_Time"] - prev_end[mask],
+    })
+
+def find_negative_durations(movement_df):
+    """
+    Etsii liikkeet, joiden End_Time < Start_Time.
+    """
+    bad = movement_df[movement_df["End_Time"] < movement_df["Start_Time"]]
+    return pd.DataFrame({
+        "Check": "NEGATIVE_DURATION",
+        "Transporter": bad["Transporter"],
+        "Batch": bad["Batch"] if "Batch" in bad.columns else np.nan,
+        "Phase": bad["Phase"] if "Phase" in bad.columns else np.nan,
+        "From_Station": bad["From_Station"] if "From_Station" in bad.columns else np.nan,
+        "To_Station": bad["To_Station"] if "To_Station" in bad.columns else np.nan,
+        "Prev_End": bad["End_Time"],
+        "Start": bad["Start_Time"],
+        "Gap": bad["End_Time"] - bad["Start_Time"],
+    })
+
+def find_task_conflicts(tasks_df, check_name):
+    """
+    Etsii saman nostimen peräkkäiset tehtävät (listajärjestyksessä), joissa
+    seuraava nosto alkaa ennen edellisen laskun päättymistä.
+    """
+    prev_sink = tasks_df.groupby("Transporter_id", sort=False)["Sink_time"].shift()
+    mask = prev_sink.notna() & (tasks_df["Lift_time"] < prev_sink)
+    bad = tasks_df[mask]
+    return pd.DataFrame({
+        "Check": check_name,
+        "Transporter": bad["Transporter_id"],
+        "Batch": bad["Batch"],
+        "Stage": bad["Stage"],
+        "From_Station": bad["Lift_stat"],
+        "To_Station": bad["Sink_stat"],
+        "Prev_End": prev_sink[mask],
+        "Start": bad["Lift_time"],
+        "Gap": bad["Lift_time"] - prev_sink[mask],
+    })
+
+def compare_ordered_stretched(ordered_df, stretched_df):
+    """
+    Yhdistää ordered- ja stretched-listat (Transporter_id, Batch, Stage) -avaimella.
+    Palauttaa (vertailu, järjestysmuutokset): vertailussa aikasiirrot ja sijainnit.
+    """
+    keys = ["Transporter_id", "Batch", "Stage"]
+    o = ordered_df[keys + ["Lift_time", "Sink_time"]].copy()
+    s = stretched_df[keys + ["Lift_time", "Sink_time"]].copy()
+    o["Ordered_pos"] = o.groupby("Transporter_id", sort=False).cumcount()
+    s["Stretched_pos"] = s.groupby("Transporter_id", sort=False).cumcount()
+    merged = o.merge(s, on=keys, how="outer", suffixes=("_ordered", "_stretched"), indicator=True)
+    merged["Lift_shift"] = merged["Lift_time_stretched"] - merged["Lift_time_ordered"]
+    merged["Sink_shift"] = merged["Sink_time_stretched"] - merged["Sink_time_ordered"]
+    changed = merged[(merged["_merge"] != "both") | (merged["Ordered_pos"] != merged["Stretched_pos"])]
+    order_changes = pd.DataFrame({
+        "Check": np.where(changed["_merge"] == "both", "ORDER_CHANGE", "MISSING_TASK"),
+        "Transporter": changed["Transporter_id"],
+        "Batch": changed["Batch"],
+        "Stage": changed["Stage"],
+        "Ordered_pos": changed["Ordered_pos"],
+        "Stretched_pos": changed["Stretched_pos"],
+        "Lift_shift": changed["Lift_shift"],
+        "Sink_shift": changed["Sink_shift"],
+    })
+    return merged.drop(columns=["_merge"]), order_changes
+
+def load_ordered_tasks(logs_dir):
+    """
+    Lukee transporter_tasks_ordered.csv:n. Jos sitä ei ole kirjoitettu (vaihe 5 ilman debugia),
+    järjestys muodostetaan transporter_tasks_raw.csv:stä samalla funktiolla kuin vaiheessa 5.
+    """
+    ordered_file = os.path.join(logs_dir, "transporter_tasks_ordered.csv")
+    if table_exists(ordered_file):
+        return read_table(ordered_file)
+    raw_file = os.path.join(logs_dir, "transporter_tasks_raw.csv")
+    if table_exists(raw_file):
+        from order_tasks import order_tasks_df
+        return order_tasks_df(read_table(raw_file))
+    return None
+
+def find_timeline_violations(output_dir):
+    """
+    Tarkistaa kaikkien nostimien aikajanat kirjoittamatta mitään.
+
+    Returns:
+        tuple: (rikkeet (sarakkeet VIOLATION_COLUMNS), ordered vs stretched -vertailu tai None)
+    """
+    logs_dir = os.path.join(output_dir, "logs")
+    parts = []
+    merged = None
+
+    movement_file = os.path.join(logs_dir, "transporters_movement.csv")
+    if table_exists(movement_file):
+        movement_df = read_table(movement_file)
+        parts.append(find_movement_overlaps(movement_df))
+        parts.append(find_negative_durations(movement_df))
+    else:
+        print(f"Tiedostoa ei löydy: {movement_file}")
+
+    stretched_file = os.path.join(logs_dir, "transporter_tasks_stretched.csv")
+    stretched_df = read_table(stretched_file) if table_exists(stretched_file) else None
+    ordered_df = load_ordered_tasks(logs_dir)
+    if ordered_df is not None:
+        parts.append(find_task_conflicts(ordered_df, "TASK_CONFLICT_ORDERED"))
+    if stretched_df is not None:
+        parts.append(find_task_conflicts(stretched_df, "TASK_CONFLICT_STRETCHED"))
+    if ordered_df is not None and stretched_df is not None:
+        merged, order_changes = compare_ordered_stretched(ordered_df, stretched_df)
+        parts.append(order_changes)
+
+    parts = [p for p in parts if not p.empty]
+    violations = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    return violations.reindex(columns=VIOLATION_COLUMNS), merged
+
+def analyze_transporter_timeline(output_dir, report_file=None):
+    """
+    Tarkistaa kaikkien nostimien aikajanat ja kirjoittaa kaikki rikkeet raporttiin.
+
+    Args:
+        output_dir (str): Simulaatiokansion polku
+        report_file (str): Raportin polku (oletus logs/transporter_timeline_violations.csv)
+
+    Returns:
+        DataFrame: Kaikki rikkeet (sarakkeet VIOLATION_COLUMNS)
+    """
+    if report_file is None:
+        report_file = os.path.join(output_dir, "logs", "transporter_timeline_violations.csv")
+    violations, merged = find_timeline_violations(output_dir)
+    if merged is not None:
+        shifted = merged[(merged["Lift_shift"] != 0) & merged["Lift_shift"].notna()]
+        print(f"Siirrettyjä tehtäviä: {len(shifted)} / {len(merged)} (max siirto {merged['Lift_shift'].max():.0f} s)")
+    os.makedirs(os.path.dirname(report_file), exist_ok=True)
+    violations.to_csv(report_file, index=False)
+
+    print("=" * 80)
+    print("NOSTIMIEN AIKAJANA-ANALYYSI")
+    print("=" * 80)
+    if violations.empty:
+        print("Ei rikkeitä.")
+    else:
+        summary = violations.groupby(["Check", "Transporter"]).size().unstack(fill_value=0)
+        print(summary.to_string())
+    print(f"Raportti: {report_file}")
+    return violations
+
+if __name__ == "__main__":
+    import sys
+    import glob
+
+    # Hae viimeisin output-kansio jos ei annettu
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if len(sys.argv) > 1:
+        output_dir = sys.argv[1]
+    else:
+        output_base = os.path.join(script_dir, "output")
+        subdirs = [d for d in glob.glob(os.path.join(output_base, "*")) if os.path.isdir(d)]
+        if subdirs:
+            output_dir = max(subdirs, key=os.path.getmtime)
+        else:
+            print("Ei output-kansiota löytynyt!")
+            sys.exit(1)
+
+    analyze_transporter_timeline(output_dir)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Import-ajan budjettitarkistus
+
+Mittaa jokaisen moduulin importin omassa Python-prosessissaan ja
+tarkistaa, että
+- import mahtuu moduulin aikabudjettiin
+- raskaita kirjastoja (pandas, matplotlib, pulp) ei ladata moduuleissa,
+  joiden ei pidä niitä tarvita ennen kuin työ todella alkaa
+
+Lisäksi mitataan pikakomentojen (main.py --help / --dry-run) kokonaisaika.
+
+Käyttö:
+    python benchmark_import_time.py            # tulostaa taulukon, paluukoodi 1 jos budjetti ylittyy
+    python benchmark_import_time.py --scale 2  # löysemmät budjetit hitaalle koneelle
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Moduuli -> (aikabudjetti sekunteina, kielletyt raskaat kirjastot)
+IMPORT_BUDGETS = {
+    "main": (0.3, ("pandas", "numpy", "matplotlib", "pulp")),
+    "pipeline_steps": (0.3, ("pandas", "numpy", "matplotlib", "pulp")),
+    "pipeline_dag": (0.3, ("pandas", "numpy", "matplotlib", "pulp")),
+    "table_io": (0.1, ("pandas", "numpy", "matplotlib", "pulp")),
+    "test_step1": (0.1, ("pandas", "numpy", "matplotlib", "pulp")),
+    "test_step4": (1.0, ("matplotlib", "pulp")),
+    "test_step6": (1.0, ("matplotlib", "pulp")),
+    "test_step7": (1.0, ("matplotlib", "pulp")),
+    "visualize_original_matrix": (1.0, ("matplotlib",)),
+    "visualize_stretched_matrix": (1.0, ("matplotlib",)),
+    "optimize_makespan": (1.0, ("pulp",)),
+}
+
+# Pikakomennot -> aikabudjetti sekunteina (koko prosessi)
+COMMAND_BUDGETS = {
+    "main.py --help": 1.0,
+    "main.py --dry-run": 1.0,
+}
+
+def measure_import(module):
+    """
+    Importtaa moduulin uudessa prosessissa.
+
+    Returns:
+        tuple: (import-aika sekunteina, ladatut kielletyt kirjastot)
+    """
+    code = (
+        "import sys, time; t = time.perf_counter(); "
+        f"import {module}; "
+        "d = time.perf_counter() - t; "
+        "print(d, ','.join(sorted(m for m in ('pandas', 'numpy', 'matplotlib', 'pulp') if m in sys.modules)), sep='|')"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Import epäonnistui: {module}\n{result.stderr}")
+    elapsed, loaded = result.stdout.strip().splitlines()[-1].split("|")
+    return float(elapsed), [m for m in loaded.split(",") if m]
+
+def measure_command(command):
+    """Ajaa komennon (python <args>) ja palauttaa kokonaisajan sekunteina"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + command.split(), cwd=PROJECT_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Komento epäonnistui: {command}\n{result.stderr}")
+    return elapsed
+
+def check_import_budgets(scale=1.0, budgets=None, commands=None):
+    """
+    Mittaa importit ja pikakomennot ja vertaa budjetteihin.
+
+    Args:
+        scale (float): Budjettien kerroin (esim. 2.0 hitaalle CI-koneelle)
+
+    Returns:
+        list: Rivit (kohde, aika, budjetti, ladatut kielletyt kirjastot, ok)
+    """
+    budgets = IMPORT_BUDGETS if budgets is None else budgets
+    commands = COMMAND_BUDGETS if commands is None else commands
+    rows = []
+    for module, (budget, forbidden) in budgets.items():
+        elapsed, loaded = measure_import(module)
+        bad = [m for m in loaded if m in forbidden]
+        rows.append((f"import {module}", elapsed, budget * scale, bad, elapsed <= budget * scale and not bad))
+    for command, budget in commands.items():
+        elapsed = measure_command(command)
+        rows.append((command, elapsed, budget * scale, [], elapsed <= budget * scale))
+    return rows
+
+def print_report(rows):
+    print(f"{'Kohde':<40} {'Aika (s)':>9} {'Budjetti':>9}  Tila")
+    for target, elapsed, budget, bad, ok in rows:
+        status = "OK" if ok else "YLITYS"
+        if bad:
+            status += f" (ladattu: {', '.join(bad)})"
+        print(f"{target:<40} {elapsed:>9.3f} {budget:>9.3f}  {status}")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Import-ajan budjettitarkistus")
+    parser.add_argument("--scale", type=float, default=1.0, help="Budjettien kerroin")
+    args = parser.parse_args()
+    rows = check_import_budgets(scale=args.scale)
+    print_report(rows)
+    sys.exit(0 if all(row[-1] for row in rows) else 1)
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Vaihekohtainen suorituskykytesti kasvavilla synteettisillä instansseilla
+
+Generoi jokaiselle erämäärälle synteettisen linjan (generate_synthetic_input)
+ja ajaa putken vaiheet 2-7 omassa Python-prosessissaan, jonka työkansiona
+on instanssin kansio (vaiheet lukevat osan lähtötiedoista suhteellisilla
+poluilla). Vaiheiden ja kuumien osioiden (conflict_check, task_generation,
+ordering, resolve_station_conflicts, stretching, movement_expansion,
+render_page) aika ja muisti saadaan ajon aikaväleistä (perf_spans).
+
+Tulokset:
+    <bench_dir>/benchmark_results.csv    kaikki ajot (run_id erottaa ajot)
+    <bench_dir>/benchmark_scaling.png    skaalautumiskäyrät (erät vs. sekunnit, log-log)
+
+Regressiot tarkistetaan kahdella tavalla:
+- vertailuajo (--baseline tai tulostiedoston edellinen ajo samalla linjalla):
+  vaihe on hidastunut yli config.BENCHMARK_REGRESSION_RATIO-kertoimen ja
+  yli config.BENCHMARK_MIN_SECONDS sekuntia
+- skaalautuminen: aika ~ erät^k, k sovitetaan log-log-suoralla; k ei saa
+  ylittää config.BENCHMARK_MAX_EXPONENT-rajaa
+Muistina kirjataan prosessin RSS-huippu vaiheen lopussa; --trace-memory
+mittaa lisäksi vaihekohtaisen Python-varausten huipun (hidastaa ajoa).
+
+Käyttö:
+    python benchmark_pipeline.py                          # config.BENCHMARK_SIZES
+    python benchmark_pipeline.py --sizes 5 10 20 --skip visualization
+    python benchmark_pipeline.py --stations 120 --transporters 6 --repeat 3
+    python benchmark_pipeline.py --with-imports           # myös import-aikabudjetit
+Paluukoodi on 1, jos regressioita löytyy.
+"""
+
+import csv
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BENCH_DIR = os.path.join("output", "benchmarks")
+RESULTS_FILE_NAME = "benchmark_results.csv"
+PLOT_FILE_NAME = "benchmark_scaling.png"
+INSTANCE_RESULT_NAME = "instance_result.json"
+RESULT_COLUMNS = ["run_id", "batches", "stations", "transporters", "seed", "stage", "kind", "calls",
+                  "wall_s", "cpu_s", "rss_peak_mb", "py_peak_mb"]
+
+def run_instance(only=None, skip=None, trace_memory=False):
+    """
+    Ajaa putken nykyisen työkansion initialization-kansiosta ja kirjoittaa
+    vaiheiden ja osioiden mittaukset tiedostoon instance_result.json.
+    Kutsutaan benchmark-aliprosessissa (ks. measure_instance).
+    """
+    from create_simulation_directory import create_simulation_directory
+    from pipeline_context import PipelineContext
+    from pipeline_steps import PIPELINE_STEPS, run_pipeline
+    from pipeline_dag import select_steps
+    from simulation_logger import init_logger
+    from perf_spans import PerfRecorder
+
+    perf = PerfRecorder(None, trace_memory=trace_memory)
+    start = time.perf_counter()
+    output_dir = create_simulation_directory(input_mode="copy")
+    setup_wall = time.perf_counter() - start
+    perf.output_dir = output_dir
+    logger = init_logger(output_dir)
+    ctx = PipelineContext(output_dir, logger=logger, perf=perf).load_inputs()
+    run_pipeline(output_dir, ctx, steps=select_steps(PIPELINE_STEPS, only=only, skip=skip), cache=None, jobs=1)
+    logger.close()
+
+    # Yhdistä saman nimiset aikavälit (esim. sivukohtaiset render_page-välit)
+    stages = {"setup": {"stage": "setup", "kind": "step", "calls": 1, "wall_s": setup_wall, "cpu_s": None,
+                        "rss_peak_mb": None, "py_peak_mb": None}}
+    for record in perf.records:
+        kind = "step" if record["cat"] == "step" else "section"
+        stage = stages.setdefault(record["name"], {"stage": record["name"], "kind": kind, "calls": 0,
+                                                   "wall_s": 0.0, "cpu_s": 0.0,
+                                                   "rss_peak_mb": None, "py_peak_mb": None})
+        stage["calls"] += 1
+        stage["wall_s"] += record["wall_s"]
+        stage["cpu_s"] += record["cpu_s"]
+        for key in ("rss_peak_mb", "py_peak_mb"):
+            if record[key] is not None:
+                stage[key] = max(stage[key] or 0.0, record[key])
+    with open(INSTANCE_RESULT_NAME, "w", encoding="utf-8") as f:
+        json.dump({"output_dir": output_dir, "stages": list(stages.values())}, f)
+
+def measure_instance(instance_dir, only=None, skip=None, trace_memory=False):
+    """
+    Ajaa run_instance-funktion uudessa prosessissa instanssin kansiossa.
+
+    Returns:
+        list: Vaiheiden ja osioiden mittaukset (sanakirjat)
+    """
+    code = (
+        f"import sys; sys.path.insert(0, {PROJECT_DIR!r}); "
+        "from benchmark_pipeline import run_instance; "
+        f"run_instance({only!r}, {skip!r}, {trace_memory!r})"
+    )
+    log_file = os.path.join(instance_dir, "run.log")
+    with open(log_file, "w", encoding="utf-8") as log:
+        result = subprocess.run([sys.executable, "-c", code], cwd=instance_dir, stdout=log, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark-ajo epäonnistui kansiossa {instance_dir} (ks. {log_file})")
+    with open(os.path.join(instance_dir, INSTANCE_RESULT_NAME), encoding="utf-8") as f:
+        return json.load(f)["stages"]
+
+def run_benchmark(sizes=None, bench_dir=DEFAULT_BENCH_DIR, only=None, skip=None, trace_memory=False, repeat=1,
+                  keep_runs=False, **line_params):
+    """
+    Ajaa putken jokaisella erämäärällä ja lisää tulokset tiedostoon benchmark_results.csv.
+
+    Args:
+        sizes (list): Erämäärät (oletus config.BENCHMARK_SIZES)
+        bench_dir (str): Tuloskansio (instanssit kansiossa <bench_dir>/instances)
+        only, skip (list): Vaiheiden rajaus (ks. pipeline_dag.select_steps)
+        trace_memory (bool): Mittaa vaihekohtainen Python-varausten huippu (tracemalloc)
+        repeat (int): Toistot; jokaisesta vaiheesta tallennetaan nopein
+        keep_runs (bool): Säilytä instanssien simulaatiokansiot
+        line_params: generate_synthetic_tables-parametrit (seed, stations, transporters, ...)
+
+    Returns:
+        tuple: (run_id, tulosrivit)
+    """
+    import config
+    from generate_synthetic_input import generate_synthetic_input
+    sizes = sorted(sizes or getattr(config, "BENCHMARK_SIZES", [10, 20, 40, 80]))
+    run_id = time.strftime("%Y-%m-%d_%H-%M-%S")
+    line_params.setdefault("seed", 0)
+    rows = []
+    for batches in sizes:
+        instance_dir = os.path.join(bench_dir, "instances", f"batches_{batches}")
+        shutil.rmtree(instance_dir, ignore_errors=True)
+        tables = generate_synthetic_input(os.path.join(instance_dir, "initialization"), batches=batches, **line_params)
+        best = {}
+        for _ in range(max(1, repeat)):
+            for stage in measure_instance(instance_dir, only=only, skip=skip, trace_memory=trace_memory):
+                if stage["stage"] not in best or stage["wall_s"] < best[stage["stage"]]["wall_s"]:
+                    best[stage["stage"]] = stage
+            if not keep_runs:
+                shutil.rmtree(os.path.join(instance_dir, "output"), ignore_errors=True)
+        total = sum(stage["wall_s"] for stage in best.values() if stage["kind"] == "step")
+        print(f"⏱️  {batches:>5} erää: vaiheet yhteensä {total:.2f} s")
+        for stage in best.values():
+            rows.append(dict(stage, run_id=run_id, batches=batches, stations=len(tables["stations"]),
+                             transporters=len(tables["transporters"]), seed=line_params["seed"]))
+    append_results(os.path.join(bench_dir, RESULTS_FILE_NAME), rows)
+    return run_id, rows
+
+def append_results(path, rows):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    write_header = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        for row in rows:
+            writer.writerow({key: (f"{value:.6f}" if isinstance(value, float) else value)
+                             for key, value in row.items()})
+
+def read_results(path):
+    """Tulostiedoston rivit; numeeriset kentät muunnettuina (tyhjä -> None)"""
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            for key in ("batches", "stations", "transporters", "seed", "calls"):
+                row[key] = int(row[key])
+            for key in ("wall_s", "cpu_s", "rss_peak_mb", "py_peak_mb"):
+                row[key] = float(row[key]) if row[key] else None
+            rows.append(row)
+    return rows
+
+def baseline_rows(results, run_id, rows):
+    """Tulostiedoston viimeisin aiempi ajo samalla linjalla (asemat, nostimet, siemen)"""
+    line = {(row["stations"], row["transporters"], row["seed"]) for row in rows}
+    earlier = [row for row in results if row["run_id"] != run_id and row["run_id"] < run_id
+               and (row["stations"], row["transporters"], row["seed"]) in line]
+    if not earlier:
+        return []
+    latest = max(row["run_id"] for row in earlier)
+    return [row for row in earlier if row["run_id"] == latest]
+
+def scaling_exponents(rows):
+    """Vaiheittain k mallissa aika ~ erät^k (pienimmän neliösumman suora log-log-asteikolla)"""
+    series = {}
+    for row in rows:
+        if row["wall_s"] and row["wall_s"] > 0:
+            series.setdefault(row["stage"], []).append((math.log(row["batches"]), math.log(row["wall_s"])))
+    exponents = {}
+    for stage, points in series.items():
+        if len({x for x, _ in points}) < 2:
+            continue
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        sxx = sum((x - mean_x) ** 2 for x, _ in points)
+        exponents[stage] = sum((x - mean_x) * (y - mean_y) for x, y in points) / sxx
+    return exponents
+
+def check_regressions(rows, baseline=None, ratio=None, min_seconds=None, max_exponent=None):
+    """
+    Vertaa ajoa vertailuajoon ja skaalautumisrajoihin.
+
+    Returns:
+        list: Regressioiden kuvaukset (tyhjä = ei regressioita)
+    """
+    import config
+    ratio = ratio if ratio is not None else getattr(config, "BENCHMARK_REGRESSION_RATIO", 1.25)
+    min_seconds = min_seconds if min_seconds is not None else getattr(config, "BENCHMARK_MIN_SECONDS", 0.5)
+    max_exponent = max_exponent if max_exponent is not None else getattr(config, "BENCHMARK_MAX_EXPONENT", {})
+    problems = []
+    previous = {(row["batches"], row["stage"]): row["wall_s"] for row in (baseline or [])}
+    for row in rows:
+        before = previous.get((row["batches"], row["stage"]))
+        if before is None or row["wall_s"] is None:
+            continue
+        if row["wall_s"] > before * ratio and row["wall_s"] - before > min_seconds:
+            problems.append(f"{row['stage']} ({row['batches']} erää): {before:.2f} s -> {row['wall_s']:.2f} s "
+                            f"(x{row['wall_s'] / before:.2f}, raja x{ratio:.2f})")
+    # Skaalautuminen arvioidaan vain vaiheille, jotka ovat suurimmalla koolla mitattavan pitkiä
+    largest = {}
+    for row in rows:
+        if row["wall_s"] is not None and row["batches"] >= largest.get(row["stage"], (0, 0.0))[0]:
+            largest[row["stage"]] = (row["batches"], row["wall_s"])
+    for stage, k in sorted(scaling_exponents(rows).items()):
+        limit = max_exponent.get(stage, max_exponent.get("default"))
+        if limit is not None and k > limit and largest[stage][1] >= min_seconds:
+            problems.append(f"{stage}: skaalautumiseksponentti {k:.2f} ylittää rajan {limit:.2f}")
+    return problems
+
+def plot_scaling(rows, path):
+    """Skaalautumiskäyrät: erät vs. sekunnit vaiheittain (vaiheet yhtenäisinä, osiot katkoviivoina)"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker
+    exponents = scaling_exponents(rows)
+    fig, ax = plt.subplots(figsize=(11, 7))
+    stages = {}
+    for row in rows:
+        if row["wall_s"]:
+            stages.setdefault((row["kind"], row["stage"]), []).append((row["batches"], row["wall_s"]))
+    for (kind, stage), points in sorted(stages.items()):
+        points.sort()
+        label = f"{stage} (k={exponents[stage]:.2f})" if stage in exponents else stage
+        ax.plot([p[0] for p in points], [p[1] for p in points], "-o" if kind == "step" else "--x",
+                label=label, linewidth=1.5 if kind == "step" else 1.0, markersize=4)
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    sizes = sorted({row["batches"] for row in rows})
+    ax.set_xticks(sizes)
+    ax.set_xticklabels([str(n) for n in sizes])
+    ax.xaxis.set_minor_formatter(matplotlib.ticker.NullFormatter())
+    ax.set_xlabel("Erät")
+    ax.set_ylabel("Aika (s)")
+    ax.set_title("Putken vaiheiden skaalautuminen (aika ~ erät^k)")
+    ax.grid(True, which="both", alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+    return path
+
+def print_report(rows, exponents):
+    sizes = sorted({row["batches"] for row in rows})
+    table = {}
+    for row in rows:
+        table.setdefault((row["kind"], row["stage"]), {})[row["batches"]] = row
+    print(f"{'Vaihe / osio':<28}" + "".join(f"{n:>10}" for n in sizes) + f"{'k':>7}{'RSS MB':>9}")
+    for (kind, stage), by_size in sorted(table.items()):
+        name = stage if kind == "step" else f"  {stage}"
+        times = "".join(f"{by_size[n]['wall_s']:>10.3f}" if n in by_size else f"{'-':>10}" for n in sizes)
+        k = f"{exponents[stage]:>7.2f}" if stage in exponents else f"{'-':>7}"
+        rss = by_size[sizes[-1]]["rss_peak_mb"] if sizes[-1] in by_size else None
+        rss = f"{rss:>9.0f}" if rss is not None else f"{'-':>9}"
+        print(f"{name:<28}{times}{k}{rss}")
+
+if __name__ == "__main__":
+    import argparse
+
+    def int_range(text):
+        parts = [int(p) for p in text.split("-")]
+        return (parts[0], parts[-1])
+
+    parser = argparse.ArgumentParser(description="Vaihekohtainen suorituskykytesti synteettisillä instansseilla")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None, help="Erämäärät (oletus config.BENCHMARK_SIZES)")
+    parser.add_argument("--bench-dir", default=DEFAULT_BENCH_DIR, help="Tuloskansio")
+    parser.add_argument("--only", action="append", default=[], help="Ajettavat vaiheet tai ryhmät")
+    parser.add_argument("--skip", action="append", default=[], help="Ohitettavat vaiheet tai ryhmät")
+    parser.add_argument("--repeat", type=int, default=1, help="Toistot (nopein tallennetaan)")
+    parser.add_argument("--trace-memory", action="store_true", help="Vaihekohtainen Python-varausten huippu")
+    parser.add_argument("--keep-runs", action="store_true", help="Säilytä instanssien simulaatiokansiot")
+    parser.add_argument("--baseline", default=None, help="Vertailutulokset (oletus: tulostiedoston edellinen ajo)")
+    parser.add_argument("--ratio", type=float, default=None, help="Sallittu hidastumiskerroin")
+    parser.add_argument("--min-seconds", type=float, default=None, help="Pienin regressioksi tulkittava ero")
+    parser.add_argument("--max-exponent", type=float, default=None, help="Suurin sallittu skaalautumiseksponentti")
+    parser.add_argument("--with-imports", action="store_true", help="Tarkista myös import-aikabudjetit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stations", type=int, default=42)
+    parser.add_argument("--transporters", type=int, default=3)
+    parser.add_argument("--programs", type=int, default=2)
+    parser.add_argument("--program-stages", type=int_range, default=(8, 30), metavar="MIN-MAX")
+    parser.add_argument("--parallel", type=int_range, default=(1, 3), metavar="MIN-MAX")
+    parser.add_argument("--start-interval", default="900", help="Erien aloitusväli (s tai HH:MM:SS)")
+    args = parser.parse_args()
+
+    run_id, rows = run_benchmark(
+        args.sizes, bench_dir=args.bench_dir, only=args.only, skip=args.skip, trace_memory=args.trace_memory,
+        repeat=args.repeat, keep_runs=args.keep_runs, seed=args.seed, stations=args.stations,
+        transporters=args.transporters, programs=args.programs, program_stages=args.program_stages,
+        parallel=args.parallel, start_interval=args.start_interval,
+    )
+    results_file = os.path.join(args.bench_dir, RESULTS_FILE_NAME)
+    rows = [row for row in read_results(results_file) if row["run_id"] == run_id]
+    if args.baseline:
+        previous = read_results(args.baseline)
+        baseline = [row for row in previous if row["run_id"] == max(r["run_id"] for r in previous)] if previous else []
+    else:
+        baseline = baseline_rows(read_results(results_file), run_id, rows)
+    print_report(rows, scaling_exponents(rows))
+    plot_file = plot_scaling(rows, os.path.join(args.bench_dir, PLOT_FILE_NAME))
+    print(f"📈 Tulokset: {results_file}  Käyrät: {plot_file}")
+
+    problems = check_regressions(rows, baseline, ratio=args.ratio, min_seconds=args.min_seconds,
+                                 max_exponent={"default": args.max_exponent} if args.max_exponent is not None else None)
+    if args.with_imports:
+        from benchmark_import_time import check_import_budgets, print_report as print_import_report
+        import_rows = check_import_budgets()
+        print_import_report(import_rows)
+        problems += [f"{target}: {elapsed:.3f} s (budjetti {budget:.3f} s)"
+                     for target, elapsed, budget, bad, ok in import_rows if not ok]
+    if not baseline and not args.baseline:
+        print("ℹ️  Ei aiempaa ajoa vertailuksi - tämä ajo toimii seuraavan vertailukohtana")
+    if problems:
+        print("❌ Regressiot:")
+        for problem in problems:
+            print(f"   {problem}")
+        sys.exit(1)
+    print("✅ Ei regressioita")
@@ -8,23 +8,29 @@ Kirjaa havaittuja pullonkauloja simuloinnin aikana, erityisesti:
 - Aikataulusiirrot
 
 Tallentaa tiedot CSV-muodossa analysis-kansioon.
+
+Loggeri on ajokohtainen (PipelineContext.bottlenecks). Moduulin funktiot
+käyttävät nykyiseen säikeeseen sidotun ajon loggeria (PipelineContext.activate)
+ja vasta sen puuttuessa globaalia instanssia.
 """
 
 import pandas as pd
 import os
 from datetime import datetime
-from simulation_logger import get_logger
+from simulation_logger import get_logger, current_run
 
 class BottleneckLogger:
-    def __init__(self, output_dir):
+    def __init__(self, output_dir, logger=None):
+        """output_dir=None: pullonkaulat kerätään vain muistiin (save_bottlenecks ei tallenna)"""
         self.output_dir = output_dir
-        self.analysis_dir = os.path.join(output_dir, "Analysis")
-        os.makedirs(self.analysis_dir, exist_ok=True)
+        self.analysis_dir = os.path.join(output_dir, "Analysis") if output_dir else None
+        if self.analysis_dir:
+            os.makedirs(self.analysis_dir, exist_ok=True)
         
         # Pullonkaulojen lista
         self.bottlenecks = []
         
-        self.logger = get_logger()
+        self.logger = logger if logger is not None else get_logger()
         if self.logger:
             self.logger.log("STEP", "BOTTLENECK LOGGER INITIALIZED")
     
@@ -176,6 +182,8 @@ class BottleneckLogger:
             if self.logger:
                 self.logger.log("INFO", "No bottlenecks detected - simulation runs smoothly")
             return
+        if self.analysis_dir is None:
+            return
         
         # Luo DataFrame
         df = pd.DataFrame(self.bottlenecks)
@@ -231,17 +239,22 @@ _bottleneck_logger = None
 
 def init_bottleneck_logger(output_dir):
     """
-    Alustaa pullonkaula-loggerin
+    Alustaa pullonkaula-loggerin (sidotussa ajossa palauttaa ajon oman loggerin)
     """
     global _bottleneck_logger
+    run = current_run()
+    if run is not None:
+        return run.bottlenecks
     _bottleneck_logger = BottleneckLogger(output_dir)
     return _bottleneck_logger
 
 def get_bottleneck_logger():
     """
-    Palauttaa pullonkaula-loggerin instanssin
+    Palauttaa pullonkaula-loggerin instanssin (sidotun ajon loggeri tai globaali)
     """
-    global _bottleneck_logger
+    run = current_run()
+    if run is not None:
+        return run.bottlenecks
     return _bottleneck_logger
 
 def log_station_conflict(station, batch1, batch2, conflict_time, resolution_action, time_shift=0):
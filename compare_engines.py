@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Differentiaalinen vastaavuustesti: vanha ja uusi toteutus samoilla syötteillä
+
+Nopeampi toteutus (esim. generate_matrix_original, stretch_tasks,
+extract_transporter_tasks) saa ottaa tuotantoajot hoitaakseen vasta, kun se
+tuottaa saman aikataulun kuin nykyinen tai dokumentoidusti paremman.
+Testi ajaa molemmat koodipuut (main.py) samoilla lähtötiedoilla ja vertaa
+jokaisen tulos-CSV:n solu solulta toleranssein.
+
+Koodipuu annetaan git-viitteenä (puretaan git archivella väliaikaiskansioon)
+tai kansiona. Oletuksena vanha = HEAD ja uusi = työkopio.
+Syötteet: toimitettu initialization-kansio ja synteettiset linjat
+(generate_synthetic_input) annetuilla siemenillä.
+
+Rivit kohdistetaan avainsarakkeilla (Transporter, Batch, Stage, ...) ja
+järjestysnumerolla avaimen sisällä; eräkohtaisten ohjelmatiedostojen erä
+luetaan tiedostonimestä. Numeeriset solut ja HH:MM:SS-ajat verrataan
+toleranssilla abs_tol + rel_tol * |vanha| (config.EQUIVALENCE_ABS_TOL,
+config.EQUIVALENCE_REL_TOL), muut solut tarkasti.
+
+Tulokset kansiossa <out_dir>:
+    differences.csv   jokainen eroava solu (tapaus, tiedosto, avain, erä, asema, sarake, arvot, ero)
+    summary.csv       erot tiedostoittain, erittäin ja asemittain
+Tuomio tapausta kohden: EQUIVALENT (ei eroja), BETTER tai DIFFERENT.
+Vain toisen ajon tuottama tiedosto on aina ero, ellei se ole sallittujen
+listalla (ALLOWED_MISSING_OUTPUTS, vaiheen 5 debug-välitiedostot). BETTER
+edellyttää, että tiedostot vastaavat toisiaan, venytetyn matriisin makespan
+on lyhyempi, erien ja nostintehtävien määrät ovat samat ja uusi aikataulu
+läpäisee analyze_transporter_timeline-tarkistukset (VALIDITY_CHECKS) ilman
+yhtään rikettä. Paluukoodi on 0 vain, kun kaikki tapaukset ovat EQUIVALENT
+(--accept-better: myös BETTER).
+
+Käyttö:
+    python compare_engines.py                                  # HEAD vs. työkopio
+    python compare_engines.py --legacy df2f0c0 --seeds 0 1 2 --batches 20
+    python compare_engines.py --legacy ../vanha --new . --no-bundled --stations 80
+"""
+
+import csv
+import fnmatch
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUT_DIR = os.path.join("output", "equivalence")
+DIFFERENCES_FILE_NAME = "differences.csv"
+SUMMARY_FILE_NAME = "summary.csv"
+
+# Tulokset, joita ei verrata (aikaleimat, mittaukset ja tarkistuspisteet)
+IGNORED_OUTPUTS = [
+    "logs/simulation_log.csv",
+    "logs/perf.csv",
+    "checkpoints/*",
+    "reports/profile_hotspots.csv",
+]
+
+# Tulokset, jotka saavat puuttua toisesta ajosta (vaiheen 5 debug-välitiedostot)
+ALLOWED_MISSING_OUTPUTS = ["logs/transporter_tasks_ordered.csv", "logs/transporter_tasks_resolved.csv"]
+
+# Tulokset, jotka molempien ajojen on tuotettava (muuten ajo on epäonnistunut)
+REQUIRED_OUTPUTS = ["logs/line_matrix_original.csv", "logs/line_matrix_stretched.csv"]
+
+# Vanhemmat koodipuut käyttävät kansioita isolla alkukirjaimella (Windowsissa
+# kirjainkoolla ei ole väliä); simulaatiokansioon lisätään niille linkit
+CASE_ALIASES = [("Initialization", "initialization"), ("Logs", "logs"), ("Reports", "reports")]
+
+# main.py:n käynnistys: create_simulation_directory lisää CASE_ALIASES-linkit
+LAUNCHER = '''
+import os, runpy, sys
+tree = sys.argv[1]
+sys.path.insert(0, tree)
+import create_simulation_directory as csd
+_create = csd.create_simulation_directory
+def create_with_aliases(*args, **kwargs):
+    path = _create(*args, **kwargs)
+    for alias, target in {aliases!r}:
+        if not os.path.exists(os.path.join(path, alias)):
+            os.symlink(target, os.path.join(path, alias))
+    return path
+csd.create_simulation_directory = create_with_aliases
+sys.argv = [os.path.join(tree, "main.py")]
+runpy.run_path(sys.argv[0], run_name="__main__")
+'''
+
+# Rivien kohdistuksen avainsarakkeet (käytetään ne, jotka taulukossa on)
+KEY_COLUMNS = ["Transporter", "Transporter_id", "Batch", "Stage", "Phase", "time_slice_start"]
+
+# Asemasarakkeet, joista erän rivi kohdistetaan asemaan yhteenvedossa (ensimmäinen löytyvä)
+STATION_COLUMNS = ["Station", "Lift_stat", "Lift_Stat", "From_Station", "Start_station", "Number"]
+
+DIFF_COLUMNS = ["case", "file", "key", "batch", "station", "column", "legacy", "new", "delta"]
+SUMMARY_COLUMNS = ["case", "scope", "name", "differences", "max_abs_delta"]
+
+HMS_PATTERN = re.compile(r"^\d+:\d{2}:\d{2}(\.\d+)?$")
+BATCH_FILE_PATTERN = re.compile(r"Batch_(\d+)_")
+
+def prepare_tree(spec, dest):
+    """
+    Koodipuu kansioksi: olemassa oleva kansio sellaisenaan, muuten git-viite
+    purettuna kansioon dest.
+
+    Returns:
+        tuple: (kansio, kuvaus)
+    """
+    if os.path.isdir(spec):
+        return os.path.abspath(spec), os.path.abspath(spec)
+    archive = subprocess.run(["git", "-C", PROJECT_DIR, "archive", "--format=tar", spec],
+                             capture_output=True)
+    if archive.returncode != 0:
+        raise ValueError(f"Koodipuuta ei löydy kansiona eikä git-viitteenä: {spec}\n"
+                         f"{archive.stderr.decode(errors='replace')}")
+    commit = subprocess.run(["git", "-C", PROJECT_DIR, "rev-parse", "--short", spec],
+                            capture_output=True, text=True).stdout.strip()
+    shutil.rmtree(dest, ignore_errors=True)
+    os.makedirs(dest)
+    with tarfile.open(fileobj=io.BytesIO(archive.stdout)) as tar:
+        if hasattr(tarfile, "data_filter"):
+            tar.extractall(dest, filter="data")
+        else:
+            tar.extractall(dest)
+    return os.path.abspath(dest), f"{spec} ({commit})"
+
+def run_tree(tree_dir, work_dir, init_source):
+    """
+    Ajaa koodipuun main.py:n kansiossa work_dir lähtötiedoilla init_source
+    (simulaatiokansioon lisätään CASE_ALIASES-linkit).
+
+    Returns:
+        str: Ajon simulaatiokansio
+    """
+    shutil.rmtree(work_dir, ignore_errors=True)
+    shutil.copytree(init_source, os.path.join(work_dir, "initialization"))
+    env = dict(os.environ, SIM_OUTPUT_FORMAT="csv", PYTHONDONTWRITEBYTECODE="1")
+    log_file = os.path.join(work_dir, "run.log")
+    with open(log_file, "w", encoding="utf-8") as log:
+        result = subprocess.run([sys.executable, "-c", LAUNCHER.format(aliases=CASE_ALIASES), tree_dir],
+                                cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    runs = sorted(d for d in os.listdir(os.path.join(work_dir, "output")) if not d.startswith(".")) \
+        if os.path.isdir(os.path.join(work_dir, "output")) else []
+    output_dir = os.path.join(work_dir, "output", runs[-1]) if runs else None
+    missing = [rel for rel in REQUIRED_OUTPUTS if output_dir is None or not os.path.exists(os.path.join(output_dir, rel))]
+    if result.returncode != 0 or missing:
+        raise RuntimeError(f"Ajo epäonnistui ({tree_dir}): puuttuu {', '.join(missing) or '-'} (ks. {log_file})")
+    return output_dir
+
+def output_files(output_dir):
+    """Simulaatiokansion vertailtavat CSV-tiedostot suhteellisina poluina (/-erotin)"""
+    files = set()
+    for dirpath, _, filenames in os.walk(output_dir):
+        for fname in filenames:
+            if fname.endswith(".csv"):
+                rel = os.path.relpath(os.path.join(dirpath, fname), output_dir).replace(os.sep, "/")
+                if not any(fnmatch.fnmatch(rel, pattern) for pattern in IGNORED_OUTPUTS):
+                    files.add(rel)
+    return files
+
+def _to_number(value):
+    """Solun arvo lukuna (luku tai HH:MM:SS) tai None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return None if value != value else float(value)
+    text = str(value).strip()
+    if HMS_PATTERN.match(text):
+        h, m, s = text.split(":")
+        return int(h) * 3600 + int(m) * 60 + float(s)
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def _keyed_rows(df, keys):
+    """{(avainarvot..., järjestysnumero): rivi} - saman avaimen rivit järjestyksessä"""
+    rows = {}
+    seen = {}
+    for record in df.to_dict("records"):
+        base = tuple(record[k] for k in keys)
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        rows[base + (n,)] = record
+    return rows
+
+def compare_table(legacy_path, new_path, rel, abs_tol, rel_tol):
+    """
+    Vertaa kahta CSV-taulukkoa.
+
+    Returns:
+        list: Erot sanakirjoina (DIFF_COLUMNS ilman case-kenttää)
+    """
+    import pandas as pd
+    legacy_df = pd.read_csv(legacy_path)
+    new_df = pd.read_csv(new_path)
+    file_batch = BATCH_FILE_PATTERN.search(os.path.basename(rel))
+    file_batch = int(file_batch.group(1)) if file_batch else None
+    differences = []
+
+    def add(key, record, column, legacy_value, new_value, delta=None):
+        record = record or {}
+        batch = record.get("Batch", file_batch)
+        station = next((record[c] for c in STATION_COLUMNS if c in record), None)
+        differences.append({"file": rel, "key": key, "batch": batch, "station": station, "column": column,
+                            "legacy": legacy_value, "new": new_value, "delta": delta})
+
+    for column in legacy_df.columns.difference(new_df.columns):
+        add("", None, column, "sarake", "puuttuu")
+    for column in new_df.columns.difference(legacy_df.columns):
+        add("", None, column, "puuttuu", "sarake")
+    columns = [c for c in legacy_df.columns if c in new_df.columns]
+    keys = [c for c in KEY_COLUMNS if c in columns]
+    legacy_rows = _keyed_rows(legacy_df[columns], keys)
+    new_rows = _keyed_rows(new_df[columns], keys)
+
+    def key_text(key):
+        return " ".join(f"{k}={v}" for k, v in zip(keys + ["#"], key))
+
+    for key, legacy_record in legacy_rows.items():
+        new_record = new_rows.get(key)
+        if new_record is None:
+            add(key_text(key), legacy_record, "*", "rivi", "puuttuu")
+            continue
+        for column in columns:
+            if column in keys:
+                continue
+            a, b = legacy_record[column], new_record[column]
+            x, y = _to_number(a), _to_number(b)
+            if x is not None and y is not None:
+                if abs(y - x) > abs_tol + rel_tol * abs(x):
+                    add(key_text(key), legacy_record, column, a, b, y - x)
+            elif not (pd.isna(a) and pd.isna(b)) and str(a) != str(b):
+                add(key_text(key), legacy_record, column, a, b)
+    for key, new_record in new_rows.items():
+        if key not in legacy_rows:
+            add(key_text(key), new_record, "*", "puuttuu", "rivi")
+    return differences
+
+def makespan(output_dir, table="line_matrix_stretched"):
+    """Matriisin viimeinen ExitTime sekunteina (None, jos matriisia ei ole)"""
+    path = os.path.join(output_dir, "logs", f"{table}.csv")
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="", encoding="utf-8") as f:
+        return max((float(row["ExitTime"]) for row in csv.DictReader(f)), default=None)
+
+def schedule_counts(output_dir):
+    """(erien määrä venytetyssä matriisissa, nostintehtävien määrä); puuttuva taulukko None"""
+    counts = []
+    for rel, column in (("logs/line_matrix_stretched.csv", "Batch"), ("logs/transporter_tasks_stretched.csv", None)):
+        path = os.path.join(output_dir, rel)
+        if not os.path.exists(path):
+            counts.append(None)
+            continue
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        counts.append(len({row[column] for row in rows}) if column else len(rows))
+    return tuple(counts)
+
+def schedule_violations(output_dir):
+    """
+    Aikataulun pätevyysrikkeiden määrä (analyze_transporter_timeline.VALIDITY_CHECKS)
+    tai None, jos liikkeitä tai venytettyjä tehtäviä ei ole tarkistettavaksi.
+    """
+    from analyze_transporter_timeline import VALIDITY_CHECKS, find_timeline_violations
+    for rel in ("logs/transporters_movement.csv", "logs/transporter_tasks_stretched.csv"):
+        if not os.path.exists(os.path.join(output_dir, rel)):
+            return None
+    violations, _ = find_timeline_violations(output_dir)
+    return int(violations["Check"].isin(VALIDITY_CHECKS).sum())
+
+def compare_outputs(case, legacy_dir, new_dir, abs_tol=None, rel_tol=None):
+    """
+    Vertaa kahden simulaatiokansion kaikki CSV-tulokset.
+
+    Returns:
+        dict: case, differences (lista), only_legacy, only_new (tiedostot),
+            unexpected_files (muut kuin sallitut puuttuvat), makespan_legacy,
+            makespan_new, violations_new (None, jos ei tarkistettu), verdict
+    """
+    import config
+    abs_tol = abs_tol if abs_tol is not None else getattr(config, "EQUIVALENCE_ABS_TOL", 0.001)
+    rel_tol = rel_tol if rel_tol is not None else getattr(config, "EQUIVALENCE_REL_TOL", 1e-9)
+    legacy_files = output_files(legacy_dir)
+    new_files = output_files(new_dir)
+    differences = []
+    for rel in sorted(legacy_files & new_files):
+        for difference in compare_table(os.path.join(legacy_dir, rel), os.path.join(new_dir, rel), rel,
+                                        abs_tol, rel_tol):
+            differences.append(dict(difference, case=case))
+    result = {
+        "case": case,
+        "differences": differences,
+        "only_legacy": sorted(legacy_files - new_files),
+        "only_new": sorted(new_files - legacy_files),
+        "makespan_legacy": makespan(legacy_dir),
+        "makespan_new": makespan(new_dir),
+        "violations_new": None,
+    }
+    result["unexpected_files"] = [rel for rel in result["only_legacy"] + result["only_new"]
+                                  if not any(fnmatch.fnmatch(rel, p) for p in ALLOWED_MISSING_OUTPUTS)]
+    shorter = result["makespan_new"] is not None and result["makespan_legacy"] is not None \
+        and result["makespan_new"] < result["makespan_legacy"] - abs_tol
+    if result["unexpected_files"]:
+        result["verdict"] = "DIFFERENT"
+    elif not differences:
+        result["verdict"] = "EQUIVALENT"
+    elif shorter:
+        # Lyhyempi makespan kelpaa vain pätevälle aikataululle samoilla erillä ja tehtävillä
+        result["violations_new"] = schedule_violations(new_dir)
+        counts = schedule_counts(new_dir)
+        same_work = None not in counts and counts == schedule_counts(legacy_dir)
+        result["verdict"] = "BETTER" if result["violations_new"] == 0 and same_work else "DIFFERENT"
+    else:
+        result["verdict"] = "DIFFERENT"
+    return result
+
+def summarize(differences):
+    """Erot tiedostoittain, erittäin ja asemittain (SUMMARY_COLUMNS-rivit)"""
+    groups = {}
+    for d in differences:
+        for scope, name in (("file", d["file"]), ("batch", d["batch"]), ("station", d["station"])):
+            if name is None or (scope != "file" and name != name):
+                continue
+            entry = groups.setdefault((d["case"], scope, str(name)), [0, 0.0])
+            entry[0] += 1
+            if d["delta"] is not None:
+                entry[1] = max(entry[1], abs(d["delta"]))
+    rows = [{"case": case, "scope": scope, "name": name, "differences": n, "max_abs_delta": max_delta}
+            for (case, scope, name), (n, max_delta) in groups.items()]
+    scope_order = {"file": 0, "batch": 1, "station": 2}
+    return sorted(rows, key=lambda r: (r["case"], scope_order[r["scope"]], -r["differences"], r["name"]))
+
+def write_results(out_dir, results):
+    os.makedirs(out_dir, exist_ok=True)
+    differences = [d for result in results for d in result["differences"]]
+    diff_file = os.path.join(out_dir, DIFFERENCES_FILE_NAME)
+    with open(diff_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=DIFF_COLUMNS)
+        writer.writeheader()
+        writer.writerows(differences)
+    summary = summarize(differences)
+    summary_file = os.path.join(out_dir, SUMMARY_FILE_NAME)
+    with open(summary_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(summary)
+    return diff_file, summary_file, summary
+
+def print_report(results, summary, top_n=10):
+    for result in results:
+        legacy, new = result["makespan_legacy"], result["makespan_new"]
+        span_text = f"makespan {legacy:.1f} s -> {new:.1f} s" if legacy is not None and new is not None else ""
+        print(f"{result['verdict']:<11} {result['case']:<24} {len(result['differences']):>6} eroa  {span_text}")
+        for rel in result["only_legacy"]:
+            allowed = "" if rel in result["unexpected_files"] else " (sallittu)"
+            print(f"            vain vanhassa: {rel}{allowed}")
+        for rel in result["only_new"]:
+            allowed = "" if rel in result["unexpected_files"] else " (sallittu)"
+            print(f"            vain uudessa:  {rel}{allowed}")
+        if result["violations_new"]:
+            print(f"            uuden aikataulun pätevyysrikkeitä: {result['violations_new']}")
+        for scope, title in (("file", "Tiedostot"), ("batch", "Erät"), ("station", "Asemat")):
+            rows = [r for r in summary if r["case"] == result["case"] and r["scope"] == scope][:top_n]
+            if rows:
+                print(f"            {title}: " + ", ".join(
+                    f"{r['name']} ({r['differences']}, max {r['max_abs_delta']:.3g})" for r in rows))
+
+def run_comparison(legacy="HEAD", new=PROJECT_DIR, seeds=(0,), bundled=True, out_dir=None, abs_tol=None,
+                   rel_tol=None, **line_params):
+    """
+    Ajaa vanhan ja uuden koodipuun kaikilla syötteillä ja vertaa tulokset.
+
+    Args:
+        legacy, new (str): Koodipuu kansiona tai git-viitteenä
+        seeds (list): Synteettisten linjojen siemenet
+        bundled (bool): Vertaa myös toimitetulla initialization-kansiolla
+        out_dir (str): Tuloskansio (oletus output/equivalence/<aikaleima>)
+        line_params: generate_synthetic_tables-parametrit (stations, transporters, batches, ...)
+
+    Returns:
+        tuple: (tulokset tapauksittain, tuloskansio)
+    """
+    from generate_synthetic_input import generate_synthetic_input
+    out_dir = out_dir or os.path.join(DEFAULT_OUT_DIR, time.strftime("%Y-%m-%d_%H-%M-%S"))
+    os.makedirs(out_dir, exist_ok=True)
+    legacy_dir, legacy_name = prepare_tree(legacy, os.path.join(out_dir, "trees", "legacy"))
+    new_dir, new_name = prepare_tree(new, os.path.join(out_dir, "trees", "new"))
+    print(f"🔁 Vanha: {legacy_name}\n   Uusi:  {new_name}")
+
+    cases = []
+    if bundled:
+        cases.append(("bundled", os.path.join(PROJECT_DIR, "initialization")))
+    for seed in seeds:
+        init_dir = os.path.join(out_dir, "inputs", f"seed_{seed}")
+        generate_synthetic_input(init_dir, seed=seed, **line_params)
+        cases.append((f"seed_{seed}", init_dir))
+
+    results = []
+    for case, init_dir in cases:
+        print(f"▶️  {case}: ajetaan vanha ja uusi")
+        legacy_out = run_tree(legacy_dir, os.path.join(out_dir, "cases", case, "legacy"), init_dir)
+        new_out = run_tree(new_dir, os.path.join(out_dir, "cases", case, "new"), init_dir)
+        results.append(compare_outputs(case, legacy_out, new_out, abs_tol=abs_tol, rel_tol=rel_tol))
+    return results, out_dir
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Vanhan ja uuden toteutuksen differentiaalinen vastaavuustesti")
+    parser.add_argument("--legacy", default="HEAD", help="Vanha koodipuu: git-viite tai kansio (oletus HEAD)")
+    parser.add_argument("--new", default=PROJECT_DIR, help="Uusi koodipuu: git-viite tai kansio (oletus työkopio)")
+    parser.add_argument("--seeds", type=int, nargs="*", default=[0], help="Synteettisten linjojen siemenet")
+    parser.add_argument("--no-bundled", action="store_true", help="Älä vertaa toimitetulla initialization-kansiolla")
+    parser.add_argument("--out-dir", default=None, help="Tuloskansio (oletus output/equivalence/<aikaleima>)")
+    parser.add_argument("--abs-tol", type=float, default=None, help="Absoluuttinen toleranssi (oletus config)")
+    parser.add_argument("--rel-tol", type=float, default=None, help="Suhteellinen toleranssi (oletus config)")
+    parser.add_argument("--accept-better", action="store_true",
+                        help="Hyväksy erot, kun makespan lyhenee ja uusi aikataulu on pätevä")
+    parser.add_argument("--stations", type=int, default=42)
+    parser.add_argument("--transporters", type=int, default=3)
+    parser.add_argument("--programs", type=int, default=2)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--start-interval", default="900", help="Erien aloitusväli (s tai HH:MM:SS)")
+    args = parser.parse_args()
+
+    results, out_dir = run_comparison(
+        args.legacy, args.new, seeds=args.seeds, bundled=not args.no_bundled, out_dir=args.out_dir,
+        abs_tol=args.abs_tol, rel_tol=args.rel_tol, stations=args.stations, transporters=args.transporters,
+        programs=args.programs, batches=args.batches, start_interval=args.start_interval,
+    )
+    diff_file, summary_file, summary = write_results(out_dir, results)
+    print_report(results, summary)
+    print(f"📄 Erot: {diff_file}  Yhteenveto: {summary_file}")
+    accepted = ("EQUIVALENT", "BETTER") if args.accept_better else ("EQUIVALENT",)
+    sys.exit(0 if all(result["verdict"] in accepted for result in results) else 1)
@@ -0,0 +1,73 @@
+"""
+Simulaation yleiset asetukset.
+"""
+
+# Välitaulukoiden (line_matrix_*, transporter_tasks_*, transporters_movement) tiedostomuoto:
+# "csv", "parquet", "feather" tai "npz". Parquet/Feather vaatii pyarrow-kirjaston;
+# ilman sitä käytetään npz-muotoa. Ympäristömuuttuja SIM_OUTPUT_FORMAT ohittaa tämän.
+OUTPUT_FORMAT = "csv"
+
+# Lähtötiedostojen vienti simulaatiokansioon: "copy" kopioi kaiken, "link" tekee
+# muuttumattomista tiedostoista kovat linkit sisältöosoitteiseen varastoon
+# (output/.input_store) ja kopioi vain ajon muokkaamat tiedostot.
+# Ympäristömuuttuja SIM_INPUT_MODE ohittaa tämän.
+INPUT_MODE = "copy"
+
+# Vaiheen 5 venytys (stretch_transporter_tasks.stretch_tasks)
+# STRETCH_FIXED_POINT: venytä kiintopisteeseen asti kaikilla nostimilla (False = yksi läpikäynti);
+#     main.py --fixed-point ohittaa tämän
+# STRETCH_MAX_ITERATIONS: kierrosraja; jos kiintopistettä ei saavuteta, vaihe keskeytetään virheeseen
+STRETCH_FIXED_POINT = False
+STRETCH_MAX_ITERATIONS = 100
+
+# Simulaatiolokin (logs/simulation_log.csv) asetukset, ks. simulation_logger.
+# LOG_BUFFER_SIZE: rivejä muistissa ennen levylle kirjoitusta
+# LOG_ASYNC: kirjoita taustasäikeessä
+# LOG_LEVEL: pienin kirjattava taso (DEBUG, INFO, WARNING, ERROR); CONFLICT ja BATCH ovat DEBUG-tasoa
+# LOG_DISABLED_CATEGORIES: tyypit, joita ei kirjata lainkaan (esim. ["CONFLICT"])
+# LOG_ECHO_OPTIMIZATION: tulosta log_optimization-viestit myös terminaaliin
+LOG_BUFFER_SIZE = 1000
+LOG_ASYNC = False
+LOG_LEVEL = "DEBUG"
+LOG_DISABLED_CATEGORIES = []
+LOG_ECHO_OPTIMIZATION = True
+
+# Rakenteinen tapahtumaloki (logs/events.jsonl), ks. event_log
+# LOG_EVENTS: kirjaa tapahtumat myös JSON-lines-lokiin
+# LOG_EVENTS_MAX_BYTES: kierrätysraja tavuina (0 = ei kierrätystä)
+# LOG_EVENTS_BACKUPS: säilytettävien kierrätettyjen tiedostojen määrä
+# LOG_EVENTS_GZIP: pakkaa kierrätetyt tiedostot (events.jsonl.1.gz, ...)
+LOG_EVENTS = True
+LOG_EVENTS_MAX_BYTES = 20 * 1024 * 1024
+LOG_EVENTS_BACKUPS = 5
+LOG_EVENTS_GZIP = False
+
+# Suorituskykymittaus (logs/perf.csv ja logs/perf_trace.json), ks. perf_spans
+# PERF_SPANS: mittaa vaiheet ja kuumat osiot aikaväleinä
+# PERF_TRACEMALLOC: mittaa myös Python-varausten huippu (tracemalloc, hidastaa ajoa)
+PERF_SPANS = True
+PERF_TRACEMALLOC = False
+
+# Profilointi (main.py --profile), ks. step_profiler
+# PROFILE_TOP_N: hotspot-taulukon (reports/profile_hotspots.csv) rivit vaihetta kohden
+PROFILE_TOP_N = 30
+
+# Algoritmien laskurit ja histogrammit (logs/metrics.json, logs/metrics.prom), ks. run_metrics
+METRICS = True
+
+# Vaihekohtaiset suorituskykytestit (benchmark_pipeline.py)
+# BENCHMARK_SIZES: synteettisten instanssien erämäärät
+# BENCHMARK_REGRESSION_RATIO: sallittu hidastuminen vertailuajoon nähden (1.25 = +25 %)
+# BENCHMARK_MIN_SECONDS: tätä pienempiä aikaeroja ei tulkita regressioksi (mittauskohina)
+# BENCHMARK_MAX_EXPONENT: suurin sallittu skaalautumiseksponentti k (aika ~ erät^k)
+#     vaiheen tai osion nimellä; "default" koskee muita
+BENCHMARK_SIZES = [10, 20, 40, 80]
+BENCHMARK_REGRESSION_RATIO = 1.25
+BENCHMARK_MIN_SECONDS = 0.5
+BENCHMARK_MAX_EXPONENT = {"default": 2.0}
+
+# Vanhan ja uuden toteutuksen vastaavuustesti (compare_engines.py)
+# EQUIVALENCE_ABS_TOL: solujen sallittu absoluuttinen ero (sekunteina aikasarakkeissa)
+# EQUIVALENCE_REL_TOL: sallittu suhteellinen ero vanhaan arvoon nähden
+EQUIVALENCE_ABS_TOL = 0.001
+EQUIVALENCE_REL_TOL = 1e-9
@@ -1,63 +1,174 @@
+"""
+Simulaatiokansion luonti (vaihe 1)
+
+Lähdekansiot (COPIED_DIRS) viedään simulaatiokansioon jommallakummalla tavalla:
+- "copy": jokainen tiedosto kopioidaan (oletus)
+- "link": muuttumattomat tiedostot tallennetaan sisältöosoitteiseen varastoon
+  (<base_dir>/.input_store/<sha256>, vain luku) ja simulaatiokansioon tehdään
+  niihin kovat linkit. Ajon muokkaamat tiedostot (MUTABLE_PATHS) kopioidaan
+  aina, koska kirjoitus kovaan linkkiin muuttaisi varaston tiedostoa. Jos
+  linkkiä ei voi tehdä (esim. eri tiedostojärjestelmä), tiedosto kopioidaan.
+Tapa valitaan config.INPUT_MODE-asetuksella, ympäristömuuttujalla SIM_INPUT_MODE
+tai set_input_mode()-funktiolla.
+
+Kansion nimi on aikaleima; saman sekunnin aikana käynnistetyt ajot saavat
+päätteen _2, _3, ... (kansio luodaan atomisesti, joten rinnakkaiset prosessit
+eivät voi saada samaa kansiota).
+"""
+
 import os
 import shutil
 from datetime import datetime
 from glob import glob
+import config
+from simulation_logger import init_logger
+
+# Simulaatiokansioon kopioitavat lähdekansiot (lähde, kohde)
+COPIED_DIRS = [
+    ("initialization", "initialization"),
+    ("documentation", "documentation"),
+    ("programs", "original_programs"),
+]
+
+INPUT_MODES = ("copy", "link")
+INPUT_STORE_DIR_NAME = ".input_store"
+
+# Simulaatiokansion polut, joita putki muokkaa: kopioidaan aina myös link-tilassa
+MUTABLE_PATHS = ["initialization/Production.csv", "original_programs"]
+
+_input_mode = None
+
+def get_input_mode():
+    """Palauttaa lähtötiedostojen vientitavan (copy tai link)"""
+    mode = _input_mode or os.environ.get("SIM_INPUT_MODE") or getattr(config, "INPUT_MODE", "copy")
+    mode = str(mode).lower()
+    if mode not in INPUT_MODES:
+        raise ValueError(f"Tuntematon lähtötiedostojen tila '{mode}'. Sallitut: {', '.join(INPUT_MODES)}")
+    return mode
+
+def set_input_mode(mode):
+    """Asettaa lähtötiedostojen vientitavan tälle prosessille (None = asetuksen oletus)"""
+    global _input_mode
+    if mode is not None and str(mode).lower() not in INPUT_MODES:
+        raise ValueError(f"Tuntematon lähtötiedostojen tila '{mode}'. Sallitut: {', '.join(INPUT_MODES)}")
+    _input_mode = mode
+
+def make_run_directory(base_dir, now):
+    """Luo aikaleimatun simulaatiokansion; jos nimi on jo käytössä, lisätään pääte _2, _3, ..."""
+    name = now.strftime("%Y-%m-%d_%H-%M-%S")
+    os.makedirs(base_dir, exist_ok=True)
+    candidate = name
+    n = 1
+    while True:
+        full_path = os.path.join(base_dir, candidate)
+        try:
+            os.mkdir(full_path)
+            return full_path
+        except FileExistsError:
+            n += 1
+            candidate = f"{name}_{n}"
 
-def create_simulation_directory(base_dir="output"):
+def is_mutable(rel_path):
+    """Muokkaako putki simulaatiokansion tiedostoa (suhteellinen polku, /-erotin)"""
+    return any(rel_path == p or rel_path.startswith(p + "/") for p in MUTABLE_PATHS)
+
+def store_file(src, store_dir):
+    """Lisää tiedoston sisältöosoitteiseen varastoon (vain luku) ja palauttaa sen polun"""
+    from step_cache import file_hash
+    digest = file_hash(src)
+    path = os.path.join(store_dir, digest[:2], digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}"
+        shutil.copy2(src, tmp)
+        if os.name != "nt":
+            # Windowsissa vain luku -tiedostoa ei voisi poistaa simulaatiokansion mukana
+            os.chmod(tmp, 0o444)
+        os.replace(tmp, path)
+    return path
+
+def link_tree(src, dst, dst_name, store_dir):
+    """
+    Vie kansion src simulaatiokansioon dst: muuttumattomat tiedostot kovina
+    linkkeinä varastoon, muokattavat (MUTABLE_PATHS) kopioina.
+
+    Returns:
+        tuple: (linkitetyt, kopioidut) tiedostomäärät
+    """
+    linked = copied = 0
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames.sort()
+        rel_dir = os.path.relpath(dirpath, src)
+        target_dir = dst if rel_dir == "." else os.path.join(dst, rel_dir)
+        os.makedirs(target_dir, exist_ok=True)
+        for fname in sorted(filenames):
+            rel = "/".join([dst_name] + ([] if rel_dir == "." else rel_dir.split(os.sep)) + [fname])
+            source = os.path.join(dirpath, fname)
+            target = os.path.join(target_dir, fname)
+            if not is_mutable(rel):
+                try:
+                    os.link(store_file(source, store_dir), target)
+                    linked += 1
+                    continue
+                except OSError:
+                    pass  # Kovaa linkkiä ei tueta: kopioidaan
+            shutil.copy2(source, target)
+            copied += 1
+    return linked, copied
+
+def create_simulation_directory(base_dir="output", input_mode=None):
     """
-    Luo simulaatiokansion, kopioi tarvittavat kansiot ja alustaa logitiedoston INIT-tapahtumilla.
-    Palauttaa luodun simulaatiokansion polun.
+    Luo simulaatiokansion, kopioi tai linkittää tarvittavat kansiot ja alustaa
+    logitiedoston INIT-tapahtumilla. Palauttaa luodun simulaatiokansion polun.
+
+    Args:
+        input_mode (str): "copy" tai "link" (oletus: get_input_mode())
     """
+    input_mode = input_mode or get_input_mode()
     # Luo aikaleimapohjainen kansio
     now = datetime.now()
-    name = now.strftime("%Y-%m-%d_%H-%M-%S")
-    full_path = os.path.join(base_dir, name)
-    os.makedirs(full_path, exist_ok=True)
+    full_path = make_run_directory(base_dir, now)
 
     # Luo logs-kansio
     logs_dir = os.path.join(full_path, "logs")
     os.makedirs(logs_dir, exist_ok=True)
 
-    # Kopioi initialization, documentation ja programs (nimellä original_programs)
-
-    # Kopioi initialization, documentation ja programs (nimellä original_programs)
-    for src, dst_name in [
-        ("initialization", "initialization"),
-        ("documentation", "documentation"),
-        ("programs", "original_programs")
-    ]:
+    # Vie initialization, documentation ja programs (nimellä original_programs)
+    linked = copied = 0
+    store_dir = os.path.join(base_dir, INPUT_STORE_DIR_NAME)
+    for src, dst_name in COPIED_DIRS:
         if os.path.exists(src):
             dst = os.path.join(full_path, dst_name)
-            if os.path.exists(dst):
-                shutil.rmtree(dst)
-            shutil.copytree(src, dst)
-
-    # Varmista että Transporters_start_positions.csv kopioituu initialization-kansioon
-    src_start_positions = os.path.join("initialization", "Transporters_start_positions.csv")
-    dst_start_positions = os.path.join(full_path, "initialization", "Transporters_start_positions.csv")
-    if os.path.exists(src_start_positions):
-        shutil.copy2(src_start_positions, dst_start_positions)
-
-    # Luo simulation_log.csv ja kirjaa STEP- ja INIT-tapahtumat
-    log_file = os.path.join(logs_dir, "simulation_log.csv")
-    with open(log_file, "w", encoding="utf-8") as f:
-        f.write("Timestamp,Type,Description\n")
-        timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
-        f.write(f"{timestamp},STEP,STEP 1 STARTED: SIMULATION DIRECTORY CREATION\n")
-        f.write(f"{timestamp},INIT,Simulation started in folder {full_path}\n")
+            if input_mode == "link":
+                n_linked, n_copied = link_tree(src, dst, dst_name, store_dir)
+                linked += n_linked
+                copied += n_copied
+            else:
+                shutil.copytree(src, dst)
+
+    # Avaa ajon loki (simulation_log.csv ja events.jsonl) ja kirjaa STEP- ja INIT-tapahtumat
+    logger = init_logger(full_path)
+    logger.log("STEP", "STEP 1 STARTED: SIMULATION DIRECTORY CREATION", step="setup")
+    logger.log("INIT", f"Simulation started in folder {full_path}", step="setup")
+    if input_mode == "link":
+        # Tiedostoja ei listata yksitellen: sisältö on varastossa tiivisteen mukaan
+        logger.log("INIT", f"Input files linked from {store_dir}: {linked} linked / {copied} copied",
+                   value=linked, step="setup")
+    else:
         # initialization
         init_dir = os.path.join(full_path, "initialization")
         init_files = glob(os.path.join(init_dir, "*")) if os.path.exists(init_dir) else []
-        f.write(f"{timestamp},INIT,Initialization files count: {len(init_files)}\n")
+        logger.log("INIT", f"Initialization files count: {len(init_files)}", value=len(init_files), step="setup")
         for file in init_files:
-            f.write(f"{timestamp},INIT,Initialization file: {os.path.basename(file)}\n")
+            logger.log("INIT", f"Initialization file: {os.path.basename(file)}", step="setup")
         # documentation
         doc_dir = os.path.join(full_path, "documentation")
         doc_files = glob(os.path.join(doc_dir, "*")) if os.path.exists(doc_dir) else []
-        f.write(f"{timestamp},INIT,Documentation files count: {len(doc_files)}\n")
+        logger.log("INIT", f"Documentation files count: {len(doc_files)}", value=len(doc_files), step="setup")
         for file in doc_files:
-            f.write(f"{timestamp},INIT,Documentation file: {os.path.basename(file)}\n")
-        f.write(f"{timestamp},STEP,STEP 1 COMPLETED: SIMULATION DIRECTORY READY\n")
+            logger.log("INIT", f"Documentation file: {os.path.basename(file)}", step="setup")
+    logger.log("STEP", "STEP 1 COMPLETED: SIMULATION DIRECTORY READY", step="setup")
+    logger.flush()
 
     # Luo käytettyjen käsittelyohjelmien lista (used_treatment_programs.csv)
     production_file = os.path.join(full_path, "initialization", "Production.csv")
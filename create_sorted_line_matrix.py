@@ -1,13 +1,16 @@
 import os
-import pandas as pd
+from table_io import read_table, write_table
 
-def create_sorted_line_matrix(output_dir):
+def create_sorted_line_matrix(output_dir, ctx=None):
     logs_dir = os.path.join(output_dir, "logs")
     input_file = os.path.join(logs_dir, "line_matrix_stretched.csv")
     output_file = os.path.join(logs_dir, "line_matrix_stretched_sorted.csv")
-    df = pd.read_csv(input_file)
+    df = ctx.get("line_matrix_stretched") if ctx is not None else read_table(input_file)
     df_sorted = df.sort_values(["EntryTime", "Batch", "Stage"]).reset_index(drop=True)
-    df_sorted.to_csv(output_file, index=False)
+    if ctx is not None:
+        ctx.put("logs/line_matrix_stretched_sorted.csv", df_sorted)
+    else:
+        write_table(df_sorted, output_file)
     return output_file
 
 if __name__ == "__main__":
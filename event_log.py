@@ -0,0 +1,210 @@
+"""
+Rakenteinen tapahtumaloki (logs/events.jsonl)
+
+Jokainen tapahtuma on yksi JSON-rivi tyypitetyin kentin:
+    ts           aikaleima (Unix-sekunnit)
+    type         tapahtuman tyyppi (STEP, BATCH, CONFLICT, ...)
+    step         putken vaihe (esim. "matrix_original")
+    batch        erä
+    station      asema
+    transporter  nostin
+    value        numeerinen arvo (esim. viive sekunteina)
+    message      vapaa teksti
+Tyhjät kentät jätetään pois, joten rivit pysyvät lyhyinä. Toisin kuin
+simulation_log.csv:ssä, pilkut ja lainausmerkit viestissä eivät riko riviä.
+
+Tiedosto kierrätetään, kun se kasvaa yli max_bytes: events.jsonl siirtyy
+nimelle events.jsonl.1 (gzip=True: events.jsonl.1.gz), vanhemmat siirtyvät
+yhdellä eteenpäin ja yli backups-määrän menevät poistetaan.
+
+Rinnakkaisajossa (--jobs) poolin prosessit kirjoittavat samaan tiedostoon.
+Kirjoitus ja kierrätys tehdään lukkotiedoston (events.jsonl.lock) alla, ja
+ennen kirjoitusta tarkistetaan, onko toinen prosessi kierrättänyt tiedoston
+(eri inode): silloin tiedosto avataan uudelleen. Koko lasketaan tiedostosta,
+ei prosessikohtaisesti.
+
+read_events() lukee lokin kierrätettyine osineen DataFrameen analyysia varten.
+"""
+
+import contextlib
+import glob
+import gzip
+import json
+import os
+import re
+import shutil
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+EVENTS_FILE_NAME = "events.jsonl"
+EVENT_FIELDS = ["ts", "type", "step", "batch", "station", "transporter", "value", "message"]
+INT_FIELDS = ["batch", "station", "transporter"]
+
+class EventLog:
+    def __init__(self, path, max_bytes=20 * 1024 * 1024, backups=5, compress=False):
+        """
+        Args:
+            path (str): Lokitiedosto (esim. <output_dir>/logs/events.jsonl)
+            max_bytes (int): Kierrätysraja tavuina (0 = ei kierrätystä)
+            backups (int): Säilytettävien kierrätettyjen tiedostojen määrä
+            compress (bool): Pakkaa kierrätetyt tiedostot gzipillä
+        """
+        self.path = path
+        self.max_bytes = int(max_bytes or 0)
+        self.backups = max(0, int(backups))
+        self.compress = compress
+        self.lock_path = path + ".lock"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _reopen_if_rotated(self):
+        """Avaa tiedoston uudelleen, jos se on suljettu tai toinen prosessi on kierrättänyt sen"""
+        if self._file is not None:
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(self._file.fileno()).st_ino:
+                return
+            self._file.close()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, events):
+        """Kirjoittaa tapahtumat (lista sanakirjoja) ja kierrättää tiedoston tarvittaessa"""
+        if not events:
+            return
+        text = "".join(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n" for event in events)
+        with _locked(self.lock_path):
+            self._reopen_if_rotated()
+            self._file.write(text)
+            self._file.flush()
+            self._size = os.fstat(self._file.fileno()).st_size
+            if self.max_bytes and self._size >= self.max_bytes:
+                self._rotate()
+
+    def _backup_path(self, n):
+        return f"{self.path}.{n}" + (".gz" if self.compress else "")
+
+    def rotate(self):
+        """Siirtää nykyisen tiedoston varmuuskopioksi ja aloittaa uuden"""
+        with _locked(self.lock_path):
+            self._rotate()
+
+    def _rotate(self):
+        # Kutsutaan lukon alla
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        if self.backups == 0:
+            os.remove(self.path)
+        else:
+            for old in reversed(_backup_files(self.path)):
+                n = _backup_number(self.path, old)
+                if n >= self.backups:
+                    os.remove(old)
+                else:
+                    os.replace(old, f"{self.path}.{n + 1}" + (".gz" if old.endswith(".gz") else ""))
+            if self.compress:
+                with open(self.path, "rb") as src, gzip.open(self._backup_path(1), "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self._backup_path(1))
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+@contextlib.contextmanager
+def _locked(lock_path):
+    """
+    Prosessien välinen lukko lukkotiedostolla. Tiedosto avataan joka kerta
+    uudelleen: fork-prosessit jakaisivat muuten saman avoimen tiedoston ja lukon.
+    """
+    with open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def make_event(ts, class_type, message, step=None, batch=None, station=None, transporter=None, value=None):
+    """Tapahtuma sanakirjana (tyhjät kentät jätetään pois)"""
+    event = {"ts": round(ts, 6), "type": class_type}
+    for name, field in (("step", step), ("batch", batch), ("station", station), ("transporter", transporter)):
+        if field is not None:
+            event[name] = field if name == "step" else int(field)
+    if value is not None:
+        event["value"] = float(value)
+    event["message"] = str(message)
+    return event
+
+def _backup_number(path, backup):
+    match = re.fullmatch(re.escape(path) + r"\.(\d+)(\.gz)?", backup)
+    return int(match.group(1)) if match else None
+
+def _backup_files(path):
+    """Kierrätetyt tiedostot uusimmasta vanhimpaan (events.jsonl.1, .2, ...)"""
+    found = [p for p in glob.glob(glob.escape(path) + ".*") if _backup_number(path, p) is not None]
+    return sorted(found, key=lambda p: _backup_number(path, p))
+
+def event_files(path):
+    """Lokin tiedostot vanhimmasta uusimpaan (kierrätetyt ensin, nykyinen viimeisenä)"""
+    files = list(reversed(_backup_files(path)))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+def read_events(path):
+    """
+    Lukee tapahtumalokin kierrätettyine osineen DataFrameen.
+
+    Args:
+        path (str): Lokitiedosto tai simulaatiokansio (käytetään logs/events.jsonl)
+
+    Returns:
+        DataFrame: sarakkeet EVENT_FIELDS; ts datetime64, type ja step
+            category, batch/station/transporter Int64, value float64
+    """
+    import pandas as pd
+    if os.path.isdir(path):
+        path = os.path.join(path, "logs", EVENTS_FILE_NAME)
+    frames = []
+    for file in event_files(path):
+        if os.path.getsize(file) == 0:
+            continue
+        frames.append(pd.read_json(file, lines=True, dtype=False, convert_dates=False,
+                                   compression="gzip" if file.endswith(".gz") else None))
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    for name in EVENT_FIELDS:
+        if name not in df.columns:
+            df[name] = None
+    df = df[EVENT_FIELDS]
+    df["ts"] = pd.to_datetime(df["ts"].astype("float64"), unit="s")
+    for name in ("type", "step"):
+        df[name] = df[name].astype("category")
+    for name in INT_FIELDS:
+        df[name] = df[name].astype("Int64")
+    df["value"] = df["value"].astype("float64")
+    df["message"] = df["message"].astype("string")
+    return df
@@ -1,7 +1,9 @@
 import pandas as pd
 import os
 from simulation_logger import get_logger
-from transporter_physics import calculate_physics_transfer_time, calculate_lift_time, calculate_sink_time
+from transporter_physics import calculate_physics_transfer_time, calculate_lift_time, calculate_sink_time, count_physics_evaluations
+from table_io import read_table, write_table, table_exists
+from perf_spans import start_span
 
 def select_capable_transporter(lift_station, sink_station, stations_df, transporters_df):
     """
@@ -32,12 +34,14 @@ def select_capable_transporter(lift_station, sink_station, stations_df, transpor
     print(f"[ERROR] Nostintehtävälle ei löytynyt sopivaa nostinta! Nostoasema: {lift_station}, laskuasema: {sink_station}, nostoasema X: {lift_x}, laskuasema X: {sink_x}")
     raise RuntimeError(f"Nostintehtävälle ei löytynyt sopivaa nostinta! Nostoasema: {lift_station}, laskuasema: {sink_station}, nostoasema X: {lift_x}, laskuasema X: {sink_x}")
 
-def extract_transporter_tasks(output_dir):
+def extract_transporter_tasks(output_dir, ctx=None):
     """
     Lukee venytetyn matriisin ja muodostaa nostintehtävälistan fysiikka-aikojen kanssa.
     
     Otsikkorivi: Transporter, Batch, Start_Time, Lift_Stat, Sink_stat, 
                  Phase_0_start, Phase_1_start, Phase_2_start, Phase_3_start, Phase_4_stop
+
+    Jos ctx (PipelineContext) annetaan, syötteet luetaan siitä ja tulos tallennetaan siihen.
     """
     logger = get_logger()
     if logger is None:
@@ -45,32 +49,38 @@ def extract_transporter_tasks(output_dir):
     
     logger.log("STEP", "STEP 8.6 STARTED: EXTRACT TRANSPORTER TASKS FROM STRETCHED MATRIX")
     
-    logs_dir = os.path.join(output_dir, "logs")
+    logs_dir = os.path.join(output_dir or "", "logs")
     matrix_file = os.path.join(logs_dir, "line_matrix_stretched.csv")
     
-    if not os.path.exists(matrix_file):
+    if ctx is None and not table_exists(matrix_file):
         logger.log_error(f"line_matrix_stretched.csv ei löydy: {matrix_file}")
         raise FileNotFoundError(f"line_matrix_stretched.csv ei löydy: {matrix_file}")
     
     # Lataa asema- ja nostintiedot nostinvalintaa varten
-    stations_file = os.path.join(output_dir, "Initialization", "Stations.csv")
-    transporters_file = os.path.join(output_dir, "Initialization", "Transporters.csv")
-    production_file = os.path.join(output_dir, "Initialization", "Production.csv")
-    start_positions_file = os.path.join(output_dir, "Initialization", "Transporters_start_positions.csv")
-    
-    if not os.path.exists(stations_file):
-        raise FileNotFoundError(f"Stations.csv ei löydy: {stations_file}")
-    if not os.path.exists(transporters_file):
-        raise FileNotFoundError(f"Transporters.csv ei löydy: {transporters_file}")
-    if not os.path.exists(production_file):
-        raise FileNotFoundError(f"Production.csv ei löydy: {production_file}")
-    if not os.path.exists(start_positions_file):
-        raise FileNotFoundError(f"Transporters_start_positions.csv ei löydy: {start_positions_file}")
+    if ctx is not None:
+        stations_df = ctx.get("stations")
+        transporters_df = ctx.get("transporters")
+        production_df = ctx.get("production").copy()
+        start_positions_df = ctx.get("transporters_start_positions").copy()
+    else:
+        stations_file = os.path.join(output_dir, "initialization", "Stations.csv")
+        transporters_file = os.path.join(output_dir, "initialization", "Transporters.csv")
+        production_file = os.path.join(output_dir, "initialization", "Production.csv")
+        start_positions_file = os.path.join(output_dir, "initialization", "Transporters_start_positions.csv")
+
+        if not os.path.exists(stations_file):
+            raise FileNotFoundError(f"Stations.csv ei löydy: {stations_file}")
+        if not os.path.exists(transporters_file):
+            raise FileNotFoundError(f"Transporters.csv ei löydy: {transporters_file}")
+        if not os.path.exists(production_file):
+            raise FileNotFoundError(f"Production.csv ei löydy: {production_file}")
+        if not os.path.exists(start_positions_file):
+            raise FileNotFoundError(f"Transporters_start_positions.csv ei löydy: {start_positions_file}")
 
-    stations_df = pd.read_csv(stations_file)
-    transporters_df = pd.read_csv(transporters_file)
-    production_df = pd.read_csv(production_file)
-    start_positions_df = pd.read_csv(start_positions_file)
+        stations_df = pd.read_csv(stations_file)
+        transporters_df = pd.read_csv(transporters_file)
+        production_df = pd.read_csv(production_file)
+        start_positions_df = pd.read_csv(start_positions_file)
     # Strip whitespace from column names to avoid KeyError due to leading spaces
     start_positions_df.columns = start_positions_df.columns.str.strip()
     
@@ -90,7 +100,7 @@ def extract_transporter_tasks(output_dir):
     
     try:
         # Lue venytetty matriisi
-        df = pd.read_csv(matrix_file)
+        df = ctx.get("line_matrix_stretched") if ctx is not None else read_table(matrix_file)
         df = df.sort_values(["Batch", "Treatment_program", "Stage"]).reset_index(drop=True)
         
         tasks = []
@@ -186,6 +196,7 @@ def extract_transporter_tasks(output_dir):
             tasks_df["Phase_4_start"] = 0
             tasks_df["Phase_4_stop"] = 0
             
+            evaluated = 0
             for idx, row in tasks_df.iterrows():
                 transporter_id = row["Transporter"]
                 lift_station = row["Lift_Stat"]
@@ -232,6 +243,7 @@ def extract_transporter_tasks(output_dir):
                     
                     # Phase 4: Laskuaika laskuasemalla
                     phase_4_duration = int(round(calculate_sink_time(sink_station_info, transporter_info)))
+                    evaluated += 1
                     
                 except Exception as e:
                     phase_1_duration = 5  # Siirtoaika
@@ -267,10 +279,14 @@ def extract_transporter_tasks(output_dir):
                 
                 # Päivitä nostimen viimeinen lopetusaika
                 transporter_last_stop[transporter_id] = phase_4_stop
+            count_physics_evaluations(transfer=2 * evaluated, lift=evaluated, sink=evaluated)
         
         # Tallenna
         output_file = os.path.join(logs_dir, "transporter_tasks_from_matrix.csv")
-        tasks_df.to_csv(output_file, index=False)
+        if ctx is not None:
+            ctx.put("transporter_tasks_from_matrix", tasks_df)
+        else:
+            write_table(tasks_df, output_file)
         
         logger.log("STEP", "STEP 8.6 COMPLETED: EXTRACT TRANSPORTER TASKS FROM STRETCHED MATRIX")
         
@@ -280,10 +296,11 @@ def extract_transporter_tasks(output_dir):
         logger.log_error(f"Nostintehtävien erottaminen epäonnistui: {e}")
         raise
 
-def create_detailed_movements(output_dir):
+def create_detailed_movements(output_dir, ctx=None):
     """
     Muuntaa nostintehtävät realistisiksi liikkeiksi.
     Jokainen tehtävä muuntuu TÄSMÄLLEEN 5 liikkeeksi (Phase 0-4).
+    Jos ctx (PipelineContext) annetaan, syötteet luetaan siitä ja liikkeet tallennetaan siihen.
     """
     logger = get_logger()
     if logger is None:
@@ -296,28 +313,35 @@ def create_detailed_movements(output_dir):
     
     logger.log("STEP", "STEP 8.7 STARTED: CREATE DETAILED TRANSPORTER MOVEMENTS")
     
-    logs_dir = os.path.join(output_dir, "logs")
+    logs_dir = os.path.join(output_dir or "", "logs")
     tasks_file = os.path.join(logs_dir, "transporter_tasks_from_matrix.csv")
     
-    if not os.path.exists(tasks_file):
+    if ctx is None and not table_exists(tasks_file):
         logger.log_error(f"transporter_tasks_from_matrix.csv ei löydy: {tasks_file}")
         raise FileNotFoundError(f"transporter_tasks_from_matrix.csv ei löydy: {tasks_file}")
     
-    # Lataa tehtävät
-    tasks_df = pd.read_csv(tasks_file)
-    
-    # Lataa nostintiedot alkupaikkojen määrittämiseksi
-    transporters_file = os.path.join(output_dir, "Initialization", "Transporters.csv")
-    stations_file = os.path.join(output_dir, "Initialization", "Stations.csv")
-    production_file = os.path.join(output_dir, "Initialization", "Production.csv")
-    
-    transporters_df = pd.read_csv(transporters_file)
-    stations_df = pd.read_csv(stations_file)
-    production_df = pd.read_csv(production_file)
-    
-    # Laske nostimien alkupaikat tiedostosta (dynaaminen, ei kovakoodauksia)
-    start_positions_file = os.path.join(output_dir, "Initialization", "Transporters_start_positions.csv")
-    start_positions_df = pd.read_csv(start_positions_file)
+    if ctx is not None:
+        tasks_df = ctx.get("transporter_tasks_from_matrix").copy()
+        transporters_df = ctx.get("transporters")
+        stations_df = ctx.get("stations")
+        production_df = ctx.get("production").copy()
+        start_positions_df = ctx.get("transporters_start_positions").copy()
+    else:
+        # Lataa tehtävät
+        tasks_df = read_table(tasks_file)
+
+        # Lataa nostintiedot alkupaikkojen määrittämiseksi
+        transporters_file = os.path.join(output_dir, "initialization", "Transporters.csv")
+        stations_file = os.path.join(output_dir, "initialization", "Stations.csv")
+        production_file = os.path.join(output_dir, "initialization", "Production.csv")
+
+        transporters_df = pd.read_csv(transporters_file)
+        stations_df = pd.read_csv(stations_file)
+        production_df = pd.read_csv(production_file)
+
+        # Laske nostimien alkupaikat tiedostosta (dynaaminen, ei kovakoodauksia)
+        start_positions_file = os.path.join(output_dir, "initialization", "Transporters_start_positions.csv")
+        start_positions_df = pd.read_csv(start_positions_file)
     start_positions_df.columns = start_positions_df.columns.str.strip()
     transporter_start_positions = {}
     for _, row in start_positions_df.iterrows():
@@ -332,6 +356,7 @@ def create_detailed_movements(output_dir):
     transporter_last_location = transporter_start_positions.copy()
     
     # Käsittele tehtävät lineaarisesti
+    expansion_span = start_span("movement_expansion", tasks=len(tasks_df))
     for _, task in tasks_df.iterrows():
         transporter_id = int(task['Transporter'])
         
@@ -411,7 +436,7 @@ def create_detailed_movements(output_dir):
         global_final_time = int(tasks_df['Phase_4_stop'].max())
     
     # Luo loppusiirrot jokaiselle nostimelle
-    from transporter_physics import calculate_physics_transfer_time
+    returns = 0
     for transporter_id in transporter_start_positions.keys():
         transporter_id = int(transporter_id)  # Varmista int-tyyppi
         if transporter_id in transporter_final_times:
@@ -459,6 +484,7 @@ def create_detailed_movements(output_dir):
 
                 try:
                     transfer_duration = int(round(calculate_physics_transfer_time(current_station_info, start_station_info, transporter_info)))
+                    returns += 1
                 except:
                     transfer_duration = 10  # Oletusaika jos fysiikkalaskenta epäonnistuu
 
@@ -501,8 +527,11 @@ def create_detailed_movements(output_dir):
                     'Description': 'Odotus simuloinnin lopussa'
                 })
     
+    count_physics_evaluations(transfer=returns)
+
     # Tallenna DataFrame
     movements_df = pd.DataFrame(movements)
+    expansion_span.end(movements=len(movements_df))
     
     # Järjestä oikein: Transporter -> Start_Time -> Phase
     movements_df = movements_df.sort_values(['Transporter', 'Start_Time', 'Phase']).reset_index(drop=True)
@@ -511,7 +540,10 @@ def create_detailed_movements(output_dir):
     movements_df['Movement_ID'] = range(1, len(movements_df) + 1)
     
     output_file = os.path.join(logs_dir, "transporters_movement.csv")
-    movements_df.to_csv(output_file, index=False)
+    if ctx is not None:
+        ctx.put("transporters_movement", movements_df)
+    else:
+        write_table(movements_df, output_file)
     
     logger.log("STEP", "STEP 8.7 COMPLETED: CREATE DETAILED TRANSPORTER MOVEMENTS")
     
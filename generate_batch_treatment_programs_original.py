@@ -3,24 +3,39 @@ Luo original_programs-kansion ja kopioi käsittelyohjelmat eräkohtaisesti Produ
 """
 import os
 import pandas as pd
-from datetime import datetime
+from simulation_logger import get_logger
 
-def generate_batch_treatment_programs_original(output_dir):
+def generate_batch_treatment_programs_original(output_dir, ctx=None):
+    # Jos ctx (PipelineContext) annetaan, pohjaohjelmat luetaan siitä (kerran per ohjelma)
+    # ja eräkohtaiset ohjelmat tallennetaan siihen. output_dir=None (vain ctx:n kanssa)
+    # ajaa vaiheen kokonaan muistissa, ja paluuarvo on taulukkonimien etuliite.
     try:
-        original_programs_dir = os.path.join(output_dir, "original_programs")
-        os.makedirs(original_programs_dir, exist_ok=True)
-        production_file = os.path.join(output_dir, "Initialization", "Production.csv")
-        if not os.path.exists(production_file):
-            raise FileNotFoundError(f"Production.csv ei löydy: {production_file}")
-        production_df = pd.read_csv(production_file)
+        if output_dir is None:
+            original_programs_dir = "original_programs"
+        else:
+            original_programs_dir = os.path.join(output_dir, "original_programs")
+            os.makedirs(original_programs_dir, exist_ok=True)
+        if ctx is not None:
+            production_df = ctx.get("production")
+        else:
+            production_file = os.path.join(output_dir, "initialization", "Production.csv")
+            if not os.path.exists(production_file):
+                raise FileNotFoundError(f"Production.csv ei löydy: {production_file}")
+            production_df = pd.read_csv(production_file)
         created_files = []
         for _, row in production_df.iterrows():
             batch_id = str(row["Batch"]).zfill(3)
             treatment_program = str(row["Treatment_program"]).zfill(3)
-            source_file = os.path.join(output_dir, "Initialization", f"Treatment_program_{treatment_program}.csv")
-            if not os.path.exists(source_file):
-                raise FileNotFoundError(f"Käsittelyohjelmaa ei löydy: {source_file}")
-            program_df = pd.read_csv(source_file)
+            source_file = f"initialization/Treatment_program_{treatment_program}.csv"
+            if ctx is not None:
+                if not ctx.has(source_file):
+                    raise FileNotFoundError(f"Käsittelyohjelmaa ei löydy: {source_file}")
+                program_df = ctx.get(source_file).copy()
+            else:
+                source_file = os.path.join(output_dir, *source_file.split("/"))
+                if not os.path.exists(source_file):
+                    raise FileNotFoundError(f"Käsittelyohjelmaa ei löydy: {source_file}")
+                program_df = pd.read_csv(source_file)
             # Varmista että MinTime löytyy
             if "MinTime" not in program_df.columns:
                 raise ValueError(f"MinTime-sarake puuttuu tiedostosta: {source_file}")
@@ -30,19 +45,19 @@ def generate_batch_treatment_programs_original(output_dir):
             columns = ["Stage", "MinStat", "MaxStat", "MinTime", "MaxTime", "CalcTime"]
             program_df = program_df[columns]
             target_file = os.path.join(original_programs_dir, f"Batch_{batch_id}_Treatment_program_{treatment_program}.csv")
-            program_df.to_csv(target_file, index=False)
-            created_files.append(os.path.basename(target_file))
-        logs_path = os.path.join(output_dir, "logs")
-        log_file = os.path.join(logs_path, "simulation_log.csv")
-        if os.path.exists(log_file):
-            with open(log_file, "a", encoding="utf-8") as f:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"{timestamp},STEP,STEP 2 STARTED: GENERATE ORIGINAL PROGRAMS\n")
-                f.write(f"{timestamp},SETUP,original_programs folder created\n")
-                f.write(f"{timestamp},SETUP,Treatment programs created: {len(created_files)}\n")
-                for f_name in created_files:
-                    f.write(f"{timestamp},SETUP,Created treatment program: {f_name}\n")
-                f.write(f"{timestamp},STEP,STEP 2 COMPLETED: ORIGINAL PROGRAMS READY\n")
+            if ctx is not None:
+                ctx.put(f"original_programs/{os.path.basename(target_file)}", program_df)
+            else:
+                program_df.to_csv(target_file, index=False)
+            created_files.append((int(row["Batch"]), os.path.basename(target_file)))
+        logger = get_logger()
+        if logger is not None:
+            logger.log("STEP", "STEP 2 STARTED: GENERATE ORIGINAL PROGRAMS")
+            logger.log("SETUP", "original_programs folder created")
+            logger.log("SETUP", f"Treatment programs created: {len(created_files)}", value=len(created_files))
+            for batch, f_name in created_files:
+                logger.log("SETUP", f"Created treatment program: {f_name}", batch=batch)
+            logger.log("STEP", "STEP 2 COMPLETED: ORIGINAL PROGRAMS READY")
         return original_programs_dir
     except Exception as e:
         print(f"\nVIRHE: {e}")
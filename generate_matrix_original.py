@@ -13,7 +13,11 @@ Konfliktien ratkaisu:
 import pandas as pd
 import os
 from simulation_logger import SimulationLogger
-from transporter_physics import calculate_physics_transfer_time, calculate_lift_time, calculate_sink_time
+from transporter_physics import calculate_physics_transfer_time, calculate_lift_time, calculate_sink_time, count_physics_evaluations
+from pipeline_context import program_table_name
+from table_io import write_table
+from perf_spans import start_span
+from run_metrics import inc, observe
 
 def time_to_seconds(time_str):
     """Muunna aika sekunneiksi"""
@@ -44,6 +48,8 @@ def check_station_conflict(all_tasks, parallel_stations, entry_time, exit_time,
     Tarkistaa onko mikä tahansa rinnakkaisista asemista vapaa haluttuna aikana.
     Palauttaa: (valittu_asema, on_konflikti)
     """
+    scanned = 0
+    evaluations = 0
     for test_station in parallel_stations:
         # Laske fysiikkapohjaiset siirtoajat tälle asemalle
         try:
@@ -69,6 +75,7 @@ def check_station_conflict(all_tasks, parallel_stations, entry_time, exit_time,
         transfer_time = calculate_physics_transfer_time(from_station_row, to_station_row, transporter)
         sink_time = calculate_sink_time(to_station_row, transporter)
         transport_time = lift_time + transfer_time + sink_time
+        evaluations += 1
         
         test_entry_time = entry_time  # käytä alkuperäistä entry_time
         test_exit_time = exit_time    # käytä alkuperäistä exit_time
@@ -76,6 +83,7 @@ def check_station_conflict(all_tasks, parallel_stations, entry_time, exit_time,
         # Tarkista konflikti TÄLLÄ asemalla
         has_conflict = False
         for existing_task in all_tasks:
+            scanned += 1
             if existing_task['Station'] == test_station:
                 # Realistinen vaihtoajan laskenta
                 filtered_prev = stations_df[stations_df['Number'] == existing_task['Station']]
@@ -88,6 +96,7 @@ def check_station_conflict(all_tasks, parallel_stations, entry_time, exit_time,
                 prev_lift = calculate_lift_time(prev_station_row, transporter)
                 prev_transfer = calculate_physics_transfer_time(prev_station_row, from_station_row, transporter)
                 prev_sink = calculate_sink_time(from_station_row, transporter)
+                evaluations += 1
                 changeover_time = (prev_lift + prev_transfer + prev_sink) + transport_time
                 
                 if test_entry_time < existing_task['ExitTime'] + changeover_time:
@@ -96,9 +105,15 @@ def check_station_conflict(all_tasks, parallel_stations, entry_time, exit_time,
         
         if not has_conflict:
             # Vapaa asema löytyi!
+            inc("conflict_check_calls_total")
+            inc("conflict_check_iterations_total", scanned)
+            count_physics_evaluations(evaluations, evaluations, evaluations)
             return test_station, False
     
     # Kaikki asemat varattu
+    inc("conflict_check_calls_total")
+    inc("conflict_check_iterations_total", scanned)
+    count_physics_evaluations(evaluations, evaluations, evaluations)
     return parallel_stations[0], True
 
 def load_batch_program(output_dir, batch_id, treatment_program):
@@ -116,32 +131,49 @@ def load_transporters_data():
     transporters_file = os.path.join("initialization", "Transporters.csv")
     return pd.read_csv(transporters_file)
 
-def generate_matrix_original(output_dir, step_logging=True):
+def generate_matrix_original(output_dir, step_logging=True, ctx=None):
     """
     YKSINKERTAINEN MATRIISIGENEROINTI
+
+    Jos ctx (PipelineContext) annetaan, lähtötiedot ja ohjelmat luetaan siitä ja
+    tulokset (line_matrix_original, Production) tallennetaan siihen.
+    Kirjaus menee ajon lokiin (ctx.logger), jos sellainen on.
     """
-    logger = SimulationLogger(output_dir)
+    own_logger = ctx is None or ctx.logger is None
+    logger = SimulationLogger(output_dir) if own_logger else ctx.logger
     logger.log("MATRIX_GEN", "Starting simple matrix generation")
     
     # Lataa data
-    production_df = load_production_data(output_dir)
-    stations_df = load_stations_data()
-    transporters_df = load_transporters_data()
+    if ctx is not None:
+        production_df = ctx.get("production").copy()
+        production_df['Start_time_seconds'] = production_df['Start_time'].apply(time_to_seconds)
+        stations_df = ctx.get("stations")
+        transporters_df = ctx.get("transporters")
+    else:
+        production_df = load_production_data(output_dir)
+        stations_df = load_stations_data()
+        transporters_df = load_transporters_data()
     
     # Matriisi = lista tehtävistä
     all_tasks = []
+    physics_evaluations = 0
 
     # Käsittele erä kerrallaan
+    conflict_span = start_span("conflict_check", batches=len(production_df))
     for _, batch_data in production_df.iterrows():
         batch_id = int(batch_data['Batch'])
         treatment_program = int(batch_data['Treatment_program'])
         start_time = batch_data['Start_time_seconds']
         start_station = int(batch_data['Start_station'])
 
-        logger.log("BATCH", f"Processing batch {batch_id}")
+        if logger.enabled("BATCH"):
+            logger.log("BATCH", f"Processing batch {batch_id}", batch=batch_id)
 
         # Lataa käsittelyohjelma
-        program_df = load_batch_program(output_dir, batch_id, treatment_program)
+        if ctx is not None:
+            program_df = ctx.get(program_table_name("original_programs", batch_id, treatment_program))
+        else:
+            program_df = load_batch_program(output_dir, batch_id, treatment_program)
 
         # Konfliktien ratkaisu
         batch_start_time = start_time
@@ -192,6 +224,7 @@ def generate_matrix_original(output_dir, step_logging=True):
                 transfer_time = calculate_physics_transfer_time(from_station_row, to_station_row, transporter)
                 sink_time = calculate_sink_time(to_station_row, transporter)
                 transport_time = lift_time + transfer_time + sink_time
+                physics_evaluations += 1
 
                 entry_time = current_time + transport_time
                 exit_time = entry_time + treatment_time
@@ -225,6 +258,7 @@ def generate_matrix_original(output_dir, step_logging=True):
                     for test_station in parallel_stations:
                         station_free_time = current_time
 
+                        inc("conflict_free_time_iterations_total", len(all_tasks))
                         for existing_task in all_tasks:
                             if existing_task['Station'] == test_station:
                                 # Sama vaihtoaika-logiikka kuin check_station_conflict funktiossa
@@ -262,6 +296,7 @@ def generate_matrix_original(output_dir, step_logging=True):
                                 lift_time_new = calculate_lift_time(from_station_row, transporter)
                                 transfer_time_new = calculate_physics_transfer_time(from_station_row, to_station_row, transporter)
                                 sink_time_new = calculate_sink_time(to_station_row, transporter)
+                                physics_evaluations += 2
 
                                 changeover_time = (prev_lift + prev_transfer + prev_sink) + (lift_time_new + transfer_time_new + sink_time_new)
                                 required_free_time = existing_task['ExitTime'] + changeover_time
@@ -277,8 +312,9 @@ def generate_matrix_original(output_dir, step_logging=True):
                     delay = earliest_free - current_time
                     batch_start_time += delay
                     conflict_found = True
-                    # logger.log("CONFLICT", f"Batch {batch_id} stage {stage_idx}: delay {delay:.1f}s")
-                    logger.log("CONFLICT", f"Batch {batch_id} stage {stage_idx}: delay {delay:.1f}s")
+                    observe("matrix_conflict_delay_seconds", delay)
+                    if logger.enabled("CONFLICT"):
+                        logger.log("CONFLICT", f"Batch {batch_id} stage {stage_idx}: delay {delay:.1f}s", batch=batch_id, value=delay)
                     break
 
             if not conflict_found:
@@ -300,26 +336,35 @@ def generate_matrix_original(output_dir, step_logging=True):
                 production_df.loc[production_df['Batch'] == batch_id, 'Start_time_seconds'] = new_sec
                 break
 
+        observe("matrix_batch_attempts", attempt + 1)
         if attempt >= max_attempts - 1:
-            logger.log("ERROR", f"Batch {batch_id} failed after {max_attempts} attempts")
+            inc("matrix_batch_failures_total")
+            logger.log("ERROR", f"Batch {batch_id} failed after {max_attempts} attempts", batch=batch_id)
             # logger.log("ERROR", f"Batch {batch_id} failed after {max_attempts} attempts")
+    conflict_span.end(tasks=len(all_tasks))
+    count_physics_evaluations(physics_evaluations, physics_evaluations, physics_evaluations)
     # Muunna DataFrameksi
     matrix_df = pd.DataFrame(all_tasks)
 
 
     # Tallenna vain logs-kansioon vaihe 4:lle
-    logs_dir = os.path.join(output_dir, "logs")
-    os.makedirs(logs_dir, exist_ok=True)
+    logs_dir = os.path.join(output_dir, "logs") if output_dir else "logs"
     logs_file = os.path.join(logs_dir, "line_matrix_original.csv")
-    matrix_df.to_csv(logs_file, index=False)
-
-
-    # Tallenna päivitetty production_df takaisin simulaatiokansion Production.csv
-    prod_file = os.path.join(output_dir, "initialization", "Production.csv")
-    os.makedirs(os.path.dirname(prod_file), exist_ok=True)
-    production_df.to_csv(prod_file, index=False)
+    if ctx is not None:
+        ctx.put("line_matrix_original", matrix_df)
+        ctx.put("production", production_df)
+    else:
+        os.makedirs(logs_dir, exist_ok=True)
+        write_table(matrix_df, logs_file)
+
+        # Tallenna päivitetty production_df takaisin simulaatiokansion Production.csv
+        prod_file = os.path.join(output_dir, "initialization", "Production.csv")
+        os.makedirs(os.path.dirname(prod_file), exist_ok=True)
+        production_df.to_csv(prod_file, index=False)
 
     logger.log("MATRIX_GEN", f"Matrix saved: {logs_file}")
+    if own_logger:
+        logger.close()
     # logger.log("MATRIX_GEN", f"Original matrix generated: {len(matrix_df)} tasks")
 
     return matrix_df
@@ -1,11 +1,13 @@
 import os
 import pandas as pd
-from datetime import datetime
-from transporter_physics import calculate_physics_transfer_time, calculate_lift_time, calculate_sink_time
+from simulation_logger import get_logger
+from transporter_physics import calculate_physics_transfer_time, calculate_lift_time, calculate_sink_time, count_physics_evaluations
+from pipeline_context import program_table_name
+from table_io import write_table
 
 def load_stations(output_dir):
     """Lataa Stations.csv tiedoston"""
-    stations_file = os.path.join(output_dir, "Initialization", "Stations.csv")
+    stations_file = os.path.join(output_dir, "initialization", "Stations.csv")
     if not os.path.exists(stations_file):
         raise FileNotFoundError(f"Stations.csv ei löydy: {stations_file}")
     return pd.read_csv(stations_file)
@@ -59,7 +61,7 @@ def select_available_station(min_stat, max_stat, station_reservations, entry_tim
 
 def load_production_batches_stretched(output_dir):
     """Lataa Production.csv ja palauttaa tuotantoerien tiedot päivitetyillä lähtöajoilla"""
-    file_path = os.path.join(output_dir, "Initialization", "Production.csv")
+    file_path = os.path.join(output_dir, "initialization", "Production.csv")
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Production.csv ei löydy: {file_path}")
     df = pd.read_csv(file_path)
@@ -83,8 +85,10 @@ def load_batch_program_optimized(programs_dir, batch_id, treatment_program):
         raise FileNotFoundError(f"Eräohjelmaa ei löydy: {file_path}")
     
     df = pd.read_csv(file_path)
-    
-    # Muunna ajat sekunteiksi
+    return program_times_to_seconds(df)
+
+def program_times_to_seconds(df):
+    """Muuntaa ohjelman MinTime/MaxTime/CalcTime-sarakkeet HH:MM:SS -> sekunneiksi"""
     df["MinTime"] = pd.to_timedelta(df["MinTime"]).dt.total_seconds()
     df["MaxTime"] = pd.to_timedelta(df["MaxTime"]).dt.total_seconds()
     
@@ -96,7 +100,7 @@ def load_batch_program_optimized(programs_dir, batch_id, treatment_program):
     return df
 
 
-def generate_matrix_stretched_pure(output_dir):
+def generate_matrix_stretched_pure(output_dir, ctx=None):
     """
     Luo lopullisen matriisin päivitetyn Production.csv:n ja optimoitujen ohjelmien perusteella.
     EI ratkaise konflikteja, EI päivitä Production.csv:ää.
@@ -107,20 +111,30 @@ def generate_matrix_stretched_pure(output_dir):
     3. Laskee EntryTime/ExitTime peräkkäisesti ohjelman vaiheiden mukaan
     4. Huomioi rinnakkaiset asemat (MinStat-MaxStat) asemavarausten kanssa
     5. Laskee nostimen fysiikan (Phase_1, Phase_2, Phase_3, Phase_4)
+
+    Jos ctx (PipelineContext) annetaan, lähtötiedot ja optimoidut ohjelmat
+    luetaan siitä ja matriisi tallennetaan siihen (output_dir voi tällöin olla None).
     """
-    logs_dir = os.path.join(output_dir, "Logs")
-    optimized_dir = os.path.join(output_dir, "optimized_programs")
+    logs_dir = os.path.join(output_dir or "", "logs")
+    optimized_dir = os.path.join(output_dir or "", "optimized_programs")
     output_file = os.path.join(logs_dir, "line_matrix_stretched.csv")
     
     # Lataa lähtötiedot - päivitetty Production.csv jossa Start_time ON oikein
-    production_df = load_production_batches_stretched(output_dir)
-    stations_df = load_stations(output_dir)
-    transporters_df = pd.read_csv(os.path.join(output_dir, "Initialization", "Transporters.csv"))
+    if ctx is not None:
+        production_df = ctx.get("production").copy()
+        production_df["Start_time_seconds"] = pd.to_timedelta(production_df["Start_time"]).dt.total_seconds()
+        stations_df = ctx.get("stations")
+        transporters_df = ctx.get("transporters")
+    else:
+        production_df = load_production_batches_stretched(output_dir)
+        stations_df = load_stations(output_dir)
+        transporters_df = pd.read_csv(os.path.join(output_dir, "initialization", "Transporters.csv"))
     
     # Asemavaraukset rinnakkaisten asemien hallintaan
     station_reservations = {}
     
     all_rows = []
+    transfers = stages = 0  # Fysiikkalaskennat (metriikka)
     
     # Käy läpi jokainen erä
     for _, batch_row in production_df.iterrows():
@@ -129,7 +143,10 @@ def generate_matrix_stretched_pure(output_dir):
         treatment_program = int(batch_row["Treatment_program"])
         start_time_seconds = float(batch_row["Start_time_seconds"])
 
-        prog_df = load_batch_program_optimized(optimized_dir, batch_id, treatment_program)
+        if ctx is not None:
+            prog_df = program_times_to_seconds(ctx.get(program_table_name("optimized_programs", batch_id, treatment_program)).copy())
+        else:
+            prog_df = load_batch_program_optimized(optimized_dir, batch_id, treatment_program)
 
         all_rows.append({
             "Batch": batch_id,
@@ -185,6 +202,8 @@ def generate_matrix_stretched_pure(output_dir):
             phase_2 = calculate_lift_time(lift_station_row, transporter)
             phase_3 = calculate_physics_transfer_time(lift_station_row, sink_station_row, transporter)
             phase_4 = calculate_sink_time(sink_station_row, transporter)
+            transfers += 1 if i == 0 else 2
+            stages += 1
 
             transport_time = phase_2 + phase_3 + phase_4
             entry_time = int(previous_exit + transport_time)
@@ -216,6 +235,8 @@ def generate_matrix_stretched_pure(output_dir):
             previous_sink_stat = sink_stat
             previous_exit = exit_time
     
+    count_physics_evaluations(transfer=transfers, lift=stages, sink=stages)
+
     # Luo DataFrame ja tallenna
     matrix = pd.DataFrame(all_rows)
     
@@ -224,22 +245,23 @@ def generate_matrix_stretched_pure(output_dir):
         matrix[col] = matrix[col].round(2)
     
     # Tallenna matriisi
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    matrix.to_csv(output_file, index=False)
+    if ctx is not None:
+        ctx.put("line_matrix_stretched", matrix)
+    else:
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        write_table(matrix, output_file)
     
     # Lokita toiminta
-    log_file = os.path.join(logs_dir, "simulation_log.csv")
-    if os.path.exists(log_file):
-        with open(log_file, "a", encoding="utf-8") as f:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            f.write(f"{timestamp},TASK,Stretched matrix generated (pure): {os.path.basename(output_file)}\n")
-            f.write(f"{timestamp},TASK,Rows in stretched matrix: {len(matrix)}\n")
+    logger = get_logger()
+    if logger is not None:
+        logger.log("TASK", f"Stretched matrix generated (pure): {os.path.basename(output_file)}")
+        logger.log("TASK", f"Rows in stretched matrix: {len(matrix)}", value=len(matrix))
     
     return matrix
 
-def generate_matrix_stretched(output_dir):
+def generate_matrix_stretched(output_dir, ctx=None):
     """Wrapper-funktio yhteensopivuuden vuoksi"""
-    return generate_matrix_stretched_pure(output_dir)
+    return generate_matrix_stretched_pure(output_dir, ctx=ctx)
 
 if __name__ == "__main__":
     import sys
@@ -17,6 +17,7 @@ Date: 2025-08-05
 import pandas as pd
 import os
 from simulation_logger import get_logger
+from table_io import read_table, table_exists
 
 
 def time_to_seconds(time_str):
@@ -53,9 +54,9 @@ def generate_production_report(output_dir="output"):
     logger.log_data("Production report generation started")
     
     # Paths
-    production_file = os.path.join(output_dir, "Initialization", "Production.csv")
+    production_file = os.path.join(output_dir, "initialization", "Production.csv")
     matrix_file = os.path.join(output_dir, "logs", "line_matrix_stretched.csv")
-    reports_dir = os.path.join(output_dir, "Reports")
+    reports_dir = os.path.join(output_dir, "reports")
     report_file = os.path.join(reports_dir, "production_report.html")
     
     # Check if files exist
@@ -63,13 +64,13 @@ def generate_production_report(output_dir="output"):
         logger.log_error(f"Production file not found: {production_file}")
         raise FileNotFoundError(f"Production file not found: {production_file}")
     
-    if not os.path.exists(matrix_file):
+    if not table_exists(matrix_file):
         logger.log_error(f"Matrix file not found: {matrix_file}")
         raise FileNotFoundError(f"Matrix file not found: {matrix_file}")
     
     # Load data
     production_df = pd.read_csv(production_file)
-    matrix_df = pd.read_csv(matrix_file)
+    matrix_df = read_table(matrix_file)
     
     # Convert Start_time to seconds (add the missing column)
     production_df['Start_time_seconds'] = production_df['Start_time'].apply(time_to_seconds)
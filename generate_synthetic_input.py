@@ -0,0 +1,309 @@
+"""
+Synteettisen linjan ja tuotannon generointi kuormitus- ja skaalaustesteihin
+
+Luo johdonmukaiset lähtötiedot halutussa mittakaavassa samassa muodossa kuin
+initialization-kansion tiedostot:
+    Stations.csv, Transporters.csv, Transporters_start_positions.csv,
+    Treatment_program_001.csv ... Treatment_program_NNN.csv, Production.csv
+
+Linja koostuu asemaryhmistä: lastaus/purkuasema, varastoasemat ja
+käsittelyryhmät (huuhtelut yksittäisiä, prosessialtaat 1..N rinnakkaista
+asemaa). Nostimien vastuualueet jaetaan ryhmittäin ja laajennetaan
+naapurialueelle zone_overlap ryhmän verran, jolloin erä voi vaihtaa nostinta
+päällekkäisellä alueella. Ohjelmat kulkevat linjaa eteenpäin ja palaavat
+varastoon; jokainen siirto on yhden nostimen alueella (ks.
+extract_transporter_tasks.select_capable_transporter), joten kaikki
+generoidut ohjelmat ovat ajettavissa.
+
+Sama siemen (seed) ja samat parametrit tuottavat aina täsmälleen samat
+tiedostot.
+
+Käyttö:
+    python generate_synthetic_input.py synthetic --stations 120 --transporters 6 --batches 200 --seed 1
+
+    from generate_synthetic_input import synthetic_config
+    result = simulate(synthetic_config(seed=1, stations=120, transporters=6, batches=200))
+"""
+
+import csv
+import os
+import random
+
+FIRST_STATION = 301
+X_START = 1000
+ZONE_MARGIN = 100  # mm vastuualueen reunoilla (pienempi kuin asemaväli)
+
+# Käsittelyaltaiden nimet (prosessit); huuhtelut ovat aina "Huuhtelu"
+PROCESS_NAMES = ["Esihuuhtelu", "Rasvanpoisto", "Peittaus", "Tina", "Happokasto",
+                 "Sinkaatti", "Aktivointi", "Alkaalinen kupari"]
+
+# Nostimien fysiikkaparametrit (samat kuin toimitetussa linjassa)
+TRANSPORTER_PHYSICS = {
+    "Acceleration_time (s)": 2.0,
+    "Deceleration_time (s)": 2.0,
+    "Max_speed (mm/s)": 300,
+    "Z_total_distance (mm)": 1800,
+    "Z_slow_distance_dry (mm)": 300,
+    "Z_slow_distance_wet (mm)": 1500,
+    "Z_slow_end_distance (mm)": 50,
+    "Z_slow_speed (mm/s)": 100,
+    "Z_fast_speed (mm/s)": 200,
+}
+
+STATION_COLUMNS = ["Number", "Name", "X Position", "Dropping_Time", "Station_type", "Device_delay"]
+TRANSPORTER_COLUMNS = ["Transporter_id", "Min_x_position", "Max_x_Position"] + list(TRANSPORTER_PHYSICS)
+PROGRAM_COLUMNS = ["Stage", "MinStat", "MaxStat", "MinTime", "MaxTime"]
+PRODUCTION_COLUMNS = ["Batch", "Treatment_program", "Start_station", "Start_time"]
+
+def _parse_interval(value):
+    """Aloitusväli sekunteina: luku tai HH:MM:SS"""
+    if isinstance(value, str) and ":" in value:
+        h, m, s = (float(part) for part in value.split(":"))
+        return h * 3600 + m * 60 + s
+    return float(value)
+
+def _range(value):
+    """Yksittäinen luku tai (min, max) -> (min, max)"""
+    if isinstance(value, (tuple, list)):
+        low, high = value
+    else:
+        low = high = value
+    if low > high:
+        raise ValueError(f"Virheellinen väli: {value}")
+    return int(low), int(high)
+
+def _build_groups(rng, stations, storage_stations, parallel, rinse_share):
+    """Asemaryhmät linjan järjestyksessä: dict(name, kind, size, min_time, max_time)"""
+    groups = [{"name": "Lastaus/purkaus", "kind": "load", "size": 1},
+              {"name": "Varasto", "kind": "storage", "size": storage_stations}]
+    remaining = stations - 1 - storage_stations
+    par_low, par_high = parallel
+    while remaining > 0:
+        if rng.random() < rinse_share:
+            size = 1
+            min_time = rng.choice([30, 60])
+            max_time = min_time + rng.choice([60, 90])
+            group = {"name": "Huuhtelu", "kind": "rinse"}
+        else:
+            size = rng.randint(par_low, par_high)
+            # Pitkät käsittelyt tarvitsevat enemmän rinnakkaisia asemia
+            min_time = size * rng.randint(3, 8) * 60
+            max_time = min_time + rng.choice([30, 60, 120, 300])
+            group = {"name": rng.choice(PROCESS_NAMES), "kind": "process"}
+        size = min(size, remaining)
+        group.update(size=size, min_time=min_time, max_time=max_time)
+        groups.append(group)
+        remaining -= size
+    return groups
+
+def _zones(group_count, transporters, overlap):
+    """Nostinten vastuualueet ryhmäindekseinä [(lo, hi, oma_alku)] (tasajako + päällekkäisyys)"""
+    zones = []
+    for t in range(transporters):
+        start = t * group_count // transporters
+        end = (t + 1) * group_count // transporters - 1
+        zones.append((max(0, start - overlap), min(group_count - 1, end + overlap), start))
+    return zones
+
+def _reachable(zones, a, b):
+    return any(lo <= min(a, b) and max(a, b) <= hi for lo, hi, _ in zones)
+
+def _connect(zones, path):
+    """Lisää reitille välipysähdykset, jotta jokainen siirto on yhden nostimen alueella"""
+    result = [path[0]]
+    for target in path[1:]:
+        current = result[-1]
+        while not _reachable(zones, current, target):
+            if target > current:
+                step = max(min(hi, target) for lo, hi, _ in zones if lo <= current <= hi)
+            else:
+                step = min(max(lo, target) for lo, hi, _ in zones if lo <= current <= hi)
+            if step == current:
+                raise ValueError("Nostinalueet eivät kata linjaa (kasvata zone_overlap-arvoa)")
+            result.append(step)
+            current = step
+        result.append(target)
+    return result
+
+def _build_program(rng, groups, zones, stages):
+    """Ohjelma ryhmäindekseinä: varasto, eteenpäin, paluu, varasto, purku"""
+    treatment = list(range(2, len(groups)))
+    total = rng.randint(*stages)
+    forward_count = max(1, min(len(treatment), round(total * 0.8)))
+    forward = sorted(rng.sample(treatment, forward_count))
+    below = [g for g in treatment if g < forward[-1]]
+    backward = sorted(rng.sample(below, min(len(below), total - forward_count)), reverse=True)
+    return _connect(zones, [1] + forward + backward + [1, 0])
+
+def generate_synthetic_tables(seed=0, stations=42, storage_stations=5, transporters=3, zone_overlap=2,
+                              programs=2, program_stages=(8, 30), parallel=(1, 3), rinse_share=0.5,
+                              batches=10, start_interval=900):
+    """
+    Generoi lähtötaulukot rivilistoina (sarakejärjestys kuten tiedostoissa).
+
+    Args:
+        seed (int): Satunnaislukugeneraattorin siemen
+        stations (int): Asemien kokonaismäärä (lastausasema + varasto + käsittelyaltaat)
+        storage_stations (int): Varastoasemien määrä linjan alussa
+        transporters (int): Nostimien määrä (vastuualueet jaetaan tasan linjan pituudelle)
+        zone_overlap (int): Naapurinostimen alueelle ulottuvien asemaryhmien määrä (>= 1)
+        programs (int): Käsittelyohjelmien määrä
+        program_stages (int | tuple): Käsittelyvaiheiden määrä ohjelmassa (min, max)
+            ilman varasto- ja purkuvaiheita; välipysähdykset voivat lisätä vaiheita
+        parallel (int | tuple): Prosessialtaan rinnakkaisten asemien määrä (min, max)
+        rinse_share (float): Huuhteluryhmien osuus käsittelyryhmistä
+        batches (int): Erien määrä
+        start_interval (float | str): Erien aloitusväli sekunteina tai HH:MM:SS
+
+    Returns:
+        dict: stations, transporters, transporters_start_positions, production
+            (rivilistat) ja treatment_programs (ohjelman numero -> rivilista)
+    """
+    if stations < storage_stations + 2:
+        raise ValueError(f"Asemia on oltava vähintään {storage_stations + 2} (lastaus, varasto ja yksi allas)")
+    if transporters < 1 or zone_overlap < 1:
+        raise ValueError("Nostimia ja alueiden päällekkäisyyttä on oltava vähintään 1")
+    rng = random.Random(seed)
+    groups = _build_groups(rng, stations, storage_stations, _range(parallel), rinse_share)
+    if transporters > len(groups):
+        raise ValueError(f"Nostimia ({transporters}) on enemmän kuin asemaryhmiä ({len(groups)})")
+
+    # Asemat: numerot juoksevasti, ryhmän sisällä tiheämpi väli
+    station_rows = []
+    number = FIRST_STATION
+    x = X_START
+    for group in groups:
+        group["first"] = number
+        group["first_x"] = x
+        wet = group["kind"] in ("rinse", "process")
+        for i in range(group["size"]):
+            if i > 0:
+                x += rng.randint(500, 600) if group["kind"] == "storage" else rng.randint(900, 1000)
+            station_rows.append([number, group["name"], x, 10 if wet else 0, 1 if wet else 0, 0.0])
+            number += 1
+        group["last"] = number - 1
+        group["last_x"] = x
+        x += rng.randint(500, 1000)
+
+    zones = _zones(len(groups), transporters, zone_overlap)
+    transporter_rows = []
+    start_rows = []
+    for t, (lo, hi, own_start) in enumerate(zones, start=1):
+        transporter_rows.append([t, groups[lo]["first_x"] - ZONE_MARGIN, groups[hi]["last_x"] + ZONE_MARGIN]
+                                + list(TRANSPORTER_PHYSICS.values()))
+        start_rows.append([t, groups[own_start]["first"]])
+
+    from time_utils import format_seconds_hhmmss
+    program_rows = {}
+    for program in range(1, programs + 1):
+        rows = []
+        path = _build_program(rng, groups, zones, _range(program_stages))
+        for stage, g in enumerate(path, start=1):
+            group = groups[g]
+            if group["kind"] == "load":
+                min_time = max_time = 0
+            elif group["kind"] == "storage":
+                min_time, max_time = 0, 1800
+            else:
+                min_time, max_time = group["min_time"], group["max_time"]
+            rows.append([stage, group["first"], group["last"], min_time, max_time])
+        # Ajat HH:MM:SS-muotoon kerralla (kokonaisiksi sekunneiksi pyöristettyinä)
+        for col in (3, 4):
+            for row, hms in zip(rows, format_seconds_hhmmss([round(r[col]) for r in rows])):
+                row[col] = hms
+        program_rows[program] = rows
+
+    interval = _parse_interval(start_interval)
+    start_times = format_seconds_hhmmss([round((batch - 1) * interval) for batch in range(1, batches + 1)])
+    production_rows = [[batch, rng.randint(1, programs), FIRST_STATION, start]
+                       for batch, start in zip(range(1, batches + 1), start_times)]
+
+    return {
+        "stations": station_rows,
+        "transporters": transporter_rows,
+        "transporters_start_positions": start_rows,
+        "production": production_rows,
+        "treatment_programs": program_rows,
+    }
+
+def _write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def generate_synthetic_input(output_dir, **params):
+    """
+    Kirjoittaa synteettiset lähtötiedostot kansioon output_dir (vanhat
+    Treatment_program-tiedostot poistetaan). Parametrit kuten
+    generate_synthetic_tables.
+
+    Returns:
+        dict: generate_synthetic_tables-tulos
+    """
+    tables = generate_synthetic_tables(**params)
+    os.makedirs(output_dir, exist_ok=True)
+    for fname in os.listdir(output_dir):
+        if fname.startswith("Treatment_program_") and fname.endswith(".csv"):
+            os.remove(os.path.join(output_dir, fname))
+    _write_csv(os.path.join(output_dir, "Stations.csv"), STATION_COLUMNS, tables["stations"])
+    _write_csv(os.path.join(output_dir, "Transporters.csv"), TRANSPORTER_COLUMNS, tables["transporters"])
+    # Sama muoto kuin toimitetussa tiedostossa (lukijat poistavat välilyönnit)
+    with open(os.path.join(output_dir, "Transporters_start_positions.csv"), "w", encoding="utf-8") as f:
+        f.write("Transporter, Start_station\n")
+        for transporter, station in tables["transporters_start_positions"]:
+            f.write(f"{transporter}, {station}\n")
+    for program, rows in tables["treatment_programs"].items():
+        _write_csv(os.path.join(output_dir, f"Treatment_program_{program:03d}.csv"), PROGRAM_COLUMNS, rows)
+    _write_csv(os.path.join(output_dir, "Production.csv"), PRODUCTION_COLUMNS, tables["production"])
+    return tables
+
+def synthetic_config(**params):
+    """
+    Synteettiset lähtötiedot simulate()-syötteenä (kuten simulation_api.load_config)
+    kirjoittamatta levylle. Parametrit kuten generate_synthetic_tables.
+    """
+    import pandas as pd
+    tables = generate_synthetic_tables(**params)
+    return {
+        "stations": pd.DataFrame(tables["stations"], columns=STATION_COLUMNS),
+        "transporters": pd.DataFrame(tables["transporters"], columns=TRANSPORTER_COLUMNS),
+        "transporters_start_positions": pd.DataFrame(tables["transporters_start_positions"],
+                                                     columns=["Transporter", "Start_station"]),
+        "production": pd.DataFrame(tables["production"], columns=PRODUCTION_COLUMNS),
+        "treatment_programs": {number: pd.DataFrame(rows, columns=PROGRAM_COLUMNS)
+                               for number, rows in tables["treatment_programs"].items()},
+    }
+
+if __name__ == "__main__":
+    import argparse
+
+    def int_range(text):
+        parts = [int(p) for p in text.split("-")]
+        return (parts[0], parts[-1])
+
+    parser = argparse.ArgumentParser(description="Synteettisen linjan ja tuotannon generointi")
+    parser.add_argument("output_dir", help="Kohdekansio (esim. initialization_synthetic)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stations", type=int, default=42, help="Asemien kokonaismäärä")
+    parser.add_argument("--storage-stations", type=int, default=5, help="Varastoasemien määrä")
+    parser.add_argument("--transporters", type=int, default=3)
+    parser.add_argument("--zone-overlap", type=int, default=2, help="Päällekkäiset asemaryhmät nostinalueiden välillä")
+    parser.add_argument("--programs", type=int, default=2)
+    parser.add_argument("--program-stages", type=int_range, default=(8, 30), metavar="MIN-MAX",
+                        help="Käsittelyvaiheita ohjelmassa")
+    parser.add_argument("--parallel", type=int_range, default=(1, 3), metavar="MIN-MAX",
+                        help="Rinnakkaisia asemia prosessialtaassa")
+    parser.add_argument("--rinse-share", type=float, default=0.5, help="Huuhteluryhmien osuus")
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--start-interval", default="900", help="Erien aloitusväli (s tai HH:MM:SS)")
+    args = parser.parse_args()
+    tables = generate_synthetic_input(
+        args.output_dir, seed=args.seed, stations=args.stations, storage_stations=args.storage_stations,
+        transporters=args.transporters, zone_overlap=args.zone_overlap, programs=args.programs,
+        program_stages=args.program_stages, parallel=args.parallel, rinse_share=args.rinse_share,
+        batches=args.batches, start_interval=args.start_interval,
+    )
+    print(f"✅ Synteettinen linja kansiossa {args.output_dir}: {len(tables['stations'])} asemaa, "
+          f"{len(tables['transporters'])} nostinta, {len(tables['treatment_programs'])} ohjelmaa, "
+          f"{len(tables['production'])} erää")
@@ -4,6 +4,7 @@
 import pandas as pd
 import os
 from simulation_logger import get_logger
+from table_io import read_table, write_table, table_exists
 
 def select_capable_transporter(lift_station, sink_station, stations_df, transporters_df):
     """
@@ -54,36 +55,49 @@ def select_capable_transporter(lift_station, sink_station, stations_df, transpor
     print(msg)
     raise RuntimeError(msg)
 
-def generate_tasks(output_dir):
-    """Luo kuljetintehtävät line_matrix_original.csv:n perusteella"""
+def generate_tasks(output_dir, save_ordered=True, ctx=None):
+    """
+    Luo kuljetintehtävät line_matrix_original.csv:n perusteella.
+    Jos save_ordered=False, tehtäviä ei järjestetä eikä _ordered-tiedostoa kirjoiteta
+    (yhdistetty vaihe 5 järjestää tehtävät itse), ja toinen paluuarvo on None.
+    Jos ctx (PipelineContext) annetaan, lähtötiedot luetaan siitä ja tehtävät tallennetaan siihen
+    (output_dir voi tällöin olla None).
+    """
     logger = get_logger()
     if logger is None:
         raise RuntimeError("Logger is not initialized. Call init_logger(output_dir) before using generate_tasks.")
     # STEP-tyyppinen aloitusviesti terminaaliin ja lokiin
     logger.log("STEP", "STEP 5 STARTED: GENERATE TASKS")
-    matrix_file = os.path.join(output_dir, "logs", "line_matrix_original.csv")
-    if not os.path.exists(matrix_file):
+    matrix_file = os.path.join(output_dir or "", "logs", "line_matrix_original.csv")
+    if ctx is None and not table_exists(matrix_file):
         logger.log_error(f"line_matrix_original.csv ei löydy: {matrix_file}")
         raise FileNotFoundError(f"line_matrix_original.csv ei löydy: {matrix_file}")
     
     # Lataa asema- ja nostintiedot nostinvalintaa varten
-    stations_file = os.path.join(output_dir, "Initialization", "Stations.csv")
-    transporters_file = os.path.join(output_dir, "Initialization", "Transporters.csv")
-    if not os.path.exists(stations_file):
-        raise FileNotFoundError(f"Stations.csv ei löydy: {stations_file}")
-    if not os.path.exists(transporters_file):
-        raise FileNotFoundError(f"Transporters.csv ei löydy: {transporters_file}")
-    
-    stations_df = pd.read_csv(stations_file)
-    transporters_df = pd.read_csv(transporters_file)
+    if ctx is not None:
+        stations_df = ctx.get("stations")
+        transporters_df = ctx.get("transporters")
+    else:
+        stations_file = os.path.join(output_dir, "initialization", "Stations.csv")
+        transporters_file = os.path.join(output_dir, "initialization", "Transporters.csv")
+        if not os.path.exists(stations_file):
+            raise FileNotFoundError(f"Stations.csv ei löydy: {stations_file}")
+        if not os.path.exists(transporters_file):
+            raise FileNotFoundError(f"Transporters.csv ei löydy: {transporters_file}")
+
+        stations_df = pd.read_csv(stations_file)
+        transporters_df = pd.read_csv(transporters_file)
     
     try:
-        df = pd.read_csv(matrix_file)
+        df = ctx.get("line_matrix_original") if ctx is not None else read_table(matrix_file)
         df = df.sort_values(["Batch", "Stage"]).reset_index(drop=True)
         tasks = []
         # Lue Production.csv start-asemat
-        production_file = os.path.join(os.path.dirname(matrix_file), "..", "Initialization", "Production.csv")
-        production_df = pd.read_csv(production_file)
+        if ctx is not None:
+            production_df = ctx.get("production").copy()
+        else:
+            production_file = os.path.join(os.path.dirname(matrix_file), "..", "initialization", "Production.csv")
+            production_df = pd.read_csv(production_file)
         production_df["Batch"] = production_df["Batch"].astype(int)
         production_df["Treatment_program"] = production_df["Treatment_program"].astype(int)
         batch_start_station = {
@@ -289,9 +303,9 @@ def generate_tasks(output_dir):
         logger.log_error(f"Kuljetintehtävien generointi epäonnistui: {e}")
         raise
     
-    os.makedirs(output_dir, exist_ok=True)
-    logs_dir = os.path.join(output_dir, "logs")
-    os.makedirs(logs_dir, exist_ok=True)
+    logs_dir = os.path.join(output_dir or "", "logs")
+    if ctx is None:
+        os.makedirs(logs_dir, exist_ok=True)
     raw_file = os.path.join(logs_dir, "transporter_tasks_raw.csv")
     # Pakota vielä ennen tallennusta kaikki ohjelma-, vaihe-, asema- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella
     for col in ["Transporter_id", "Batch", "Treatment_program", "Stage", "Lift_stat", "Sink_stat"]:
@@ -300,7 +314,13 @@ def generate_tasks(output_dir):
     for col in ["Lift_time", "Sink_time"]:
         if col in tasks_df.columns:
             tasks_df[col] = tasks_df[col].apply(lambda x: int(round(x)))
-    tasks_df.to_csv(raw_file, index=False)
+    if ctx is not None:
+        ctx.put("transporter_tasks_raw", tasks_df)
+    else:
+        write_table(tasks_df, raw_file)
+    if not save_ordered:
+        logger.log("STEP", "STEP 5 COMPLETED: GENERATE TASKS")
+        return tasks_df, None
     
     # ⭐ KRIITTINEN KORJAUS: Järjestetään tehtävät NOSTINKOHTAISESTI aikajärjestykseen!
     ordered_df = tasks_df.sort_values(["Transporter_id", "Lift_time"]).reset_index(drop=True)
@@ -311,8 +331,11 @@ def generate_tasks(output_dir):
     for col in ["Lift_time", "Sink_time"]:
         if col in ordered_df.columns:
             ordered_df[col] = ordered_df[col].apply(lambda x: int(round(x)))
-    ordered_file = os.path.join(logs_dir, "transporter_tasks_ordered.csv")
-    ordered_df.to_csv(ordered_file, index=False)
+    if ctx is not None:
+        ctx.put("transporter_tasks_ordered", ordered_df)
+    else:
+        ordered_file = os.path.join(logs_dir, "transporter_tasks_ordered.csv")
+        write_table(ordered_df, ordered_file)
     # STEP-tyyppinen lopetusviesti terminaaliin ja lokiin
     logger.log("STEP", "STEP 5 COMPLETED: GENERATE TASKS")
     return tasks_df, ordered_df
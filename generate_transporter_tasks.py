@@ -1,17 +1,17 @@
-import pandas as pd
 import os
+from table_io import read_table, write_table, table_exists
 
 def generate_transporter_tasks(output_dir):
     # Oletetaan, että tarvittavat tiedot on luettu DataFrameen df
     # df:ssä sarakkeet: Batch, Stage, Lift_stat, Sink_stat, Phase_1, Phase_2, Phase_3, Phase_4, Lift_time
     # Tässä esimerkissä lasketaan Sink_time kaavalla: Lift_time + Phase_2 + Phase_3 + Phase_4
-    tasks_file = os.path.join(output_dir, "Logs", "transporter_tasks_raw.csv")
-    df = pd.read_csv(tasks_file)
+    tasks_file = os.path.join(output_dir, "logs", "transporter_tasks_raw.csv")
+    df = read_table(tasks_file)
     if not all(col in df.columns for col in ["Lift_time", "Phase_2", "Phase_3", "Phase_4"]):
         raise ValueError("Puuttuvia sarakkeita: Lift_time, Phase_2, Phase_3, Phase_4")
     df["Sink_time"] = df["Lift_time"] + df["Phase_2"] + df["Phase_3"] + df["Phase_4"]
     # Tallennus (jos halutaan)
-    df.to_csv(tasks_file, index=False)
+    write_table(df, tasks_file)
     return df
 
 def create_transporter_tasks_final(output_dir):
@@ -27,10 +27,10 @@ def create_transporter_tasks_final(output_dir):
     stretched_file = os.path.join(logs_dir, "transporter_tasks_stretched.csv")
     
     # Valitse paras saatavilla oleva nostintehtävätiedosto
-    if os.path.exists(optimized_file):
+    if table_exists(optimized_file):
         transporter_file = optimized_file
         source_type = "optimized"
-    elif os.path.exists(stretched_file):
+    elif table_exists(stretched_file):
         transporter_file = stretched_file
         source_type = "stretched"
     else:
@@ -43,14 +43,14 @@ def create_transporter_tasks_final(output_dir):
     final_file = os.path.join(logs_dir, "transporter_tasks_final.csv")
     
     # Tarkista, että line_matrix_stretched.csv on olemassa
-    if not os.path.exists(matrix_file):
+    if not table_exists(matrix_file):
         from datetime import datetime
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')}] VIRHE: line_matrix_stretched.csv puuttuu polusta: {matrix_file}")
         print("Pipeline keskeytetään. Varmista, että vaihe generate_matrix_stretched on ajettu ennen tätä.")
         raise FileNotFoundError(f"line_matrix_stretched.csv puuttuu polusta: {matrix_file}")
     
-    df_transporter = pd.read_csv(transporter_file)
-    df_matrix = pd.read_csv(matrix_file)
+    df_transporter = read_table(transporter_file)
+    df_matrix = read_table(matrix_file)
     
     print(f"[DEBUG] Käytetään {source_type} nostintehtäviä: {transporter_file}")
     # Oletetaan, että df_transporter: Batch, Treatment_program, Stage, Lift_stat, Sink_stat, ...
@@ -78,7 +78,7 @@ def create_transporter_tasks_final(output_dir):
         sink_times.append(sink_time)
     df_transporter["Lift_time"] = lift_times
     df_transporter["Sink_time"] = sink_times
-    df_transporter.to_csv(final_file, index=False)
+    write_table(df_transporter, final_file)
     return final_file
 
 # Esimerkkikäyttö:
@@ -12,75 +12,93 @@ Suorittaa tuotantolinjan simulaatioputken:
 7. Raporttien muodostus
 
 Optimointi hoidetaan vaiheessa 5 (stretch_transporter_tasks)
-"""
-
-from create_simulation_directory import create_simulation_directory
-from test_step3 import generate_matrix_step3
-from test_step4 import test_step_4
-from generate_tasks import generate_tasks
-from order_tasks import order_tasks
-from stretch_transporter_tasks import stretch_tasks
-from visualize_stretched_matrix import visualize_stretched_matrix
-from generate_matrix_stretched import generate_matrix_stretched
-from resolve_station_conflicts import resolve_station_conflicts
-from test_step2 import create_original_programs
-from test_step1 import test_step_1
-from test_step2 import test_step_2
-from test_step3 import test_step_3
-from test_step4 import test_step_4
-from test_step5 import test_step_5
-from test_step6 import test_step_6
-from test_step7 import test_step_7
-from extract_transporter_tasks import extract_transporter_tasks
-from generate_transporters_movement import generate_transporters_movement
-import os
-
-def test_main():
-    """
-    Suorittaa simulaattorilogiikan vaiheet 1–7:
-    """
-    try:
-        # VAIHE 1: Simulaatiokansion luonti
-        output_dir = test_step_1()
-
-        # VAIHE 2: Käsittelyohjelmien luonti
-        test_step_2(output_dir)
 
-        # VAIHE 2.5: Kopioi original_programs optimized_programs-kansioon
-        from copy_originals_to_stretched import copy_originals_to_optimized
-        copy_originals_to_optimized(output_dir)
+Vaiheet välittävät lähtötiedot ja välitaulukot toisilleen muistissa
+PipelineContext-olion kautta; CsvSink tallentaa ne myös simulaatiokansioon.
+Vaiheet 2-7 on määritelty pipeline_steps.PIPELINE_STEPS-listassa; vaihe
+ohitetaan, jos sen syötteiden ja koodin tiiviste löytyy välimuistista
+(output/.step_cache). --dry-run listaa ajettavat vaiheet.
 
-        # VAIHE 3: Alkuperäisen matriisin luonti
-        test_step_3(output_dir)
+Jokaisesta vaiheesta kirjoitetaan tarkistuspiste simulaatiokansion
+checkpoints-kansioon. Keskeytynyt ajo jatketaan samaan kansioon:
+    python main.py --resume output/<aikaleima> [--from-step N]
 
-        # VAIHE 4: Alkuperäisen matriisin visualisointi
-        test_step_4(output_dir)
+Vaiheiden riippuvuudet johdetaan niiden syötteistä ja tulosteista;
+riippumattomat vaiheet ajetaan rinnakkain (--jobs N). --only ja --skip
+rajaavat ajettavia vaiheita nimellä tai ryhmällä, esim. --only reports.
 
-        # VAIHE 5: Nostimien tehtävien käsittely
-        test_step_5(output_dir)
+--input-mode link vie muuttumattomat lähtötiedostot simulaatiokansioon kovina
+linkkeinä jaettuun varastoon (output/.input_store) kopioinnin sijaan.
 
-        # VAIHE 6: Muokatun matriisin luonti (käyttää aina fysiikkaa)
-        generate_matrix_stretched(output_dir)
+Kirjastokäyttöön ilman simulaatiokansiota: simulation_api.simulate(config).
 
-        # VAIHE 6.1: Erotetaan nostintehtävät LOPULLISESTA matriisista
-        tasks_from_matrix = extract_transporter_tasks(output_dir)
+--fixed-point venyttää vaiheessa 5 nostintehtävät kiintopisteeseen asti kaikilla
+nostimilla (oletus config.STRETCH_FIXED_POINT); jos se ei konvergoi, vaihe keskeytyy.
 
-        # VAIHE 6.2: Luodaan yksityiskohtaiset nostimien liikkeet
-        from extract_transporter_tasks import create_detailed_movements
-        detailed_movements = create_detailed_movements(output_dir)
+--profile ajaa jokaisen vaiheen profiloijan alla (logs/profiles/<vaihe>.prof)
+ja kokoaa hotspot-taulukon reports/profile_hotspots.csv:hen.
+"""
 
-        # VAIHE 6.5: Nostinliikkeiden luonti (optimoiduista tehtävistä)
-        generate_transporters_movement(output_dir)
+# Vaihemoduulit (pandas, matplotlib) ladataan vasta vaiheita ajettaessa
+# (pipeline_steps), jotta --help ja --dry-run käynnistyvät nopeasti.
+from test_step1 import test_step_1
+from pipeline_context import PipelineContext
+from pipeline_steps import PIPELINE_STEPS, run_pipeline, resume_pipeline, checkpoint_setup, set_stretch_fixed_point
+from pipeline_dag import select_steps
+from step_cache import StepCache
+from simulation_logger import init_logger
+from perf_spans import PerfRecorder
+from step_profiler import PROFILE_MODES, StepProfiler, profile_context
+from run_metrics import MetricsRegistry
+import config
+import os
 
-        # VAIHE 7: Muokatun matriisin visualisointi
-        test_step_6(output_dir)
+def test_main(sink=None, use_cache=True, jobs=1, only=None, skip=None, profile=None):
+    """
+    Suorittaa simulaattorilogiikan vaiheet 1–7:
 
-        # VAIHE 7: Raporttien muodostus (kuormitusanalyysi + kaikki raportit)
-        test_step_7(output_dir)
+    Args:
+        sink: PipelineContextin tallennuskohde (oletus CsvSink simulaatiokansioon)
+        use_cache (bool): Ohita vaiheet, joiden tulokset löytyvät välimuistista.
+            Välimuisti on käytössä vain, kun taulukot tallennetaan levylle.
+        jobs (int): Rinnakkain ajettavien riippumattomien vaiheiden enimmäismäärä.
+            Rinnakkaisajo vaatii levylle tallennuksen (oletus-sink).
+        only, skip (list): Ajettavien vaiheiden rajaus nimillä, numeroilla tai
+            ryhmillä (programs, matrix, tasks, visualization, reports)
+        profile (str): Profiloi vaiheet ("cprofile" / "sampling", ks. step_profiler)
+    """
+    try:
+        # VAIHE 1: Simulaatiokansion luonti
+        profiler = StepProfiler(None, profile) if profile else None
+        with profile_context(profiler, "setup"):
+            output_dir = test_step_1()
+        logger = init_logger(output_dir)
+        checkpoint_setup(output_dir)
+        perf = PerfRecorder(output_dir) if config.PERF_SPANS else None
+        if profiler is not None:
+            profiler.save(output_dir)
+        metrics = MetricsRegistry() if config.METRICS else None
+        ctx = PipelineContext(output_dir, sink=sink, logger=logger, perf=perf, profiler=profiler,
+                              metrics=metrics).load_inputs()
+        cache = StepCache.for_output_dir(output_dir) if use_cache and sink is None else None
+
+        # VAIHEET 2-7 (ks. pipeline_steps.PIPELINE_STEPS)
+        steps = select_steps(PIPELINE_STEPS, only=only, skip=skip)
+        run_pipeline(output_dir, ctx, steps=steps, cache=cache, jobs=jobs if sink is None else 1)
+    except Exception as e:
+        import traceback
+        print(f"❌ VIRHE simulaatiossa: {e}")
+        traceback.print_exc()
+        return
 
-        # VAIHE 7: Transporter-aikajakaumaraportti (uusi)
-        from report_transporter_time_distribution import report_transporter_time_distribution
-        report_transporter_time_distribution(output_dir)
+def resume_main(run_dir, from_step=None, use_cache=True, jobs=1, only=None, skip=None, profile=None):
+    """
+    Jatkaa keskeytynyttä ajoa kansiossa run_dir vaiheesta from_step
+    (oletus: ensimmäinen keskeneräinen vaihe).
+    """
+    try:
+        cache = StepCache.for_output_dir(run_dir) if use_cache else None
+        resume_pipeline(run_dir, from_step=from_step, cache=cache, only=only, skip=skip, jobs=jobs, profile=profile)
     except Exception as e:
         import traceback
         print(f"❌ VIRHE simulaatiossa: {e}")
@@ -88,4 +106,54 @@ def test_main():
         return
 
 if __name__ == "__main__":
-    test_main()
+    import argparse
+    from table_io import FORMATS, set_output_format
+    parser = argparse.ArgumentParser(description="Simulaatioputki")
+    parser.add_argument("--output-format", choices=FORMATS, default=None,
+                        help="Välitaulukoiden tiedostomuoto (oletus: config.OUTPUT_FORMAT / SIM_OUTPUT_FORMAT)")
+    parser.add_argument("--input-mode", choices=("copy", "link"), default=None,
+                        help="Lähtötiedostojen vienti simulaatiokansioon: kopiot tai kovat linkit "
+                             "jaettuun varastoon (oletus: config.INPUT_MODE / SIM_INPUT_MODE)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Aja kaikki vaiheet välimuistista riippumatta")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Listaa ajettavat ja välimuistista tulevat vaiheet ajamatta mitään")
+    parser.add_argument("--resume", metavar="RUN_DIR", default=None,
+                        help="Jatka keskeytynyttä ajoa olemassa olevassa simulaatiokansiossa")
+    parser.add_argument("--from-step", metavar="N", default=None,
+                        help="Vaihe, josta --resume jatkaa (esim. 5 tai 7.1)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Rinnakkain ajettavien riippumattomien vaiheiden enimmäismäärä (oletus: prosessorien määrä)")
+    parser.add_argument("--only", action="append", default=[],
+                        help="Aja vain nämä vaiheet tai ryhmät riippuvuuksineen (pilkuilla eroteltuna, esim. reports)")
+    parser.add_argument("--skip", action="append", default=[],
+                        help="Ohita nämä vaiheet tai ryhmät (esim. visualization)")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=PROFILE_MODES, default=None,
+                        help="Profiloi jokainen vaihe (logs/profiles/<vaihe>.prof, reports/profile_hotspots.csv); "
+                             "sampling käyttää pyinstrumentia, jos asennettu. Ohittaa välimuistin.")
+    parser.add_argument("--fixed-point", action="store_true",
+                        help="Venytä vaiheessa 5 kiintopisteeseen asti kaikilla nostimilla (oletus: config.STRETCH_FIXED_POINT)")
+    args = parser.parse_args()
+    # Profiloitaessa kaikki vaiheet ajetaan, jotta jokaisesta saadaan profiili
+    use_cache = not args.no_cache and not args.profile
+    only = [s.strip() for value in args.only for s in value.split(",")]
+    skip = [s.strip() for value in args.skip for s in value.split(",")]
+    if args.from_step is not None and args.resume is None:
+        parser.error("--from-step vaatii --resume-kansion")
+    try:
+        steps = select_steps(PIPELINE_STEPS, only=only, skip=skip)
+    except ValueError as e:
+        parser.error(str(e))
+    set_output_format(args.output_format)
+    set_stretch_fixed_point(True if args.fixed_point else None)
+    from create_simulation_directory import set_input_mode
+    set_input_mode(args.input_mode)
+    if args.dry_run:
+        from pipeline_steps import plan_pipeline, print_plan
+        from step_cache import CACHE_DIR_NAME
+        print_plan(plan_pipeline(StepCache(os.path.join("output", CACHE_DIR_NAME)), steps=steps))
+    elif args.resume:
+        resume_main(args.resume, from_step=args.from_step, use_cache=use_cache,
+                    jobs=args.jobs, only=only, skip=skip, profile=args.profile)
+    else:
+        test_main(use_cache=use_cache, jobs=args.jobs, only=only, skip=skip, profile=args.profile)
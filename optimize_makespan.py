@@ -6,13 +6,14 @@ Lue snapshotista tehtävälista, rakenna optimointimalli ja tallenna uusi aikata
 """
 import os
 import pandas as pd
-from pulp import LpProblem, LpMinimize, LpVariable, lpSum, LpStatus, value
 
 # Parametrit
 INPUT_FILENAME = "generate_tasks.csv"  # Muokkaa tarvittaessa
 OUTPUT_FILENAME = "optimized_schedule.csv"
 
 def optimize_makespan(input_path, output_path):
+    # PuLP ladataan vasta, kun optimointi todella ajetaan
+    from pulp import LpProblem, LpMinimize, LpVariable, lpSum, LpStatus, value
     print(f"Ladataan tehtävät: {input_path}")
     df = pd.read_csv(input_path)
 
@@ -75,7 +76,7 @@ def find_latest_logs_dir(base_dir="output"):
     # Etsitään kansiot, jotka noudattavat aikaleimaformaattia
     subdirs = sorted([d for d in subdirs if len(d) >= 16 and d[4] == '-' and d[7] == '-' and d[10] == '_' and d[13] == '-'], reverse=True)
     for d in subdirs:
-        logs_dir = os.path.join(base_dir, d, "Logs")
+        logs_dir = os.path.join(base_dir, d, "logs")
         if os.path.isdir(logs_dir):
             return logs_dir
     raise FileNotFoundError("Yhtään Logs-hakemistoa ei löytynyt output-kansiosta.")
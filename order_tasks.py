@@ -1,5 +1,14 @@
-import pandas as pd
 import os
+from table_io import read_table, write_table
+
+def order_tasks_df(df):
+    """
+    Järjestää tehtävätaulukon muistissa nostinkohtaisesti nostoajan (Lift_time) mukaan.
+    Ei lue eikä kirjoita tiedostoja.
+    """
+    # ⭐ KRIITTINEN KORJAUS: Järjestä nostinkohtaisesti aikajärjestykseen!
+    # Muuten eri nostimien tehtävät sekoittuvat ja aiheuttavat timeline-paradokseja
+    return df.sort_values(["Transporter_id", "Lift_time"]).reset_index(drop=True)
 
 def order_tasks(output_dir):
     """
@@ -9,9 +18,9 @@ def order_tasks(output_dir):
     from simulation_logger import get_logger
     logger = get_logger()
     logger.log("STEP", "STEP 5 STARTED: ORDER TASKS")
-    tasks_csv = os.path.join(output_dir, "Logs", "transporter_tasks_raw.csv")
-    ordered_csv = os.path.join(output_dir, "Logs", "transporter_tasks_ordered.csv")
-    df = pd.read_csv(tasks_csv)
+    tasks_csv = os.path.join(output_dir, "logs", "transporter_tasks_raw.csv")
+    ordered_csv = os.path.join(output_dir, "logs", "transporter_tasks_ordered.csv")
+    df = read_table(tasks_csv)
     # Pakota kaikki ohjelma-, vaihe-, asema- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella
     for col in ["Batch", "Treatment_program", "Stage", "Lift_stat", "Sink_stat"]:
         if col in df.columns:
@@ -20,9 +29,7 @@ def order_tasks(output_dir):
         if col in df.columns:
             df[col] = df[col].apply(lambda x: int(round(x)))
     
-    # ⭐ KRIITTINEN KORJAUS: Järjestä nostinkohtaisesti aikajärjestykseen!
-    # Muuten eri nostimien tehtävät sekoittuvat ja aiheuttavat timeline-paradokseja
-    df_ordered = df.sort_values(["Transporter_id", "Lift_time"]).reset_index(drop=True)
+    df_ordered = order_tasks_df(df)
     logger.log("INFO", f"Järjestetty {len(df)} tehtävää nostinkohtaisesti aikajärjestykseen")
     
     # Pakota vielä ennen tallennusta kaikki ohjelma-, vaihe-, asema- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella
@@ -32,7 +39,7 @@ def order_tasks(output_dir):
     for col in ["Lift_time", "Sink_time"]:
         if col in df_ordered.columns:
             df_ordered[col] = df_ordered[col].apply(lambda x: int(round(x)))
-    df_ordered.to_csv(ordered_csv, index=False)
+    write_table(df_ordered, ordered_csv)
     # STEP-tyyppinen lopetusviesti terminaaliin ja lokiin
     logger.log("STEP", "STEP 5 COMPLETED: ORDER TASKS")
     return ordered_csv
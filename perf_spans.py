@@ -0,0 +1,256 @@
+"""
+Suorituskykymittaus: aikavälit (span) vaiheille ja kuumille osioille
+
+Jokaisesta aikavälistä kirjataan seinäkelloaika, säikeen CPU-aika, prosessin
+muisti (RSS nyt ja huippu) sekä valinnaisesti Pythonin varausten huippu
+(tracemalloc, config.PERF_TRACEMALLOC). Tulokset tallennetaan
+    logs/perf.csv          yksi rivi aikaväliä kohden
+    logs/perf_trace.json   Chrome trace event -muoto (chrome://tracing tai ui.perfetto.dev)
+
+Mittari (PerfRecorder) on ajokohtainen ja kulkee PipelineContextissa
+(ctx.perf). span() ja start_span() käyttävät nykyiseen säikeeseen sidotun
+ajon mittaria (PipelineContext.activate); ilman mittaria ne eivät tee mitään,
+joten kutsut voi jättää koodiin pysyvästi.
+
+Käyttö:
+    with span("stretch", tasks=len(df)):
+        ...
+    page_span = start_span("render_page", page=1)
+    ...
+    page_span.end()
+"""
+
+import csv
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PERF_CSV_NAME = "perf.csv"
+PERF_TRACE_NAME = "perf_trace.json"
+PERF_COLUMNS = ["name", "cat", "parent", "depth", "pid", "tid", "start_s", "wall_s", "cpu_s",
+                "rss_mb", "rss_peak_mb", "py_peak_mb", "args"]
+
+def _rss_mb():
+    """Prosessin nykyinen RSS megatavuina (Linux) tai None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _rss_peak_mb():
+    """Prosessin RSS-huippu megatavuina tai None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux ilmoittaa kibitavuina, macOS tavuina
+    return peak / 1e6 if sys.platform == "darwin" else peak * 1024 / 1e6
+
+class _Span:
+    def __init__(self, recorder, name, cat, args):
+        self.recorder = recorder
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.py_peak = 0
+        stack = recorder._stack()
+        self.parent = stack[-1] if stack else None
+        self.depth = len(stack)
+        if recorder.trace_memory:
+            # Huippu mitataan tämän aikavälin alusta; kesken oleva huippu siirretään ylemmälle tasolle
+            if self.parent is not None:
+                self.parent.py_peak = max(self.parent.py_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        stack.append(self)
+        self.start_epoch = time.time()
+        self.start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        self.ended = False
+
+    def end(self, **args):
+        """Päättää aikavälin ja kirjaa sen (lisäargumentit tallentuvat args-kenttään)"""
+        if self.ended:
+            return
+        self.ended = True
+        wall = time.perf_counter() - self.start
+        cpu = time.thread_time() - self.cpu_start
+        self.args.update(args)
+        recorder = self.recorder
+        stack = recorder._stack()
+        if self in stack:
+            del stack[stack.index(self):]
+        py_peak = None
+        if recorder.trace_memory:
+            self.py_peak = max(self.py_peak, tracemalloc.get_traced_memory()[1])
+            py_peak = self.py_peak / 1e6
+            if self.parent is not None:
+                self.parent.py_peak = max(self.parent.py_peak, self.py_peak)
+        recorder.add({
+            "name": self.name,
+            "cat": self.cat,
+            "parent": self.parent.name if self.parent is not None else "",
+            "depth": self.depth,
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            "start_epoch": self.start_epoch,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "rss_mb": _rss_mb(),
+            "rss_peak_mb": _rss_peak_mb(),
+            "py_peak_mb": py_peak,
+            "args": self.args,
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(**({"error": exc_type.__name__} if exc_type is not None else {}))
+        return False
+
+class _NullSpan:
+    def end(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class PerfRecorder:
+    def __init__(self, output_dir=None, trace_memory=None):
+        """
+        Args:
+            output_dir (str): Simulaatiokansio (None: vain muistiin, esim. poolin työntekijä)
+            trace_memory (bool): Mittaa Python-varausten huippu tracemallocilla
+                (oletus config.PERF_TRACEMALLOC; hidastaa ajoa)
+        """
+        if trace_memory is None:
+            import config
+            trace_memory = getattr(config, "PERF_TRACEMALLOC", False)
+        self.output_dir = output_dir
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.origin = time.time()
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start(self, name, cat="section", **args):
+        return _Span(self, name, cat, args)
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def merge(self, records):
+        """Lisää toisessa prosessissa kirjatut aikavälit (esim. poolin työntekijältä)"""
+        with self._lock:
+            self.records.extend(records)
+
+    def rows(self):
+        """Aikavälit perf.csv:n riveinä alkuajan mukaan järjestettynä"""
+        with self._lock:
+            records = sorted(self.records, key=lambda r: r["start_epoch"])
+        rows = []
+        for r in records:
+            row = {key: r[key] for key in PERF_COLUMNS if key in r}
+            row["start_s"] = r["start_epoch"] - self.origin
+            row["args"] = json.dumps(r["args"], ensure_ascii=False, default=str) if r["args"] else ""
+            rows.append(row)
+        return rows
+
+    def trace_events(self):
+        """Aikavälit Chrome trace event -muodossa (complete events, ph="X")"""
+        events = []
+        pids = set()
+        for row in self.rows():
+            args = {"cpu_ms": round(row["cpu_s"] * 1000, 3)}
+            for key in ("rss_mb", "rss_peak_mb", "py_peak_mb"):
+                if row[key] is not None:
+                    args[key] = round(row[key], 2)
+            if row["args"]:
+                args.update(json.loads(row["args"]))
+            events.append({
+                "name": row["name"], "cat": row["cat"], "ph": "X",
+                "ts": round(row["start_s"] * 1e6, 1), "dur": round(row["wall_s"] * 1e6, 1),
+                "pid": row["pid"], "tid": row["tid"], "args": args,
+            })
+            if row["rss_mb"] is not None:
+                events.append({"name": "rss_mb", "ph": "C", "ts": round((row["start_s"] + row["wall_s"]) * 1e6, 1),
+                               "pid": row["pid"], "args": {"rss_mb": round(row["rss_mb"], 2)}})
+            pids.add(row["pid"])
+        for pid in sorted(pids):
+            name = "main" if pid == os.getpid() else f"worker {pid}"
+            events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}})
+        return events
+
+    def save(self, output_dir=None):
+        """
+        Kirjoittaa logs/perf.csv ja logs/perf_trace.json (korvaa aiemmat).
+
+        Returns:
+            tuple: (perf.csv polku, perf_trace.json polku) tai None ilman kansiota
+        """
+        output_dir = output_dir or self.output_dir
+        if not output_dir:
+            return None
+        logs_dir = os.path.join(output_dir, "logs")
+        os.makedirs(logs_dir, exist_ok=True)
+        csv_path = os.path.join(logs_dir, PERF_CSV_NAME)
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=PERF_COLUMNS)
+            writer.writeheader()
+            for row in self.rows():
+                writer.writerow({key: (f"{value:.6f}" if isinstance(value, float) else value)
+                                 for key, value in row.items()})
+        trace_path = os.path.join(logs_dir, PERF_TRACE_NAME)
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+        return csv_path, trace_path
+
+def current_recorder():
+    """Nykyiseen säikeeseen sidotun ajon mittari tai None"""
+    from simulation_logger import current_run
+    run = current_run()
+    return getattr(run, "perf", None) if run is not None else None
+
+def span(name, cat="section", **args):
+    """Aikaväli with-lohkolle (ilman mittaria no-op)"""
+    recorder = current_recorder()
+    if recorder is None:
+        return _NULL_SPAN
+    return recorder.start(name, cat, **args)
+
+start_span = span
+
+def traced(name=None, cat="section"):
+    """Dekoraattori: koko funktiokutsu yhtenä aikavälinä"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*a, **kw):
+            with span(span_name, cat):
+                return func(*a, **kw)
+        return wrapper
+    return decorator
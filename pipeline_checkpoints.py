@@ -0,0 +1,104 @@
+"""
+Vaihekohtaiset tarkistuspisteet simulaatiokansiossa
+
+Jokaisen vaiheen päätyttyä kirjoitetaan checkpoints/<numero>_<nimi>.json,
+jossa on vaiheen tila (run, cached tai failed), välimuistiavain, kesto ja
+tulostiedostojen tiivisteet. Tarkistuspisteiden avulla keskeytynyt ajo
+voidaan jatkaa samaan kansioon (main.py --resume <kansio> --from-step N).
+
+Vaiheen 1 lähtötiedostoista (initialization) otetaan lisäksi varmuuskopio
+kansioon checkpoints/1_setup/, koska myöhemmät vaiheet korvaavat niitä
+(esim. Production.csv) eikä vaihetta 1 ole välimuistissa. Samoin muiden
+vaiheiden tulostiedostoista, jotka jokin myöhempi vaihe korvaa (esim.
+vaiheen 3 Production.csv vaiheessa 5), otetaan varmuuskopio kansioon
+checkpoints/<numero>_<nimi>/, joten jatkaminen ei riipu välimuistista.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+
+CHECKPOINT_DIR = "checkpoints"
+
+def checkpoint_path(output_dir, step):
+    return os.path.join(output_dir, CHECKPOINT_DIR, f"{step.number}_{step.name}.json")
+
+def write_checkpoint(output_dir, step, status, key=None, outputs=None, duration=None, error=None):
+    """Kirjoittaa vaiheen tarkistuspisteen (korvaa aiemman)"""
+    path = checkpoint_path(output_dir, step)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "step": step.name,
+        "number": step.number,
+        "status": status,
+        "key": key,
+        "outputs": outputs or {},
+        "duration": round(duration, 3) if duration is not None else None,
+        "finished": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
+    }
+    if error is not None:
+        data["error"] = str(error)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return data
+
+def read_checkpoint(output_dir, step):
+    """Palauttaa vaiheen tarkistuspisteen tai None"""
+    path = checkpoint_path(output_dir, step)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def is_completed(checkpoint):
+    return checkpoint is not None and checkpoint["status"] in ("run", "cached")
+
+def remove_checkpoint(output_dir, step):
+    path = checkpoint_path(output_dir, step)
+    if os.path.exists(path):
+        os.remove(path)
+
+def backup_dir(output_dir, step):
+    return os.path.join(output_dir, CHECKPOINT_DIR, f"{step.number}_{step.name}")
+
+def backup_files(output_dir, step, rel_paths):
+    """
+    Kopioi vaiheen tulostiedostot tarkistuspisteen varmuuskopioksi. Lähtötiedostovaraston
+    muuttumattomat tiedostot (kovat linkit, ks. create_simulation_directory) linkitetään.
+    """
+    from create_simulation_directory import is_mutable
+    target = backup_dir(output_dir, step)
+    for rel in rel_paths:
+        src = os.path.join(output_dir, *rel.split("/"))
+        dst = os.path.join(target, *rel.split("/"))
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if os.path.exists(dst):
+            os.remove(dst)  # Aiempi varmuuskopio voi olla kova linkki: ei kirjoiteta sen päälle
+        if os.stat(src).st_nlink > 1 and not is_mutable(rel):
+            try:
+                os.link(src, dst)
+                continue
+            except OSError:
+                pass
+        shutil.copy2(src, dst)
+
+def has_backup(output_dir, step, rel_paths):
+    """Löytyvätkö kaikki tiedostot vaiheen varmuuskopiosta"""
+    source = backup_dir(output_dir, step)
+    return all(os.path.exists(os.path.join(source, *rel.split("/"))) for rel in rel_paths)
+
+def restore_backup(output_dir, step, rel_paths):
+    """Palauttaa tiedostot varmuuskopiosta. Palauttaa False, jos jokin puuttuu."""
+    if not has_backup(output_dir, step, rel_paths):
+        return False
+    source = backup_dir(output_dir, step)
+    files = [os.path.join(source, *rel.split("/")) for rel in rel_paths]
+    for rel, src in zip(rel_paths, files):
+        dst = os.path.join(output_dir, *rel.split("/"))
+        if os.path.exists(dst):
+            os.remove(dst)  # Kova linkki lähtötiedostovarastoon: ei kirjoiteta varaston tiedoston päälle
+        shutil.copy2(src, dst)
+    return True
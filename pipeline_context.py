@@ -0,0 +1,162 @@
+"""
+PipelineContext - simulaatioputken muistissa kulkeva tila
+
+Kuljettaa ladatut lähtötiedot ja kaikki välitaulukot (matriisit, tehtävälistat,
+liikkeet, eräkohtaiset ohjelmat) vaiheelta toiselle, jolloin samaa CSV:tä ei
+lueta ja jäsennetä useaan kertaan. Levylle tallennus on vaihdettava sink:
+- CsvSink: kirjoittaa taulukot simulaatiokansioon samoihin polkuihin kuin ennen
+  (välitaulukot valitussa muodossa, ks. table_io)
+- NullSink: ei kirjoita mitään (kaikki pysyy muistissa)
+
+Taulukot nimetään lyhyillä nimillä (ks. TABLE_PATHS) tai suhteellisella
+polulla, esim. "optimized_programs/Batch_001_Treatment_program_001.csv".
+
+Konteksti kuljettaa myös ajon lokit (logger, bottlenecks), suorituskykymittarin
+(perf, ks. perf_spans), profiloijan (profiler, ks. step_profiler) ja laskurit
+(metrics, ks. run_metrics). activate() sitoo
+ajon nykyiseen säikeeseen, jolloin vanhat get_logger()-kutsut vaiheiden
+sisällä käyttävät tämän ajon lokia eivätkä prosessin globaalia lokia.
+"""
+
+import contextlib
+import os
+from table_io import read_table, write_table, table_exists
+
+# Lyhyet taulukkonimet -> suhteellinen polku simulaatiokansiossa (aina pienet kirjaimet)
+TABLE_PATHS = {
+    "stations": "initialization/Stations.csv",
+    "transporters": "initialization/Transporters.csv",
+    "transporters_start_positions": "initialization/Transporters_start_positions.csv",
+    "production": "initialization/Production.csv",
+    "line_matrix_original": "logs/line_matrix_original.csv",
+    "line_matrix_stretched": "logs/line_matrix_stretched.csv",
+    "transporter_tasks_raw": "logs/transporter_tasks_raw.csv",
+    "transporter_tasks_ordered": "logs/transporter_tasks_ordered.csv",
+    "transporter_tasks_resolved": "logs/transporter_tasks_resolved.csv",
+    "transporter_tasks_stretched": "logs/transporter_tasks_stretched.csv",
+    "transporter_tasks_from_matrix": "logs/transporter_tasks_from_matrix.csv",
+    "transporters_movement": "logs/transporters_movement.csv",
+    "transporters_workload": "logs/transporters_workload.csv",
+}
+
+# Lähtötiedot, jotka load_inputs lataa kerralla
+INPUT_TABLES = ["stations", "transporters", "transporters_start_positions", "production"]
+
+def table_path(name):
+    """Palauttaa taulukon suhteellisen polun (lyhyt nimi tai valmis polku)"""
+    return TABLE_PATHS.get(name, name)
+
+def program_table_name(programs_dir, batch, program):
+    """Eräkohtaisen ohjelman taulukkonimi, esim. optimized_programs/Batch_001_Treatment_program_001.csv"""
+    return f"{programs_dir}/Batch_{int(batch):03d}_Treatment_program_{int(program):03d}.csv"
+
+class NullSink:
+    """Sink, joka ei tallenna mitään"""
+
+    def write(self, name, df, **to_csv_kwargs):
+        pass
+
+class CsvSink:
+    """Sink, joka tallentaa taulukot CSV-tiedostoiksi simulaatiokansioon"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def write(self, name, df, **to_csv_kwargs):
+        path = os.path.join(self.output_dir, *table_path(name).split("/"))
+        write_table(df, path, **to_csv_kwargs)
+
+class PipelineContext:
+    """
+    Simulaatioputken yhteinen tila.
+
+    get() palauttaa taulukon muistista tai lataa sen simulaatiokansiosta
+    ensimmäisellä kerralla. put() tallentaa taulukon muistiin ja välittää sen
+    sinkille. Palautettuja taulukoita ei saa muokata paikallaan - muokkaava
+    vaihe tekee kopion ja tallentaa tuloksen put():lla.
+
+    logger on ajon SimulationLogger (None: käytetään globaalia lokia),
+    bottlenecks ajon BottleneckLogger (luodaan ensimmäisellä käytöllä),
+    perf ajon PerfRecorder (None: aikavälejä ei mitata), profiler
+    ajon StepProfiler (None: ei profilointia) ja metrics ajon
+    MetricsRegistry (None: laskureita ei kirjata).
+    """
+
+    def __init__(self, output_dir=None, sink=None, logger=None, perf=None, profiler=None, metrics=None):
+        self.output_dir = output_dir
+        if sink is None:
+            sink = CsvSink(output_dir) if output_dir else NullSink()
+        self.sink = sink
+        self.tables = {}
+        self.logger = logger
+        self.perf = perf
+        self.profiler = profiler
+        self.metrics = metrics
+        self._bottlenecks = None
+
+    @property
+    def bottlenecks(self):
+        """Ajon pullonkaulaloki"""
+        if self._bottlenecks is None:
+            from bottleneck_logger import BottleneckLogger
+            self._bottlenecks = BottleneckLogger(self.output_dir, logger=self.logger)
+        return self._bottlenecks
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Sitoo ajon nykyiseen säikeeseen: get_logger() ja get_bottleneck_logger() palauttavat tämän ajon lokit"""
+        from simulation_logger import bind_run, unbind_run
+        token = bind_run(self)
+        try:
+            yield self
+        finally:
+            unbind_run(token)
+
+    def path(self, name):
+        """Taulukon absoluuttinen polku simulaatiokansiossa"""
+        if not self.output_dir:
+            raise RuntimeError(f"PipelineContext ilman output_dir-kansiota: polkua taululle '{name}' ei ole")
+        return os.path.join(self.output_dir, *table_path(name).split("/"))
+
+    def has(self, name):
+        """Onko taulukko muistissa tai levyllä"""
+        if name in self.tables:
+            return True
+        return bool(self.output_dir) and table_exists(self.path(name))
+
+    def get(self, name):
+        """Palauttaa taulukon muistista tai lataa sen levyltä (FileNotFoundError, jos puuttuu)"""
+        if name in self.tables:
+            return self.tables[name]
+        if not self.output_dir or not table_exists(self.path(name)):
+            raise FileNotFoundError(f"Taulukkoa '{name}' ei ole muistissa eikä levyllä ({table_path(name)})")
+        df = read_table(self.path(name))
+        if name == "transporters_start_positions":
+            df.columns = df.columns.str.strip()
+        self.tables[name] = df
+        return df
+
+    def put(self, name, df, persist=True, **to_csv_kwargs):
+        """Tallentaa taulukon muistiin ja (persist=True) sinkille"""
+        self.tables[name] = df
+        if persist:
+            self.sink.write(name, df, **to_csv_kwargs)
+        return df
+
+    def discard(self, name):
+        """Poistaa taulukon muistista (seuraava get lukee levyltä)"""
+        self.tables.pop(name, None)
+
+    def discard_path(self, rel_path):
+        """Poistaa muistista taulukot, jotka vastaavat levyn tiedostoa (tiedostomuodosta riippumatta)"""
+        base = os.path.splitext(rel_path)[0]
+        for name in list(self.tables):
+            if os.path.splitext(table_path(name))[0] == base:
+                del self.tables[name]
+
+    def load_inputs(self):
+        """Lataa lähtötiedot (asemat, nostimet, aloituspaikat, tuotanto) muistiin"""
+        for name in INPUT_TABLES:
+            if self.has(name):
+                self.get(name)
+        return self
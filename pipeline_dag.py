@@ -0,0 +1,284 @@
+"""
+Simulaatioputken riippuvuusgraafi ja rinnakkainen ajuri
+
+Vaiheiden riippuvuudet johdetaan niiden syöte- ja tulosmalleista
+(PIPELINE_STEPS-järjestyksessä aiempi vaihe A, myöhempi vaihe B):
+- B lukee tiedoston, jonka A kirjoittaa (luku kirjoituksen jälkeen)
+- B kirjoittaa tiedoston, jonka A lukee (A:n on luettava ensin)
+- A ja B kirjoittavat saman tiedoston
+Toisistaan riippumattomat vaiheet ajetaan rinnakkain prosessipoolissa, jolloin
+kokonaisaika määräytyy kriittisen polun eikä vaiheiden summan mukaan.
+
+Prosessipoolissa jokainen vaihe lukee syötteensä levyltä omaan
+PipelineContextiinsa; jobs=1 ajaa vaiheet samassa prosessissa yhteisellä
+kontekstilla (PIPELINE_STEPS-järjestyksessä). Vaiheet ajetaan kontekstin
+ollessa aktiivinen (PipelineContext.activate), joten ne kirjaavat ajon omaan lokiin.
+Kun kontekstilla on suorituskykymittari (ctx.perf), jokainen vaihe mitataan
+aikavälinä; poolin työntekijät palauttavat aikavälinsä pääprosessille, joka
+tallentaa logs/perf.csv:n ja logs/perf_trace.json:n ajon lopuksi. Profiloinnissa
+(ctx.profiler) jokainen vaihe kirjoittaa oman .prof-tiedostonsa ja hotspot-taulukko
+kootaan ajon lopuksi. Laskurit (ctx.metrics) yhdistetään samoin pääprosessiin
+ja tallennetaan logs/metrics.json- ja logs/metrics.prom-tiedostoiksi.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from step_cache import hash_files, matches, patterns_overlap, step_key
+from pipeline_checkpoints import write_checkpoint, remove_checkpoint, backup_files
+from simulation_logger import get_logger
+
+def step_dependencies(steps):
+    """
+    Palauttaa riippuvuudet: vaiheen nimi -> joukko vaiheiden nimiä, jotka on
+    ajettava ennen sitä (vain annettujen vaiheiden sisällä).
+    """
+    deps = {step.name: set() for step in steps}
+    for j, later in enumerate(steps):
+        for earlier in steps[:j]:
+            if (patterns_overlap(earlier.outputs, later.inputs)
+                    or patterns_overlap(earlier.inputs, later.outputs)
+                    or patterns_overlap(earlier.outputs, later.outputs)):
+                deps[later.name].add(earlier.name)
+    return deps
+
+def _selector_matches(step, selector):
+    return selector in (step.name, step.number) or selector in step.tags
+
+def _check_selectors(steps, selectors, option):
+    for selector in selectors:
+        if not any(_selector_matches(step, selector) for step in steps):
+            known = sorted({step.name for step in steps} | {tag for step in steps for tag in step.tags})
+            raise ValueError(f"{option}: tuntematon vaihe tai ryhmä '{selector}'. Tunnetut: {', '.join(known)}")
+
+def select_steps(steps, only=None, skip=None):
+    """
+    Rajaa ajettavat vaiheet.
+
+    Args:
+        steps (list): Vaiheet järjestyksessä
+        only (list): Vaiheiden nimet, numerot tai ryhmät (tags), jotka ajetaan
+            riippuvuuksineen
+        skip (list): Vaiheet tai ryhmät, joita ei ajeta (eikä niistä riippuvia vaiheita)
+
+    Returns:
+        list: Valitut vaiheet alkuperäisessä järjestyksessä
+    """
+    only = [s for s in (only or []) if s]
+    skip = [s for s in (skip or []) if s]
+    deps = step_dependencies(steps)
+    selected = [step.name for step in steps]
+    if only:
+        _check_selectors(steps, only, "--only")
+        wanted = {step.name for step in steps if any(_selector_matches(step, s) for s in only)}
+        todo = list(wanted)
+        while todo:
+            for dep in deps[todo.pop()]:
+                if dep not in wanted:
+                    wanted.add(dep)
+                    todo.append(dep)
+        selected = [name for name in selected if name in wanted]
+    if skip:
+        _check_selectors(steps, skip, "--skip")
+        removed = {step.name for step in steps if any(_selector_matches(step, s) for s in skip)}
+        for step in steps:
+            if step.name not in removed and deps[step.name] & removed and step.name in selected:
+                removed.add(step.name)
+                print(f"⚠️  VAIHE {step.number} ({step.name}) ohitetaan, koska se riippuu ohitetusta vaiheesta")
+        selected = [name for name in selected if name not in removed]
+    by_name = {step.name: step for step in steps}
+    return [by_name[name] for name in selected]
+
+def critical_path(steps, durations):
+    """
+    Kriittinen polku toteutuneilla kestoilla.
+
+    Returns:
+        tuple: (polun kesto sekunteina, lista vaiheista polulla)
+    """
+    deps = step_dependencies(steps)
+    finish = {}
+    previous = {}
+    for step in steps:
+        before = max(deps[step.name], key=lambda name: finish[name], default=None)
+        finish[step.name] = durations.get(step.name, 0.0) + (finish[before] if before else 0.0)
+        previous[step.name] = before
+    if not finish:
+        return 0.0, []
+    last = max(finish, key=finish.get)
+    path = []
+    while last is not None:
+        path.append(last)
+        last = previous[last]
+    by_name = {step.name: step for step in steps}
+    return finish[path[0]], [by_name[name] for name in reversed(path)]
+
+# --- Prosessipoolin työntekijä ---
+
+def _init_worker(output_dir, output_format, stretch_fixed_point):
+    from table_io import set_output_format
+    from simulation_logger import init_logger
+    from pipeline_steps import set_stretch_fixed_point
+    set_output_format(output_format)
+    set_stretch_fixed_point(stretch_fixed_point)
+    init_logger(output_dir)
+
+def _run_step_in_worker(output_dir, step_name, measure=False, profile_mode=None, count=False):
+    """Ajaa vaiheen poolin prosessissa. Palauttaa (kesto, aikavälit, laskurit)."""
+    from pipeline_context import PipelineContext
+    from pipeline_steps import PIPELINE_STEPS
+    from perf_spans import PerfRecorder, span
+    from step_profiler import StepProfiler, profile_context
+    from run_metrics import MetricsRegistry
+    step = next(s for s in PIPELINE_STEPS if s.name == step_name)
+    start = time.perf_counter()
+    ctx = PipelineContext(output_dir, logger=get_logger(), perf=PerfRecorder() if measure else None,
+                          profiler=StepProfiler(output_dir, profile_mode) if profile_mode else None,
+                          metrics=MetricsRegistry() if count else None)
+    if ctx.logger is not None:
+        ctx.logger.step = step.name
+    try:
+        with ctx.activate(), span(step.name, "step", number=step.number), profile_context(ctx.profiler, step.name):
+            step.func(output_dir, ctx.load_inputs())
+    finally:
+        # Poolin prosessi ei aja atexit-käsittelijöitä: loki tyhjennetään jokaisen vaiheen jälkeen
+        if ctx.logger is not None:
+            ctx.logger.flush()
+    return (time.perf_counter() - start, ctx.perf.records if measure else [],
+            ctx.metrics.snapshot() if count else None)
+
+def run_dag(output_dir, ctx, steps, cache=None, jobs=1):
+    """
+    Ajaa vaiheet riippuvuuksien mukaisessa järjestyksessä.
+
+    Vaihe ohitetaan, kun sen syötteiden ja koodin tiiviste löytyy välimuistista
+    (cache). Jokaisesta vaiheesta kirjoitetaan tarkistuspiste. Virheen
+    sattuessa käynnissä olevat vaiheet ajetaan loppuun ja virhe nostetaan.
+
+    Args:
+        jobs (int): Rinnakkaisten prosessien määrä (1 = ajo samassa prosessissa)
+
+    Returns:
+        list: (vaihe, "run" / "cached", kesto sekunteina)
+    """
+    from table_io import get_output_format
+    from pipeline_steps import get_stretch_fixed_point, overwritten_outputs
+    from perf_spans import span
+    from step_profiler import profile_context
+    logger = ctx.logger if ctx.logger is not None else get_logger()
+    deps = step_dependencies(steps)
+    all_inputs = sorted({p for step in steps for p in step.inputs})
+    state = hash_files(output_dir, all_inputs) if cache is not None else {}
+    pending = [step for step in steps]
+    done = set()
+    keys = {}
+    running = {}
+    results = []
+    failure = None
+    wall_start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                               initargs=(output_dir, get_output_format(), get_stretch_fixed_point())) if jobs > 1 else None
+
+    def finish(step, duration):
+        outputs = hash_files(output_dir, step.outputs)
+        if pool is not None:
+            # Vaihe ajettiin toisessa prosessissa: tämän prosessin kontekstin taulukot voivat olla vanhoja
+            for rel in outputs:
+                ctx.discard_path(rel)
+        if cache is not None and (outputs or not step.outputs):
+            # Vaihetta, jonka ilmoitetuista tulosteista ei syntynyt yhtään, ei tallenneta välimuistiin
+            cache.store(step.name, keys[step.name], output_dir, outputs)
+            state.update(outputs)
+        # Myöhemmän vaiheen korvaamat tulokset talteen, jotta --resume ei riipu välimuistista
+        backup_files(output_dir, step, overwritten_outputs(step, list(outputs)))
+        write_checkpoint(output_dir, step, "run", keys[step.name], outputs, duration)
+        results.append((step, "run", duration))
+        done.add(step.name)
+        if logger is not None:
+            logger.flush()
+
+    def fail(step, error, duration):
+        write_checkpoint(output_dir, step, "failed", keys[step.name], duration=duration, error=error)
+        print(f"❌ VAIHE {step.number} ({step.name}) epäonnistui. Jatka korjauksen jälkeen:")
+        print(f"   python main.py --resume {output_dir} --from-step {step.number}")
+        if logger is not None:
+            logger.log("STEP", f"STEP {step.number} {step.name} FAILED: {error}", step=step.name)
+            logger.flush()
+
+    try:
+        while (pending and failure is None) or running:
+            ready = [step for step in pending if deps[step.name] <= done] if failure is None else []
+            progressed = False
+            for step in ready:
+                if pool is None and (step is not ready[0]):
+                    break  # Samassa prosessissa: yksi vaihe kerrallaan alkuperäisessä järjestyksessä
+                pending.remove(step)
+                start = time.perf_counter()
+                keys[step.name] = step_key(step, {rel: h for rel, h in state.items() if matches(rel, step.inputs)}) if cache is not None else None
+                manifest = cache.lookup(step.name, keys[step.name]) if cache is not None else None
+                if manifest is not None:
+                    for rel in cache.restore(step.name, keys[step.name], output_dir, manifest):
+                        ctx.discard_path(rel)
+                    state.update(manifest["outputs"])
+                    backup_files(output_dir, step, overwritten_outputs(step, list(manifest["outputs"])))
+                    print(f"⏭️  VAIHE {step.number} ({step.name}) ohitettu - tulokset välimuistista {keys[step.name][:12]}")
+                    if logger is not None:
+                        logger.log("STEP", f"STEP {step.number} {step.name} SKIPPED: restored {len(manifest['outputs'])} files from cache {keys[step.name][:12]}", step=step.name)
+                    write_checkpoint(output_dir, step, "cached", keys[step.name], manifest["outputs"], time.perf_counter() - start)
+                    results.append((step, "cached", time.perf_counter() - start))
+                    done.add(step.name)
+                    progressed = True
+                    continue
+                remove_checkpoint(output_dir, step)
+                if pool is not None:
+                    running[pool.submit(_run_step_in_worker, output_dir, step.name, ctx.perf is not None,
+                                        ctx.profiler.mode if ctx.profiler is not None else None,
+                                        ctx.metrics is not None)] = (step, start)
+                    continue
+                if logger is not None:
+                    logger.step = step.name
+                try:
+                    with ctx.activate(), span(step.name, "step", number=step.number), profile_context(ctx.profiler, step.name):
+                        step.func(output_dir, ctx)
+                except Exception as e:
+                    fail(step, e, time.perf_counter() - start)
+                    raise
+                finish(step, time.perf_counter() - start)
+            if progressed and pool is not None:
+                continue  # Välimuistista palautetut vaiheet voivat vapauttaa uusia vaiheita
+            if not running:
+                if pending and failure is None and not any(deps[step.name] <= done for step in pending):
+                    raise RuntimeError(f"Vaiheiden riippuvuuksia ei voida täyttää: {', '.join(s.name for s in pending)}")
+                continue
+            completed, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in completed:
+                step, start = running.pop(future)
+                try:
+                    duration, spans, counts = future.result()
+                except Exception as e:
+                    fail(step, e, time.perf_counter() - start)
+                    failure = failure or e
+                    continue
+                if ctx.perf is not None:
+                    ctx.perf.merge(spans)
+                if ctx.metrics is not None:
+                    ctx.metrics.merge(counts)
+                finish(step, duration)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+        if ctx.perf is not None:
+            ctx.perf.save(output_dir)
+        if ctx.profiler is not None:
+            ctx.profiler.write_report(output_dir)
+        if ctx.metrics is not None:
+            ctx.metrics.save(output_dir)
+    if failure is not None:
+        raise failure
+
+    wall = time.perf_counter() - wall_start
+    durations = {step.name: duration for step, status, duration in results}
+    path_time, path = critical_path(steps, durations)
+    total = sum(durations.values())
+    print(f"⏱️  Vaiheet yhteensä {total:.1f} s, kriittinen polku {path_time:.1f} s "
+          f"({' → '.join(step.number for step in path)}), kokonaisaika {wall:.1f} s")
+    return results
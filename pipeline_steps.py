@@ -0,0 +1,399 @@
+"""
+Simulaatioputken vaiheiden määrittelyt ja ajuri
+
+Jokainen vaihe (PipelineStep) kertoo syötteensä ja tulosteensa glob-malleina
+simulaatiokansion suhteellisiin polkuihin sekä moduulit, joiden lähdekoodi
+muodostaa vaiheen koodiversion. Välitaulukoiden mallit päättyvät ".*", jotta
+ne osuvat kaikkiin tiedostomuotoihin (ks. table_io).
+
+run_pipeline ajaa vaiheet riippuvuusjärjestyksessä, tarvittaessa rinnakkain
+(pipeline_dag), ja ohittaa vaiheet, joiden syötteiden ja koodin tiiviste
+löytyy välimuistista (step_cache).
+plan_pipeline listaa ajamatta, mitkä vaiheet ajettaisiin (dry-run).
+Jokaisesta valmiista vaiheesta kirjoitetaan tarkistuspiste, jonka avulla
+resume_pipeline jatkaa keskeytynyttä ajoa (pipeline_checkpoints).
+"""
+
+import os
+import config
+from step_cache import hash_files, matches, patterns_overlap, step_key
+from pipeline_checkpoints import (write_checkpoint, read_checkpoint, is_completed,
+                                  backup_files, has_backup, restore_backup)
+
+class PipelineStep:
+    """
+    Yksi putken vaihe.
+
+    Args:
+        number (str): Vaiheen numero tulosteissa (esim. "3" tai "6.1")
+        name (str): Yksilöivä nimi (välimuistin kansio)
+        func: Funktio func(output_dir, ctx)
+        inputs (list): Syötetiedostojen glob-mallit
+        outputs (list): Tulostiedostojen glob-mallit
+        modules (list): Vaiheen moduulit koodiversiota varten
+        version (str): Käsin nostettava versio (pakottaa uudelleenajon)
+        tags (list): Ryhmät, joilla vaiheita voi valita (--only / --skip)
+        settings: Funktio, joka palauttaa tulokseen vaikuttavat asetukset (välimuistiavaimeen)
+    """
+
+    def __init__(self, number, name, func, inputs, outputs, modules, version="1", tags=(), settings=None):
+        self.number = number
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.modules = list(modules)
+        self.version = version
+        self.tags = tuple(tags)
+        self.settings = settings
+
+    def __repr__(self):
+        return f"PipelineStep({self.number}, {self.name})"
+
+_stretch_fixed_point = None
+
+def get_stretch_fixed_point():
+    """Venytetäänkö vaiheessa 5 kiintopisteeseen asti (oletus config.STRETCH_FIXED_POINT)"""
+    if _stretch_fixed_point is not None:
+        return _stretch_fixed_point
+    return bool(getattr(config, "STRETCH_FIXED_POINT", False))
+
+def set_stretch_fixed_point(enabled):
+    """Asettaa vaiheen 5 venytystilan tälle prosessille (None = asetuksen oletus)"""
+    global _stretch_fixed_point
+    _stretch_fixed_point = None if enabled is None else bool(enabled)
+
+def _stretch_settings():
+    return {"fixed_point": get_stretch_fixed_point(),
+            "max_iterations": getattr(config, "STRETCH_MAX_ITERATIONS", 100)}
+
+# --- Vaihefunktiot: kaikki muotoa func(output_dir, ctx) ---
+
+def _run_programs(output_dir, ctx):
+    from test_step2 import test_step_2
+    test_step_2(output_dir, ctx=ctx)
+
+def _run_copy_optimized(output_dir, ctx):
+    from copy_originals_to_stretched import copy_originals_to_optimized
+    copy_originals_to_optimized(output_dir)
+
+def _run_matrix_original(output_dir, ctx):
+    from test_step3 import test_step_3
+    test_step_3(output_dir, ctx=ctx)
+
+def _run_visualize_original(output_dir, ctx):
+    from test_step4 import test_step_4
+    test_step_4(output_dir, ctx=ctx)
+
+def _run_stretch(output_dir, ctx):
+    from test_step5 import test_step_5
+    test_step_5(output_dir, ctx=ctx, fixed_point=get_stretch_fixed_point())
+
+def _run_matrix_stretched(output_dir, ctx):
+    from generate_matrix_stretched import generate_matrix_stretched
+    generate_matrix_stretched(output_dir, ctx=ctx)
+
+def _run_tasks_from_matrix(output_dir, ctx):
+    from extract_transporter_tasks import extract_transporter_tasks
+    extract_transporter_tasks(output_dir, ctx=ctx)
+
+def _run_movements(output_dir, ctx):
+    from extract_transporter_tasks import create_detailed_movements
+    create_detailed_movements(output_dir, ctx=ctx)
+
+def _run_transporters_movement(output_dir, ctx):
+    from generate_transporters_movement import generate_transporters_movement
+    generate_transporters_movement(output_dir)
+
+def _run_visualize_stretched(output_dir, ctx):
+    from test_step6 import test_step_6
+    test_step_6(output_dir, ctx=ctx)
+
+def _run_workload(output_dir, ctx):
+    from test_step7 import generate_transporter_workload
+    generate_transporter_workload(output_dir, ctx=ctx)
+
+def _run_treatment_program_report(output_dir, ctx):
+    from test_step7 import generate_report
+    generate_report(output_dir, "treatment_program_report")
+
+def _run_station_report(output_dir, ctx):
+    from test_step7 import generate_report
+    generate_report(output_dir, "station_report")
+
+def _run_transporter_report(output_dir, ctx):
+    from test_step7 import generate_report
+    generate_report(output_dir, "transporter_report")
+
+def _run_production_report(output_dir, ctx):
+    from test_step7 import generate_report
+    generate_report(output_dir, "production_report")
+
+def _run_time_distribution(output_dir, ctx):
+    from report_transporter_time_distribution import report_transporter_time_distribution
+    report_transporter_time_distribution(output_dir, ctx=ctx)
+
+INIT_TABLES = "initialization/*.csv"
+
+# Vaihe 1 (simulaatiokansion luonti) vain tarkistuspistettä varten: sitä ei ajeta run_pipelinessa
+SETUP_STEP = PipelineStep("1", "setup", None, inputs=[], outputs=["initialization/*"], modules=["test_step1"])
+
+# Vaiheet 2-7 (vaihe 1 luo simulaatiokansion eikä ole välimuistissa).
+# Syötteet on rajattu vaiheen todella lukemiin tiedostoihin: niistä johdetaan
+# riippuvuudet, joiden mukaan vaiheita ajetaan rinnakkain (pipeline_dag).
+PIPELINE_STEPS = [
+    PipelineStep("2", "programs", _run_programs,
+                 inputs=["initialization/Production.csv", "initialization/Treatment_program_*.csv"],
+                 outputs=["original_programs/*"],
+                 modules=["test_step2"], tags=["programs"]),
+    PipelineStep("2.5", "copy_optimized", _run_copy_optimized,
+                 inputs=["original_programs/*"],
+                 outputs=["optimized_programs/*"],
+                 modules=["copy_originals_to_stretched"], tags=["programs"]),
+    PipelineStep("3", "matrix_original", _run_matrix_original,
+                 inputs=[INIT_TABLES, "original_programs/*"],
+                 outputs=["logs/line_matrix_original.*", "initialization/Production.csv",
+                          "initialization/production_original.csv", "initialization/production_station_conflicts.csv"],
+                 modules=["test_step3"], tags=["matrix"]),
+    PipelineStep("4", "visualize_original", _run_visualize_original,
+                 inputs=["initialization/Stations.csv", "logs/line_matrix_original.*"],
+                 outputs=["logs/original_matrix_timeline_page_*.png"],
+                 modules=["test_step4"], tags=["visualization"]),
+    PipelineStep("5", "stretch", _run_stretch,
+                 inputs=[INIT_TABLES, "logs/line_matrix_original.*", "original_programs/*", "optimized_programs/*"],
+                 outputs=["initialization/Production.csv", "logs/transporter_tasks_raw.*",
+                          "logs/transporter_tasks_ordered.*", "logs/transporter_tasks_resolved.*",
+                          "logs/transporter_tasks_stretched.*", "optimized_programs/*"],
+                 modules=["test_step5"], tags=["tasks"], settings=_stretch_settings),
+    PipelineStep("6", "matrix_stretched", _run_matrix_stretched,
+                 inputs=[INIT_TABLES, "optimized_programs/*"],
+                 outputs=["logs/line_matrix_stretched.*"],
+                 modules=["generate_matrix_stretched"], tags=["matrix"]),
+    PipelineStep("6.1", "tasks_from_matrix", _run_tasks_from_matrix,
+                 inputs=[INIT_TABLES, "logs/line_matrix_stretched.*"],
+                 outputs=["logs/transporter_tasks_from_matrix.*"],
+                 modules=["extract_transporter_tasks"], tags=["tasks"]),
+    PipelineStep("6.2", "movements", _run_movements,
+                 inputs=[INIT_TABLES, "logs/transporter_tasks_from_matrix.*"],
+                 outputs=["logs/transporters_movement.*"],
+                 modules=["extract_transporter_tasks"], tags=["tasks"]),
+    PipelineStep("6.5", "transporters_movement", _run_transporters_movement,
+                 inputs=[],
+                 outputs=[],
+                 modules=["generate_transporters_movement"], tags=["tasks"]),
+    PipelineStep("7", "visualize_stretched", _run_visualize_stretched,
+                 inputs=["initialization/Stations.csv", "logs/line_matrix_stretched.*",
+                         "logs/transporters_movement.*", "optimized_programs/*"],
+                 outputs=["logs/line_matrix_stretched_sorted.*", "logs/stretched_matrix_timeline_page_*.png"],
+                 modules=["test_step6"], tags=["visualization"]),
+    PipelineStep("7.1", "workload", _run_workload,
+                 inputs=["logs/transporters_movement.*"],
+                 outputs=["logs/transporters_workload.*", "reports/transporter_workload.png"],
+                 modules=["test_step7"], tags=["reports"]),
+    PipelineStep("7.2", "treatment_program_report", _run_treatment_program_report,
+                 inputs=["initialization/Stations.csv", "original_programs/*"],
+                 outputs=["reports/treatment_program_report.*"],
+                 modules=["test_step7", "generate_treatment_program_report"], tags=["reports"]),
+    PipelineStep("7.3", "station_report", _run_station_report,
+                 inputs=["initialization/Stations.csv"],
+                 outputs=["reports/station_report.*"],
+                 modules=["test_step7", "generate_station_report"], tags=["reports"]),
+    PipelineStep("7.4", "transporter_report", _run_transporter_report,
+                 inputs=["initialization/Transporters.csv"],
+                 outputs=["reports/transporter_report.*"],
+                 modules=["test_step7", "generate_transporter_report"], tags=["reports"]),
+    PipelineStep("7.5", "production_report", _run_production_report,
+                 inputs=["initialization/Production.csv", "logs/line_matrix_stretched.*"],
+                 outputs=["reports/production_report.*"],
+                 modules=["test_step7", "generate_production_report"], tags=["reports"]),
+    PipelineStep("7.6", "time_distribution", _run_time_distribution,
+                 inputs=[INIT_TABLES, "logs/transporters_movement.*"],
+                 outputs=["reports/stations_line.svg", "reports/transporter_*_pie.png",
+                          "reports/transporter_time_distribution.html"],
+                 modules=["report_transporter_time_distribution"], tags=["reports"]),
+]
+
+def _input_hashes(state, step):
+    return {rel: h for rel, h in state.items() if matches(rel, step.inputs)}
+
+def run_pipeline(output_dir, ctx, steps=None, cache=None, jobs=1):
+    """
+    Ajaa vaiheet riippuvuuksien mukaisessa järjestyksessä (pipeline_dag.run_dag).
+    Jos cache (StepCache) on annettu, vaihe ohitetaan, kun sen syötteiden ja
+    koodin tiiviste löytyy välimuistista, ja tulokset kopioidaan
+    simulaatiokansioon. Jokaisesta vaiheesta kirjoitetaan tarkistuspiste;
+    virheen sattuessa vaihe merkitään epäonnistuneeksi ja virhe nostetaan.
+
+    Args:
+        jobs (int): Rinnakkain ajettavien vaiheiden enimmäismäärä (prosessipooli)
+
+    Returns:
+        list: (vaihe, "run" / "cached", kesto sekunteina)
+    """
+    from pipeline_dag import run_dag
+    steps = PIPELINE_STEPS if steps is None else steps
+    return run_dag(output_dir, ctx, steps, cache=cache, jobs=jobs)
+
+def overwritten_outputs(step, rel_paths, steps=None):
+    """Vaiheen tulostiedostot, jotka jokin myöhempi vaihe korvaa (varmuuskopioidaan tarkistuspisteeseen)"""
+    steps = PIPELINE_STEPS if steps is None else steps
+    names = [s.name for s in steps]
+    later = steps[names.index(step.name) + 1:] if step.name in names else []
+    patterns = [pattern for s in later for pattern in s.outputs]
+    return [rel for rel in rel_paths if matches(rel, patterns)]
+
+def checkpoint_setup(output_dir):
+    """Kirjoittaa vaiheen 1 tarkistuspisteen ja varmuuskopioi lähtötiedostot"""
+    outputs = hash_files(output_dir, SETUP_STEP.outputs)
+    backup_files(output_dir, SETUP_STEP, list(outputs))
+    return write_checkpoint(output_dir, SETUP_STEP, "run", outputs=outputs)
+
+def _step_index(steps, from_step):
+    """Ensimmäisen vaiheen indeksi, jonka numero on vähintään from_step"""
+    for i, step in enumerate(steps):
+        if float(step.number) >= float(from_step):
+            return i
+    raise ValueError(f"Vaihetta {from_step} tai sen jälkeistä ei ole (viimeinen on {steps[-1].number})")
+
+def resume_pipeline(output_dir, from_step=None, cache=None, steps=None, only=None, skip=None, jobs=1, profile=None):
+    """
+    Jatkaa keskeytynyttä ajoa olemassa olevassa simulaatiokansiossa.
+
+    Vaiheita ennen from_step-vaihetta ei ajeta uudelleen, vaan niiden tulokset
+    ladataan levyltä. Niillä on oltava valmis tarkistuspiste. Jos jatkettava
+    tai sitä myöhempi vaihe on ehtinyt korvata jonkin aiemman vaiheen
+    tulostiedoston (esim. Production.csv vaiheissa 3 ja 5), tiedosto
+    palautetaan vaiheen tarkistuspisteen varmuuskopiosta tai toissijaisesti
+    välimuistista tarkistuspisteen avaimella. Jos sitä ei löydy kummastakaan,
+    jatkaminen keskeytetään.
+
+    Args:
+        output_dir (str): Keskeytyneen ajon simulaatiokansio
+        from_step (str): Vaihe, josta jatketaan (oletus: ensimmäinen keskeneräinen)
+        cache (StepCache): Välimuisti (valinnainen)
+        only, skip (list): Jatkettavien vaiheiden rajaus (ks. pipeline_dag.select_steps)
+        jobs (int): Rinnakkain ajettavien vaiheiden enimmäismäärä
+        profile (str): Profiloi vaiheet ("cprofile" / "sampling", ks. step_profiler)
+
+    Returns:
+        list: run_pipeline-tulokset jatketuista vaiheista
+    """
+    from pipeline_context import PipelineContext
+    from simulation_logger import init_logger
+    from perf_spans import PerfRecorder
+    from step_profiler import StepProfiler
+    from run_metrics import MetricsRegistry
+    steps = PIPELINE_STEPS if steps is None else steps
+    if not os.path.isdir(output_dir):
+        raise FileNotFoundError(f"Simulaatiokansiota ei löydy: {output_dir}")
+    checkpoints = [read_checkpoint(output_dir, step) for step in steps]
+    if from_step is None:
+        start = next((i for i, cp in enumerate(checkpoints) if not is_completed(cp)), len(steps))
+    else:
+        start = _step_index(steps, from_step)
+
+    # Odotettu tiedostotila: viimeisin vaihe ennen jatkokohtaa, joka kirjoitti tiedoston
+    expected = {}
+    setup = read_checkpoint(output_dir, SETUP_STEP)
+    if is_completed(setup):
+        for rel, h in setup["outputs"].items():
+            expected[rel] = (h, SETUP_STEP, None)
+    for step, cp in zip(steps[:start], checkpoints[:start]):
+        if not is_completed(cp):
+            raise RuntimeError(f"Vaihetta {step.number} ({step.name}) ei ole suoritettu loppuun - jatka aikaisemmasta vaiheesta")
+        for rel, h in cp["outputs"].items():
+            expected[rel] = (h, step, cp["key"])
+    current = hash_files(output_dir, list(expected))
+    stale = {}
+    for rel, (h, step, key) in expected.items():
+        if current.get(rel) != h:
+            stale.setdefault((step.name, key), (step, []))[1].append(rel)
+    # Tarkista ensin, että kaikki korvatut tiedostot voidaan palauttaa, ennen kuin mitään muutetaan.
+    # Ensisijaisesti tarkistuspisteen varmuuskopiosta, muuten välimuistista (manifest).
+    manifests = {}
+    for (name, key), (step, files) in stale.items():
+        if has_backup(output_dir, step, files):
+            manifests[name] = None
+            continue
+        if step is SETUP_STEP:
+            raise RuntimeError(f"Lähtötiedostojen varmuuskopio puuttuu ({', '.join(files[:3])})")
+        manifests[name] = cache.lookup(name, key) if cache is not None and key else None
+        if manifests[name] is None:
+            raise RuntimeError(
+                f"Vaiheen {step.number} ({step.name}) tulokset on korvattu myöhemmässä vaiheessa "
+                f"({', '.join(files[:3])}) eikä niitä löydy tarkistuspisteestä eikä välimuistista "
+                f"- jatka aikaisemmasta vaiheesta")
+    for (name, key), (step, files) in stale.items():
+        if manifests[name] is None:
+            restore_backup(output_dir, step, files)
+            print(f"♻️  VAIHE {step.number} ({step.name}): palautettu {len(files)} tiedostoa tarkistuspisteestä")
+            continue
+        cache.restore(name, key, output_dir, manifests[name], only=files)
+        print(f"♻️  VAIHE {step.number} ({step.name}): palautettu {len(files)} tiedostoa välimuistista")
+
+    if start >= len(steps):
+        print(f"✅ Kaikki vaiheet on jo suoritettu kansiossa {output_dir}")
+        return []
+    print(f"▶️  Jatketaan ajoa kansiossa {output_dir} vaiheesta {steps[start].number} ({steps[start].name})")
+    logger = init_logger(output_dir)
+    logger.log("STEP", f"RESUMED FROM STEP {steps[start].number} {steps[start].name}")
+    perf = PerfRecorder(output_dir) if config.PERF_SPANS else None
+    profiler = StepProfiler(output_dir, profile) if profile else None
+    metrics = MetricsRegistry() if config.METRICS else None
+    ctx = PipelineContext(output_dir, logger=logger, perf=perf, profiler=profiler, metrics=metrics).load_inputs()
+    from pipeline_dag import select_steps
+    remaining = select_steps(steps[start:], only=only, skip=skip)
+    return run_pipeline(output_dir, ctx, steps=remaining, cache=cache, jobs=jobs)
+
+def source_file_hashes(project_dir="."):
+    """Tiivisteet tiedostoille, jotka vaihe 1 kopioi simulaatiokansioon (dry-run)"""
+    from create_simulation_directory import COPIED_DIRS
+    state = {}
+    for src, dst in COPIED_DIRS:
+        state.update(hash_files(os.path.join(project_dir, src), ["*"], prefix=dst))
+    return state
+
+def plan_pipeline(cache, steps=None, state=None):
+    """
+    Dry-run: selvittää ajamatta, mitkä vaiheet ajettaisiin ja mitkä tulisivat välimuistista.
+
+    Args:
+        cache (StepCache): Välimuisti
+        state (dict): Simulaatiokansion tiedostojen tiivisteet vaiheen 1 jälkeen
+            (oletus: lähdekansioiden tiedostot, ks. source_file_hashes)
+
+    Returns:
+        list: (vaihe, tila, avain), tila on "cached", "run" tai "run_upstream"
+    """
+    steps = PIPELINE_STEPS if steps is None else steps
+    state = source_file_hashes() if state is None else dict(state)
+    changed_outputs = []
+    plan = []
+    for step in steps:
+        if patterns_overlap(changed_outputs, step.inputs):
+            plan.append((step, "run_upstream", None))
+            changed_outputs.extend(step.outputs)
+            continue
+        key = step_key(step, _input_hashes(state, step))
+        manifest = cache.lookup(step.name, key)
+        if manifest is None:
+            plan.append((step, "run", key))
+            changed_outputs.extend(step.outputs)
+        else:
+            plan.append((step, "cached", key))
+            state.update(manifest["outputs"])
+    return plan
+
+def print_plan(plan):
+    """Tulostaa dry-run-listauksen"""
+    labels = {
+        "cached": "OHITETAAN (välimuistissa)",
+        "run": "AJETAAN (syötteet tai koodi muuttuneet)",
+        "run_upstream": "AJETAAN (edeltävä vaihe ajetaan)",
+    }
+    print("Simulaatioputken suunnitelma (dry-run):")
+    for step, status, key in plan:
+        suffix = f"  {key[:12]}" if key else ""
+        print(f"  VAIHE {step.number:<4} {step.name:<26} {labels[status]}{suffix}")
+    to_run = sum(1 for _, status, _ in plan if status != "cached")
+    print(f"Ajettavia vaiheita {to_run}/{len(plan)}")
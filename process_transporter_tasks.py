@@ -0,0 +1,95 @@
+import pandas as pd
+import os
+from simulation_logger import get_logger
+from order_tasks import order_tasks_df
+from resolve_station_conflicts import resolve_station_conflicts_df
+from stretch_transporter_tasks import stretch_tasks
+from table_io import read_table, write_table, table_exists
+from perf_spans import span
+
+def process_transporter_tasks(output_dir, tasks_df=None, debug=False, fixed_point=None, ctx=None):
+    """
+    Yhdistetty vaihe 5: järjestys, asemakonfliktien ratkaisu ja venytys yhdellä
+    muistissa olevalla tehtävätaulukolla.
+
+    Tehtävät tyypitetään ja järjestetään vain kerran. Välitiedostot
+    transporter_tasks_ordered.csv ja transporter_tasks_resolved.csv kirjoitetaan
+    vain, jos debug=True. transporter_tasks_stretched.csv tallennetaan aina,
+    koska myöhemmät vaiheet lukevat sen.
+
+    Args:
+        output_dir (str): Simulaatiokansion polku
+        tasks_df (DataFrame): Raakatehtävät (generate_tasks). Jos None, luetaan transporter_tasks_raw.csv
+        debug (bool): Kirjoita välitiedostot _ordered ja _resolved
+        fixed_point (bool): Venytä worklist-periaatteella kiintopisteeseen asti (ks. stretch_tasks;
+            None = config.STRETCH_FIXED_POINT)
+        ctx (PipelineContext): Muistissa kulkeva putken tila (asemat, nostimet, tulokset)
+
+    Returns:
+        DataFrame: Venytetyt tehtävät
+    """
+    logger = get_logger()
+    if logger is None:
+        raise RuntimeError("Logger is not initialized. Please initialize logger in main pipeline before calling this function.")
+    logger.log("STEP", "STEP 5 STARTED: PROCESS TASKS (ORDER + RESOLVE + STRETCH)")
+    logs_dir = os.path.join(output_dir or "", "logs")
+
+    if tasks_df is None and ctx is not None and ctx.has("transporter_tasks_raw"):
+        tasks_df = ctx.get("transporter_tasks_raw")
+    if tasks_df is None:
+        raw_file = os.path.join(logs_dir, "transporter_tasks_raw.csv")
+        if not table_exists(raw_file):
+            logger.log_error(f"transporter_tasks_raw.csv ei löydy: {raw_file}")
+            raise FileNotFoundError(f"transporter_tasks_raw.csv ei löydy: {raw_file}")
+        tasks_df = read_table(raw_file)
+    df = tasks_df.copy()
+    # Pakota kaikki ohjelma-, vaihe-, asema- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella (vain kerran)
+    for col in ["Transporter_id", "Batch", "Treatment_program", "Stage", "Lift_stat", "Sink_stat"]:
+        if col in df.columns:
+            df[col] = df[col].astype(int)
+    for col in ["Lift_time", "Sink_time"]:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: int(round(x)))
+
+    # 1) Järjestys (ainoa lajittelu)
+    with span("ordering", tasks=len(df)):
+        ordered = order_tasks_df(df)
+    logger.log("INFO", f"Järjestetty {len(ordered)} tehtävää nostinkohtaisesti aikajärjestykseen")
+    if debug:
+        if ctx is not None:
+            ctx.put("transporter_tasks_ordered", ordered)
+        else:
+            os.makedirs(logs_dir, exist_ok=True)
+            write_table(ordered, os.path.join(logs_dir, "transporter_tasks_ordered.csv"))
+
+    # 2) Asemakonfliktien ratkaisu
+    if ctx is not None:
+        stations_df = ctx.get("stations").copy()
+        transp_df = ctx.get("transporters")
+    else:
+        stations_df = pd.read_csv(os.path.join(output_dir, "initialization", "Stations.csv"))
+        transp_df = pd.read_csv(os.path.join(output_dir, "initialization", "Transporters.csv"))
+    if 'Number' in stations_df.columns:
+        stations_df['Number'] = stations_df['Number'].astype(int)
+    with span("resolve_station_conflicts", tasks=len(ordered)):
+        resolved = resolve_station_conflicts_df(ordered, stations_df, transp_df, logger)
+    if debug:
+        if ctx is not None:
+            ctx.put("transporter_tasks_resolved", resolved, float_format='%.2f')
+        else:
+            write_table(resolved, os.path.join(logs_dir, "transporter_tasks_resolved.csv"), float_format='%.2f')
+
+    # 3) Venytys (kirjoittaa _stretched-tiedoston ja optimoidut ohjelmat)
+    with span("stretching", tasks=len(resolved)):
+        stretched = stretch_tasks(output_dir, tasks_df=resolved, fixed_point=fixed_point, ctx=ctx)
+    logger.log("STEP", "STEP 5 COMPLETED: PROCESS TASKS (ORDER + RESOLVE + STRETCH)")
+    return stretched
+
+if __name__ == "__main__":
+    import sys
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else "output"
+    debug = "--debug" in sys.argv[2:]
+    fixed_point = True if "--fixed-point" in sys.argv[2:] else None
+    from simulation_logger import init_logger
+    init_logger(output_dir)
+    process_transporter_tasks(output_dir, debug=debug, fixed_point=fixed_point)
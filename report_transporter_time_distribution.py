@@ -1,14 +1,16 @@
 import os
 import pandas as pd
+from table_io import read_table, table_exists
 
 
 
-def report_transporter_time_distribution(output_dir):
+def report_transporter_time_distribution(output_dir, ctx=None):
+    # Jos ctx (PipelineContext) annetaan, nostimet, asemat, tuotanto ja liikkeet luetaan siitä
     # Lue nostimien ajoalueet
     transporters_path = os.path.join(os.path.dirname(os.path.dirname(output_dir)), "initialization", "Transporters.csv")
     transporter_ranges = []
     try:
-        df_transp = pd.read_csv(transporters_path)
+        df_transp = ctx.get("transporters") if ctx is not None else pd.read_csv(transporters_path)
         for i, row in df_transp.iterrows():
             transporter_ranges.append({
                 'id': int(row['Transporter_id']),
@@ -23,7 +25,7 @@ def report_transporter_time_distribution(output_dir):
     # Lue asemien sijainnit
     stations_path = os.path.join(os.path.dirname(os.path.dirname(output_dir)), "initialization", "Stations.csv")
     try:
-        df_stations = pd.read_csv(stations_path)
+        df_stations = ctx.get("stations") if ctx is not None else pd.read_csv(stations_path)
         station_numbers = df_stations["Number"].values
         x_positions = df_stations["X Position"].values
         max_x = x_positions.max() + 1000
@@ -86,7 +88,7 @@ def report_transporter_time_distribution(output_dir):
         # fallback initialization-kansioon
         production_path = os.path.join(os.path.dirname(os.path.dirname(output_dir)), "initialization", "Production.csv")
     try:
-        df_prod = pd.read_csv(production_path)
+        df_prod = ctx.get("production") if ctx is not None else pd.read_csv(production_path)
         batch_count = df_prod["Batch"].nunique()
     except Exception:
         batch_count = None
@@ -94,10 +96,14 @@ def report_transporter_time_distribution(output_dir):
     # Määrittele detailed_path ja lue df heti alussa
     # Käytetään transporter_movements.csv tiedostoa
     movements_path = os.path.join(output_dir, "logs", "transporters_movement.csv")
-    if not os.path.exists(movements_path):
+    if ctx is not None and ctx.has("transporters_movement"):
+        movements_df = ctx.get("transporters_movement")
+    elif table_exists(movements_path):
+        movements_df = read_table(movements_path)
+    else:
         print(f"[TRANSPORTER REPORT] Tiedostoa ei löydy: {movements_path}")
         return
-    df = pd.read_csv(movements_path)
+    df = movements_df
 
     # Vain vaiheet 0–4, järjestys on taattu tiedostossa
     df = df[df["Phase"].isin([0, 1, 2, 3, 4])].copy()
@@ -116,11 +122,8 @@ def report_transporter_time_distribution(output_dir):
     simulation_name = os.path.basename(os.path.abspath(output_dir))
     report_file = os.path.join(reports_dir, "transporter_time_distribution.html")
 
-    if not os.path.exists(detailed_path):
-        print(f"[TRANSPORTER REPORT] Tiedostoa ei löydy: {detailed_path}")
-        return
-
-    df = pd.read_csv(detailed_path)
+    # Sama liiketiedosto on jo luettu yllä
+    df = movements_df
     # Oletetaan, että sarakkeet: Transporter, Phase, Start_Time, End_Time
     result = {}
     for transporter_id, group in df.groupby("Transporter"):
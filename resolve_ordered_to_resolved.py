@@ -1,5 +1,5 @@
-import pandas as pd
 import os
+from table_io import read_table, write_table
 
 def stretch_resolved_tasks(resolved_df):
     """
@@ -23,10 +23,10 @@ def stretch_resolved_tasks(resolved_df):
     return df
 
 def resolve_ordered_to_resolved(output_dir):
-    logs_dir = os.path.join(output_dir, "Logs")
+    logs_dir = os.path.join(output_dir, "logs")
     ordered_file = os.path.join(logs_dir, "transporter_tasks_ordered.csv")
     resolved_file = os.path.join(logs_dir, "transporter_tasks_resolved.csv")
-    df = pd.read_csv(ordered_file)
+    df = read_table(ordered_file)
     if 'Parallel_group' not in df.columns:
         df['Parallel_group'] = 0
     changed = True
@@ -41,14 +41,14 @@ def resolve_ordered_to_resolved(output_dir):
                 # Vaihda järjestys
                 df.iloc[i], df.iloc[i+1] = next_, curr
                 changed = True
-    df.to_csv(resolved_file, index=False)
+    write_table(df, resolved_file)
     return resolved_file
 
 def main(input_file, output_file):
-    df = pd.read_csv(input_file)
+    df = read_table(input_file)
     # Kaikki vaihe-sarakkeet (Phase_1...Phase_4) kopioidaan sellaisenaan
     df_stretched = stretch_resolved_tasks(df)
-    df_stretched.to_csv(output_file, index=False, float_format='%.2f')
+    write_table(df_stretched, output_file, float_format='%.2f')
 
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,195 @@
+"""
+Algoritmien työmäärän mittarit: laskurit ja histogrammit
+
+Kuumat polut kasvattavat laskureita (inc) ja kirjaavat arvoja histogrammeihin
+(observe), esim. konfliktitarkistusten silmukkakierrokset, matriisin
+yritykset erää kohden, venytyksen siirrot ja fysiikkalaskennat. Rekisteri
+(MetricsRegistry) on ajokohtainen ja kulkee PipelineContextissa
+(ctx.metrics); inc() ja observe() käyttävät nykyiseen säikeeseen sidotun
+ajon rekisteriä (PipelineContext.activate) ja ovat ilman sitä no-op.
+
+Ajon lopuksi rekisteri tallennetaan
+    logs/metrics.json   laskurit ja histogrammit
+    logs/metrics.prom   Prometheus-tekstimuoto (node_exporterin textfile collector)
+
+Silmukoissa kasvatetaan paikallista laskuria ja kutsutaan inc() kerran
+silmukan jälkeen, jolloin mittauksen kustannus on mitätön.
+"""
+
+import bisect
+import json
+import os
+from simulation_logger import current_run
+
+METRICS_JSON_NAME = "metrics.json"
+METRICS_PROM_NAME = "metrics.prom"
+PROMETHEUS_PREFIX = "simulation_"
+
+# Histogrammien oletusrajat (1-2-5-sarja) ja metriikkakohtaiset rajat
+DEFAULT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 100000, 1000000)
+HISTOGRAM_BUCKETS = {
+    "matrix_batch_attempts": (1, 2, 3, 5, 10, 20, 50, 100),
+    "matrix_conflict_delay_seconds": (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+    "stretch_shift_seconds": (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+}
+
+# Metriikoiden kuvaukset (Prometheus HELP)
+METRIC_HELP = {
+    "conflict_check_calls_total": "check_station_conflict-kutsut",
+    "conflict_check_iterations_total": "Olemassa olevien tehtävien läpikäynnit konfliktitarkistuksessa",
+    "conflict_free_time_iterations_total": "Läpikäynnit aseman vapautumisajan haussa",
+    "matrix_batch_attempts": "Matriisin aikataulutusyritykset erää kohden",
+    "matrix_batch_failures_total": "Erät, joille ei löytynyt aikataulua",
+    "matrix_conflict_delay_seconds": "Konfliktin aiheuttama erän siirto (s)",
+    "stretch_checks_total": "Venytyksen tarkistukset",
+    "stretch_shifts_total": "Venytyksen siirrot",
+    "stretch_iterations_total": "Venytyksen kierrokset",
+    "stretch_shift_seconds": "Venytyksen siirron suuruus (s)",
+    "physics_evaluations_total": "Fysiikkalaskennat (siirto-, nosto- ja laskuajat)",
+}
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count", "max")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # viimeinen: +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = None
+
+    def observe(self, value):
+        value = float(value)
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, n in enumerate(other["counts"]):
+            self.counts[i] += n
+        self.sum += other["sum"]
+        self.count += other["count"]
+        if other["max"] is not None and (self.max is None or other["max"] > self.max):
+            self.max = other["max"]
+
+class MetricsRegistry:
+    """Ajon laskurit ja histogrammit (ei lukitusta: yksi ajo kirjaa yhdestä säikeestä kerrallaan)"""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, n=1, **labels):
+        key = (name, _label_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = _Histogram(HISTOGRAM_BUCKETS.get(name, DEFAULT_BUCKETS))
+        histogram.observe(value)
+
+    def snapshot(self):
+        """Rekisterin sisältö siirrettävässä muodossa (esim. poolin työntekijältä pääprosessille)"""
+        return {
+            "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+            "histograms": [[name, list(labels), {"bounds": list(h.bounds), "counts": h.counts, "sum": h.sum,
+                                                 "count": h.count, "max": h.max}]
+                           for (name, labels), h in self.histograms.items()],
+        }
+
+    def merge(self, snapshot):
+        """Yhdistää toisen rekisterin snapshot()-tuloksen tähän"""
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+        for name, labels, data in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = _Histogram(data["bounds"])
+            histogram.merge(data)
+
+    def to_dict(self):
+        """Laskurit ja histogrammit JSON-muodossa (histogrammin buckets kumulatiivisina)"""
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())]
+        histograms = []
+        for (name, labels), h in sorted(self.histograms.items()):
+            cumulative = 0
+            buckets = []
+            for bound, n in zip(list(h.bounds) + ["+Inf"], h.counts):
+                cumulative += n
+                buckets.append({"le": bound, "count": cumulative})
+            histograms.append({"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                               "max": h.max, "mean": h.sum / h.count if h.count else None, "buckets": buckets})
+        return {"counters": counters, "histograms": histograms}
+
+    def value(self, name, **labels):
+        """Laskurin arvo (0, jos ei kirjattu)"""
+        return self.counters.get((name, _label_key(labels)), 0)
+
+    def to_prometheus(self):
+        """Rekisteri Prometheus-tekstimuodossa"""
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {PROMETHEUS_PREFIX}{name} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} {kind}")
+
+        def series(name, labels, extra=()):
+            pairs = [f'{k}="{v}"' for k, v in list(labels) + list(extra)]
+            return PROMETHEUS_PREFIX + name + ("{" + ",".join(pairs) + "}" if pairs else "")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            header(name, "counter")
+            lines.append(f"{series(name, labels)} {value}")
+        for (name, labels), h in sorted(self.histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(list(h.bounds) + ["+Inf"], h.counts):
+                cumulative += n
+                lines.append(f"{series(name + '_bucket', labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{series(name + '_sum', labels)} {h.sum}")
+            lines.append(f"{series(name + '_count', labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, output_dir):
+        """Kirjoittaa logs/metrics.json ja logs/metrics.prom. Palauttaa JSON-tiedoston polun."""
+        if not output_dir:
+            return None
+        logs_dir = os.path.join(output_dir, "logs")
+        os.makedirs(logs_dir, exist_ok=True)
+        json_path = os.path.join(logs_dir, METRICS_JSON_NAME)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        with open(os.path.join(logs_dir, METRICS_PROM_NAME), "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        return json_path
+
+def current_registry():
+    """Nykyiseen säikeeseen sidotun ajon rekisteri tai None"""
+    run = current_run()
+    return getattr(run, "metrics", None) if run is not None else None
+
+def inc(name, n=1, **labels):
+    """Kasvattaa laskuria (ilman sidottua rekisteriä no-op)"""
+    registry = current_registry()
+    if registry is not None:
+        registry.inc(name, n, **labels)
+
+def observe(name, value, **labels):
+    """Kirjaa arvon histogrammiin (ilman sidottua rekisteriä no-op)"""
+    registry = current_registry()
+    if registry is not None:
+        registry.observe(name, value, **labels)
@@ -0,0 +1,195 @@
+"""
+Simulaation kirjastorajapinta ilman tiedostojärjestelmää
+
+simulate(config) ajaa simulaation laskentavaiheet (2-6.2) kokonaan muistissa:
+lähtötaulukot annetaan DataFrameina ja tuloksena palautetaan matriisit,
+nostintehtävät, liikkeet, optimoidut ohjelmat ja tunnusluvut (KPI).
+Levylle ei kirjoiteta mitään (PipelineContext + NullSink, loki ilman tiedostoa),
+joten optimoijat ja parametrihaut voivat kutsua sitä tuhansia kertoja.
+Jokaisella kutsulla on oma kontekstinsa ja lokinsa, joten simulate() on
+turvallinen kutsua useasta säikeestä yhtä aikaa.
+
+Visualisoinnit ja HTML-raportit kuuluvat tiedostopohjaiseen putkeen (main.py).
+
+Esimerkki:
+    from simulation_api import load_config, simulate
+    config = load_config("initialization")
+    result = simulate(config)
+    print(result.kpis["makespan_seconds"])
+"""
+
+import contextlib
+import os
+import sys
+import threading
+from pipeline_context import PipelineContext, NullSink, INPUT_TABLES
+
+class _ThreadQuietStdout:
+    """
+    sys.stdout-kääre, joka vaimentaa tulosteet vain niissä säikeissä, joissa
+    quiet on päällä (contextlib.redirect_stdout vaihtaisi koko prosessin stdoutin).
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.local = threading.local()
+
+    def write(self, text):
+        if getattr(self.local, "depth", 0):
+            return len(text)
+        return self.target.write(text)
+
+    def flush(self):
+        self.target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+_quiet_lock = threading.Lock()
+
+@contextlib.contextmanager
+def _quiet_stdout():
+    with _quiet_lock:
+        if not isinstance(sys.stdout, _ThreadQuietStdout):
+            sys.stdout = _ThreadQuietStdout(sys.stdout)
+        quiet = sys.stdout
+    quiet.local.depth = getattr(quiet.local, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        quiet.local.depth -= 1
+
+def load_config(init_dir="initialization"):
+    """
+    Lukee lähtötiedot kansiosta simulate()-funktion syötteeksi (ainoa levyä käyttävä funktio).
+
+    Returns:
+        dict: stations, transporters, transporters_start_positions, production
+            (DataFrame) ja treatment_programs (ohjelman numero -> DataFrame)
+    """
+    import pandas as pd
+    files = {
+        "stations": "Stations.csv",
+        "transporters": "Transporters.csv",
+        "transporters_start_positions": "Transporters_start_positions.csv",
+        "production": "Production.csv",
+    }
+    config = {name: pd.read_csv(os.path.join(init_dir, fname)) for name, fname in files.items()}
+    config["treatment_programs"] = {}
+    for fname in sorted(os.listdir(init_dir)):
+        if fname.startswith("Treatment_program_") and fname.endswith(".csv"):
+            number = int(fname[len("Treatment_program_"):-4])
+            config["treatment_programs"][number] = pd.read_csv(os.path.join(init_dir, fname))
+    return config
+
+class SimulationResult:
+    """
+    simulate()-funktion tulos.
+
+    Attributes:
+        matrix_original (DataFrame): Alkuperäinen line-matriisi (vaihe 3)
+        matrix_stretched (DataFrame): Venytetty line-matriisi (vaihe 6)
+        tasks (DataFrame): Venytetyt nostintehtävät (vaihe 5)
+        tasks_from_matrix (DataFrame): Nostintehtävät venytetystä matriisista (vaihe 6.1)
+        movements (DataFrame): Nostimien liikkeet vaiheittain (vaihe 6.2)
+        production (DataFrame): Production-taulukko konfliktien ratkaisun ja venytyksen jälkeen
+        programs (dict): Optimoidut eräkohtaiset ohjelmat (taulukkonimi -> DataFrame)
+        kpis (dict): Tunnusluvut (ks. compute_kpis)
+        metrics (dict): Algoritmien laskurit ja histogrammit (ks. run_metrics)
+        ctx (PipelineContext): Ajon kaikki taulukot
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.matrix_original = ctx.get("line_matrix_original")
+        self.matrix_stretched = ctx.get("line_matrix_stretched")
+        self.tasks = ctx.get("transporter_tasks_stretched")
+        self.tasks_from_matrix = ctx.get("transporter_tasks_from_matrix")
+        self.movements = ctx.get("transporters_movement")
+        self.production = ctx.get("production")
+        self.programs = {name: df for name, df in ctx.tables.items() if name.startswith("optimized_programs/")}
+        self.kpis = compute_kpis(self)
+        self.metrics = ctx.metrics.to_dict() if ctx.metrics is not None else None
+
+    def __repr__(self):
+        return f"SimulationResult({self.kpis})"
+
+def compute_kpis(result):
+    """
+    Tunnusluvut simulaation tuloksesta.
+
+    Returns:
+        dict: batches, makespan_seconds, makespan_original_seconds,
+            mean_lead_time_seconds, transporter_tasks ja
+            transporter_utilization (nostin -> aktiivisen ajan osuus läpimenoajasta)
+    """
+    matrix = result.matrix_stretched
+    makespan = float(matrix["ExitTime"].max()) if len(matrix) else 0.0
+    lead_times = matrix.groupby("Batch").agg(start=("EntryTime", "min"), end=("ExitTime", "max"))
+    movements = result.movements
+    active = movements[movements["Phase"].isin([1, 2, 3, 4])]
+    busy = (active["End_Time"] - active["Start_Time"]).groupby(active["Transporter"]).sum()
+    return {
+        "batches": int(result.production["Batch"].nunique()),
+        "makespan_seconds": makespan,
+        "makespan_original_seconds": float(result.matrix_original["ExitTime"].max()) if len(result.matrix_original) else 0.0,
+        "mean_lead_time_seconds": float((lead_times["end"] - lead_times["start"]).mean()) if len(lead_times) else 0.0,
+        "transporter_tasks": int(len(result.tasks)),
+        "transporter_utilization": {int(t): round(float(b) / makespan, 4) if makespan else 0.0 for t, b in busy.items()},
+    }
+
+def _context_from_config(config):
+    """Luo muistissa toimivan PipelineContextin lähtötaulukoista (syötteitä ei kopioida eikä muokata)"""
+    missing = [name for name in INPUT_TABLES + ["treatment_programs"] if name not in config]
+    if missing:
+        raise ValueError(f"simulate: lähtötiedot puuttuvat: {', '.join(missing)}")
+    ctx = PipelineContext(sink=NullSink())
+    for name in INPUT_TABLES:
+        df = config[name]
+        if name == "transporters_start_positions":
+            # Sarakenimissä voi olla välilyöntejä (kuten levyltä ladattaessa, ks. PipelineContext.get)
+            df = df.rename(columns=lambda c: str(c).strip())
+        ctx.put(name, df)
+    for number, program_df in config["treatment_programs"].items():
+        ctx.put(f"initialization/Treatment_program_{int(number):03d}.csv", program_df)
+    return ctx
+
+def simulate(config, quiet=True, fixed_point=None):
+    """
+    Ajaa simulaation muistissa koskematta levyyn.
+
+    Args:
+        config (dict): Lähtötaulukot (ks. load_config). Taulukoita ei muokata.
+        quiet (bool): Vaimenna vaiheiden terminaalitulosteet (vain tässä säikeessä)
+        fixed_point (bool): Venytä kiintopisteeseen asti (None = config.STRETCH_FIXED_POINT)
+
+    Returns:
+        SimulationResult
+    """
+    from simulation_logger import SimulationLogger
+    from run_metrics import MetricsRegistry
+    from generate_batch_treatment_programs_original import generate_batch_treatment_programs_original
+    from generate_matrix_original import generate_matrix_original
+    from generate_tasks import generate_tasks
+    from process_transporter_tasks import process_transporter_tasks
+    from generate_matrix_stretched import generate_matrix_stretched
+    from extract_transporter_tasks import extract_transporter_tasks, create_detailed_movements
+
+    ctx = _context_from_config(config)
+    ctx.logger = SimulationLogger(None)
+    ctx.metrics = MetricsRegistry()
+    with ctx.activate():
+        with _quiet_stdout() if quiet else contextlib.nullcontext():
+            # VAIHE 2: eräkohtaiset ohjelmat
+            if generate_batch_treatment_programs_original(None, ctx=ctx) is None:
+                raise RuntimeError("Käsittelyohjelmien luonti epäonnistui")
+            # VAIHE 3: alkuperäinen matriisi (päivittää Production-taulukon)
+            generate_matrix_original(None, ctx=ctx)
+            # VAIHE 5: tehtävät, järjestys, konfliktit ja venytys (luo optimoidut ohjelmat)
+            tasks_df, _ = generate_tasks(None, save_ordered=False, ctx=ctx)
+            process_transporter_tasks(None, tasks_df=tasks_df, fixed_point=fixed_point, ctx=ctx)
+            # VAIHEET 6-6.2: venytetty matriisi, tehtävät ja liikkeet
+            generate_matrix_stretched(None, ctx=ctx)
+            extract_transporter_tasks(None, ctx=ctx)
+            create_detailed_movements(None, ctx=ctx)
+    return SimulationResult(ctx)
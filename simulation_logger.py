@@ -2,80 +2,331 @@
 Simulation Logger Module
 Handles logging of all simulation phases and calculations
 Creates and maintains log_classes.csv in the Logs directory
+
+Loki pitää simulation_log.csv:n auki koko ajon ajan ja puskuroi rivit
+muistiin (config.LOG_BUFFER_SIZE riviä kerrallaan levylle). LOG_ASYNC=True
+siirtää kirjoituksen taustasäikeelle, joka tyhjentää jonoa. Puskuri
+tyhjennetään aina virheviestin (log_error) jälkeen, vaiheiden välissä
+(flush), suljettaessa (close) ja ohjelman päättyessä (atexit). Suljettuun
+lokiin kirjaaminen avaa tiedoston (ja taustasäikeen) uudelleen.
+
+Loki on ajokohtainen olio, joka kulkee ajon PipelineContextissa (ctx.logger).
+PipelineContext.activate() sitoo ajon nykyiseen säikeeseen (contextvars),
+jolloin get_logger() ja init_logger() palauttavat ajon oman lokin; moduulin
+globaali loki on vain yhteensopivuutta varten, kun mitään ajoa ei ole sidottu.
+Näin samassa prosessissa voi ajaa useita simulaatioita rinnakkain säikeissä.
+
+Jokainen tapahtuma kirjataan myös rakenteiseen JSON-lines-lokiin
+logs/events.jsonl (ks. event_log) tyypitetyin kentin step, batch, station,
+transporter ja value: log(tyyppi, viesti, batch=..., value=...). Vaihe (step)
+täytetään ajurin asettamasta logger.step-attribuutista. Loki kierrätetään
+koon mukaan (config.LOG_EVENTS_MAX_BYTES, LOG_EVENTS_BACKUPS, LOG_EVENTS_GZIP)
+ja luetaan analyysia varten event_log.read_events(output_dir):lla.
+
+Tyyppejä voi suodattaa tasolla (config.LOG_LEVEL, CATEGORY_LEVELS) tai
+poistaa kokonaan käytöstä (config.LOG_DISABLED_CATEGORIES), esim. kuumien
+silmukoiden CONFLICT- ja BATCH-rivit. Silmukoissa kannattaa tarkistaa
+logger.enabled(tyyppi) ennen viestin muotoilua.
 """
 
-import csv
+import atexit
+import contextvars
 import os
+import queue
+import threading
+import time
+import weakref
 from datetime import datetime
+import config
+from event_log import EventLog, EVENTS_FILE_NAME, make_event
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+# Tyyppien tasot (muut tyypit ovat INFO-tasoa)
+CATEGORY_LEVELS = {
+    "BATCH": "DEBUG",
+    "CONFLICT": "DEBUG",
+    "SIM_CALC": "DEBUG",
+    "WARNING": "WARNING",
+    "ERROR": "ERROR",
+    "SIM_ERROR": "ERROR",
+}
+
+# Avoimet lokit: tyhjennetään ohjelman päättyessä
+_open_loggers = weakref.WeakSet()
+
+def csv_field(text):
+    """Lainaa CSV-kentän, jos siinä on pilkku, lainausmerkki tai rivinvaihto"""
+    text = str(text)
+    if any(c in text for c in ',"\n\r'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
 
 class SimulationLogger:
-    def __init__(self, output_dir):
-        """Initialize the simulation logger"""
+    def __init__(self, output_dir, buffer_size=None, background=None, level=None, disabled=None):
+        """
+        Initialize the simulation logger (output_dir=None: tapahtumia ei kirjoiteta mihinkään)
+
+        Args:
+            buffer_size (int): Puskuroitujen rivien määrä ennen kirjoitusta (oletus config.LOG_BUFFER_SIZE)
+            background (bool): Kirjoita taustasäikeessä (oletus config.LOG_ASYNC)
+            level (str): Pienin kirjattava taso (oletus config.LOG_LEVEL)
+            disabled (iterable): Tyypit, joita ei kirjata (oletus config.LOG_DISABLED_CATEGORIES)
+        """
         self.output_dir = output_dir
+        self.buffer_size = max(1, int(buffer_size if buffer_size is not None else getattr(config, "LOG_BUFFER_SIZE", 1000)))
+        level = level if level is not None else getattr(config, "LOG_LEVEL", "DEBUG")
+        self.min_level = LEVELS[str(level).upper()]
+        disabled = disabled if disabled is not None else getattr(config, "LOG_DISABLED_CATEGORIES", ())
+        self.disabled = {str(c).upper() for c in disabled}
+        self.echo_optimization = getattr(config, "LOG_ECHO_OPTIMIZATION", True)
+        self.step = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._file = None
+        self._events = None
+        self._queue = None
+        self._thread = None
+        self._closed = False
+        self._background = bool(background if background is not None else getattr(config, "LOG_ASYNC", False))
+        if output_dir is None:
+            self.log_file = None
+            return
         self.log_file = os.path.join(output_dir, "logs", "simulation_log.csv")
-        
+
         # Ensure logs directory exists
         os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
-        
+
         # Initialize the log file with headers
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                f.write("Timestamp,Type,Description\n")
-    
-    def log(self, class_type, description):
-        """Log an event with timestamp, class and description"""
+        write_header = not os.path.exists(self.log_file)
+        self._file = open(self.log_file, 'a', encoding='utf-8')
+        if write_header:
+            self._file.write("Timestamp,Type,Description\n")
+            self._file.flush()
+        if getattr(config, "LOG_EVENTS", True):
+            self._events = EventLog(os.path.join(output_dir, "logs", EVENTS_FILE_NAME),
+                                    max_bytes=getattr(config, "LOG_EVENTS_MAX_BYTES", 20 * 1024 * 1024),
+                                    backups=getattr(config, "LOG_EVENTS_BACKUPS", 5),
+                                    compress=getattr(config, "LOG_EVENTS_GZIP", False))
+        if self._background:
+            self._start_writer()
+        _open_loggers.add(self)
+
+    def _start_writer(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._drain, name="SimulationLogger", daemon=True)
+        self._thread.start()
+
+    def _reopen(self):
+        """Suljettuun lokiin kirjataan vielä: avataan tiedosto ja taustasäie uudelleen"""
+        with self._lock:
+            if not self._closed:
+                return
+            self._file = open(self.log_file, 'a', encoding='utf-8')
+            if self._background:
+                self._start_writer()
+            self._closed = False
+            _open_loggers.add(self)
+
+    def enabled(self, class_type):
+        """Kirjataanko tämän tyypin tapahtumat"""
+        class_type = str(class_type).upper()
+        if self.log_file is None or class_type in self.disabled:
+            return False
+        return LEVELS[CATEGORY_LEVELS.get(class_type, "INFO")] >= self.min_level
+
+    def log(self, class_type, description, batch=None, station=None, transporter=None, value=None, step=None):
+        """
+        Log an event with timestamp, class and description
+
+        Tyypitetyt kentät (batch, station, transporter, value) tallentuvat
+        tapahtumalokiin; step oletuksena logger.step.
+        """
         # Muutetaan class_type aina isoiksi kirjaimiksi
         class_type = str(class_type).upper()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-        
-        with open(self.log_file, 'a', encoding='utf-8') as f:
-            f.write(f"{timestamp},{class_type},{description}\n")
-    
+        if not self.enabled(class_type):
+            return
+        is_error = CATEGORY_LEVELS.get(class_type) == "ERROR"
+        now = time.time()
+        timestamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S.%f")
+        line = f"{timestamp},{class_type},{csv_field(description)}\n"
+        event = None
+        if self._events is not None:
+            event = make_event(now, class_type, description, step=step if step is not None else self.step,
+                               batch=batch, station=station, transporter=transporter, value=value)
+        if self._closed:
+            self._reopen()
+        if self._queue is not None:
+            self._queue.put((line, event))
+            return
+        with self._lock:
+            self._buffer.append((line, event))
+            if is_error or len(self._buffer) >= self.buffer_size:
+                self._write_buffer()
+
+    def _write_buffer(self):
+        if self._buffer and self.log_file is not None:
+            if self._file is None:
+                self._file = open(self.log_file, 'a', encoding='utf-8')
+            self._file.write("".join(line for line, _ in self._buffer))
+            self._file.flush()
+            if self._events is not None:
+                self._events.write([event for _, event in self._buffer if event is not None])
+        self._buffer.clear()
+
+    def _drain(self):
+        """Taustasäie: kirjoittaa jonon rivit levylle aina, kun jono tyhjenee"""
+        stop = False
+        while not stop:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self._lock:
+                for item in items:
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        # flush() odottaa, kunnes tätä edeltävät rivit on kirjoitettu
+                        self._write_buffer()
+                        item.set()
+                    else:
+                        self._buffer.append(item)
+                self._write_buffer()
+
+    def flush(self):
+        """Kirjoittaa puskuroidut rivit levylle (odottaa taustasäikeen)"""
+        if self._thread is not None and self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait()
+            return
+        with self._lock:
+            self._write_buffer()
+
+    def close(self):
+        """Pysäyttää taustasäikeen, tyhjentää puskurin ja jonon ja sulkee tiedoston"""
+        if self.log_file is None:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        with self._lock:
+            if self._queue is not None:
+                # Rivit, jotka ehtivät jonoon taustasäikeen pysähtymisen jälkeen
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        item.set()
+                    elif item is not None:
+                        self._buffer.append(item)
+                self._queue = None
+                self._thread = None
+            self._write_buffer()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._events is not None:
+                self._events.close()
+            self._closed = True
+        _open_loggers.discard(self)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
     # Convenience methods for different types of logs
     def log_phase(self, description):
         """Log a simulation phase event"""
         self.log('SIM_PHASE', description)
         # Ei tulosteta terminaaliin - käytetään vain tiedostoon tallennukseen
-    
+
     def log_calc(self, description):
         """Log a calculation event"""
         self.log('SIM_CALC', description)
-    
+
     def log_data(self, description):
         """Log a data processing event"""
         self.log('SIM_DATA', description)
-    
+
     def log_io(self, description):
         """Log a file I/O event"""
         self.log('SIM_IO', description)
-    
+
     def log_opt(self, description):
         """Log an optimization event"""
         self.log('SIM_OPT', description)
-    
+
     def log_error(self, description):
-        """Log an error event"""
+        """Log an error event (puskuri tyhjennetään heti levylle)"""
         self.log('SIM_ERROR', description)
-    
+        if self._queue is not None:
+            self.flush()
+
     def log_viz(self, description):
         """Log a visualization event"""
         self.log('SIM_VIZ', description)
-    
+
     def log_optimization(self, description):
-        """Alias for log_opt for compatibility"""
-        print(description)
+        """Alias for log_opt for compatibility (tulostaa myös terminaaliin, jos echo_optimization)"""
+        if not self.enabled('SIM_OPT'):
+            return
+        if self.echo_optimization:
+            print(description)
         self.log_opt(description)
 
+def _close_all():
+    for open_logger in list(_open_loggers):
+        open_logger.close()
+
+atexit.register(_close_all)
+
 # Global logger instance (will be initialized in main.py)
 logger = None
 
+# Nykyiseen säikeeseen / tehtävään sidottu ajo (PipelineContext), ks. PipelineContext.activate
+_current_run = contextvars.ContextVar("simulation_run", default=None)
+
+def bind_run(run):
+    """Sitoo ajon (olio, jolla on logger-attribuutti) nykyiseen kontekstiin. Palauttaa tokenin."""
+    return _current_run.set(run)
+
+def unbind_run(token):
+    _current_run.reset(token)
+
+def current_run():
+    """Nykyiseen kontekstiin sidottu ajo tai None"""
+    return _current_run.get()
+
 def init_logger(output_dir):
-    """Initialize the global logger instance"""
+    """
+    Initialize the global logger instance. Saman kansion loki käytetään
+    uudelleen (sama avoin tiedosto); toisen kansion loki suljetaan ensin.
+    Jos ajo on sidottu (PipelineContext.activate), palautetaan sen loki
+    eikä globaalia lokia muuteta.
+    """
     global logger
+    run = _current_run.get()
+    if run is not None and run.logger is not None:
+        return run.logger
+    if logger is not None and logger.output_dir == output_dir:
+        return logger
+    if logger is not None:
+        logger.close()
     logger = SimulationLogger(output_dir)
     # Poistettu ylimääräinen viesti
     return logger
 
 def get_logger():
-    """Get the current logger instance"""
+    """Get the current logger instance (sidotun ajon loki tai globaali loki)"""
+    run = _current_run.get()
+    if run is not None and run.logger is not None:
+        return run.logger
     return logger
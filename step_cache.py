@@ -0,0 +1,187 @@
+"""
+Vaihekohtainen välimuisti sisältötiivisteillä
+
+Jokaisen putken vaiheen tulostiedostot tallennetaan välimuistiin avaimella,
+joka lasketaan vaiheen syötetiedostojen sisällöstä, vaiheen koodiversiosta
+(moduulien lähdekoodi paikallisine importteineen) ja välitaulukoiden
+tiedostomuodosta. Jos sama avain löytyy myöhemmin, vaihetta ei ajeta vaan sen
+tulokset kopioidaan välimuistista simulaatiokansioon.
+
+Rakenne: <output>/.step_cache/<vaihe>/<avain>/
+    manifest.json   - tulostiedostot ja niiden tiivisteet
+    files/...       - tulostiedostot suhteellisilla poluilla
+"""
+
+import ast
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+from table_io import get_output_format
+
+CACHE_DIR_NAME = ".step_cache"
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Tiedostot, jotka eivät ole minkään vaiheen syötettä eikä tulosta
+IGNORED_FILES = {"logs/simulation_log.csv"}
+
+def file_hash(path):
+    """SHA-256 tiedoston sisällöstä"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def matches(rel_path, patterns):
+    """Osuuko suhteellinen polku (/-erotin) johonkin glob-malliin"""
+    return any(fnmatch.fnmatchcase(rel_path, p) for p in patterns)
+
+def patterns_overlap(patterns_a, patterns_b):
+    """Voivatko kahden mallilistan osumat leikata (sama malli tai malli osuu toiseen)"""
+    return any(a == b or fnmatch.fnmatchcase(a, b) or fnmatch.fnmatchcase(b, a)
+               for a in patterns_a for b in patterns_b)
+
+def hash_files(root, patterns, prefix=""):
+    """
+    Laskee tiivisteet kansion tiedostoille, jotka osuvat malleihin.
+
+    Args:
+        root (str): Kansio, josta tiedostoja etsitään
+        patterns (list): Glob-mallit suhteellisille poluille (esim. "logs/line_matrix_original.*")
+        prefix (str): Suhteellisten polkujen eteen lisättävä kansio (lähdekansioita varten)
+
+    Returns:
+        dict: suhteellinen polku -> SHA-256
+    """
+    hashes = {}
+    if not os.path.isdir(root):
+        return hashes
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for fname in sorted(filenames):
+            full = os.path.join(dirpath, fname)
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            if prefix:
+                rel = f"{prefix}/{rel}"
+            if rel in IGNORED_FILES or not matches(rel, patterns):
+                continue
+            hashes[rel] = file_hash(full)
+    return hashes
+
+_import_cache = {}
+
+def _local_imports(module):
+    """Projektin omat moduulit, joita annettu moduuli importtaa (myös funktioiden sisällä)"""
+    if module in _import_cache:
+        return _import_cache[module]
+    path = os.path.join(PROJECT_DIR, f"{module}.py")
+    found = set()
+    with open(path, "r", encoding="utf-8-sig") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            top = name.split(".")[0]
+            if os.path.exists(os.path.join(PROJECT_DIR, f"{top}.py")):
+                found.add(top)
+    _import_cache[module] = found
+    return found
+
+def code_hash(modules):
+    """
+    Koodiversio: tiiviste moduulien ja niiden paikallisten importtien lähdekoodista.
+    Muutos missä tahansa vaiheen käyttämässä projektin moduulissa vaihtaa tiivisteen.
+    """
+    seen = set()
+    todo = list(modules)
+    while todo:
+        module = todo.pop()
+        if module in seen:
+            continue
+        seen.add(module)
+        todo.extend(_local_imports(module) - seen)
+    h = hashlib.sha256()
+    for module in sorted(seen):
+        h.update(module.encode("utf-8"))
+        with open(os.path.join(PROJECT_DIR, f"{module}.py"), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def step_key(step, input_hashes):
+    """Vaiheen välimuistiavain syötteiden, koodiversion, tiedostomuodon ja vaiheen asetusten perusteella"""
+    payload = {
+        "step": step.name,
+        "version": step.version,
+        "code": code_hash(step.modules),
+        "format": get_output_format(),
+        "inputs": sorted(input_hashes.items()),
+    }
+    if step.settings is not None:
+        payload["settings"] = step.settings()
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+class StepCache:
+    """Vaiheiden tulosten välimuisti kansiossa cache_dir"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def for_output_dir(cls, output_dir):
+        """Välimuisti simulaatiokansioiden yhteisessä juurikansiossa (esim. output/.step_cache)"""
+        base = os.path.dirname(os.path.abspath(output_dir))
+        return cls(os.path.join(base, CACHE_DIR_NAME))
+
+    def entry_dir(self, step_name, key):
+        return os.path.join(self.cache_dir, step_name, key)
+
+    def lookup(self, step_name, key):
+        """Palauttaa välimuistimerkinnän manifestin tai None"""
+        manifest_file = os.path.join(self.entry_dir(step_name, key), "manifest.json")
+        if not os.path.exists(manifest_file):
+            return None
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def store(self, step_name, key, root, output_hashes):
+        """Tallentaa vaiheen tulostiedostot välimuistiin (valmis merkintä syntyy atomisesti)"""
+        entry = self.entry_dir(step_name, key)
+        if os.path.exists(entry):
+            return
+        tmp = f"{entry}.tmp{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        for rel in output_hashes:
+            dst = os.path.join(tmp, "files", *rel.split("/"))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(os.path.join(root, *rel.split("/")), dst)
+        os.makedirs(tmp, exist_ok=True)
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"step": step_name, "key": key, "outputs": output_hashes}, f, indent=2, sort_keys=True)
+        try:
+            os.replace(tmp, entry)
+        except OSError:
+            # Rinnakkainen ajo ehti tallentaa saman merkinnän
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def restore(self, step_name, key, root, manifest, only=None):
+        """
+        Kopioi välimuistin tulostiedostot simulaatiokansioon (only: vain nämä polut).
+        Palauttaa suhteelliset polut.
+        """
+        entry = self.entry_dir(step_name, key)
+        restored = []
+        for rel in manifest["outputs"]:
+            if only is not None and rel not in only:
+                continue
+            dst = os.path.join(root, *rel.split("/"))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(os.path.join(entry, "files", *rel.split("/")), dst)
+            restored.append(rel)
+        return restored
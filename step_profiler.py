@@ -0,0 +1,199 @@
+"""
+Vaihekohtainen profilointi (--profile)
+
+Ajaa jokaisen vaiheen profiloijan alla ja tallentaa tuloksen vaihetta kohden:
+    logs/profiles/<vaihe>.prof          cProfile (avaa: python -m pstats, snakeviz)
+    logs/profiles/<vaihe>.pyisession    näytteistävä profiloija (pyinstrument), jos asennettu
+Ajon lopuksi kaikista profiileista kootaan hotspot-taulukko
+reports/profile_hotspots.csv: jokaisen vaiheen ja koko ajon (ALL) top-N
+funktiota oman ajan (tottime) mukaan.
+
+Ilman --profile-valitsinta profiloijaa ei luoda lainkaan (ctx.profiler = None),
+joten mittaus ei maksa mitään.
+"""
+
+import contextlib
+import cProfile
+import csv
+import glob
+import os
+import pstats
+
+PROFILE_MODES = ("cprofile", "sampling")
+PROFILE_DIR_NAME = "profiles"
+HOTSPOTS_FILE_NAME = "profile_hotspots.csv"
+HOTSPOT_COLUMNS = ["scope", "rank", "function", "file", "line", "ncalls", "tottime_s", "cumtime_s", "percall_ms"]
+
+def _sampling_profiler_class():
+    """pyinstrumentin Profiler-luokka tai None, jos ei asennettu"""
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    return Profiler
+
+def profile_dir(output_dir):
+    return os.path.join(output_dir, "logs", PROFILE_DIR_NAME)
+
+class StepProfiler:
+    def __init__(self, output_dir, mode="cprofile", top_n=None):
+        """
+        Args:
+            output_dir (str): Simulaatiokansio (None: profiilit pidetään muistissa, kunnes save())
+            mode (str): "cprofile" tai "sampling" (pyinstrument; ilman sitä cProfile)
+            top_n (int): Hotspot-taulukon rivit vaihetta kohden (oletus config.PROFILE_TOP_N)
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Tuntematon profilointitila: {mode}. Sallitut: {', '.join(PROFILE_MODES)}")
+        if mode == "sampling" and _sampling_profiler_class() is None:
+            print("⚠️  Näytteistävää profiloijaa (pyinstrument) ei ole asennettu - käytetään cProfilea")
+            mode = "cprofile"
+        if top_n is None:
+            import config
+            top_n = getattr(config, "PROFILE_TOP_N", 30)
+        self.output_dir = output_dir
+        self.mode = mode
+        self.top_n = top_n
+        self.pending = []
+
+    @contextlib.contextmanager
+    def profile(self, name):
+        """Profiloi with-lohkon ja tallentaa profiilin nimellä name"""
+        if self.mode == "sampling":
+            profiler = _sampling_profiler_class()()
+            profiler.start()
+            try:
+                yield
+            finally:
+                self.pending.append((name, profiler.stop()))
+                self.save()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                self.pending.append((name, profiler))
+                self.save()
+
+    def save(self, output_dir=None):
+        """Tallentaa muistissa odottavat profiilit kansioon logs/profiles"""
+        self.output_dir = output_dir or self.output_dir
+        if not self.output_dir:
+            return
+        target = profile_dir(self.output_dir)
+        os.makedirs(target, exist_ok=True)
+        for name, result in self.pending:
+            if self.mode == "sampling":
+                result.save(os.path.join(target, f"{name}.pyisession"))
+            else:
+                result.dump_stats(os.path.join(target, f"{name}.prof"))
+        self.pending = []
+
+    def write_report(self, output_dir=None, echo=True):
+        """Kokoaa hotspot-taulukon (reports/profile_hotspots.csv). Palauttaa polun tai None."""
+        self.save(output_dir)
+        if not self.output_dir:
+            return None
+        return write_hotspot_report(self.output_dir, top_n=self.top_n, echo=echo)
+
+def _cprofile_rows(stats):
+    """pstats.Stats -> rivit (function, file, line, ncalls, tottime, cumtime)"""
+    rows = []
+    for (file, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append((func, file, line, nc, tt, ct))
+    return rows
+
+def _sampling_rows(path):
+    """pyinstrument-istunto -> rivit: oma aika ja kokonaisaika funktioittain (kutsumäärää ei tiedetä)"""
+    from pyinstrument.session import Session
+    totals = {}
+    todo = [Session.load(path).root_frame()]
+    while todo:
+        frame = todo.pop()
+        if frame is None:
+            continue
+        key = (frame.function, frame.file_path, frame.line_no)
+        self_time, total_time = totals.get(key, (0.0, 0.0))
+        totals[key] = (self_time + frame.total_self_time, total_time + frame.time)
+        todo.extend(frame.children)
+    return [(func, file, line, None, tt, ct) for (func, file, line), (tt, ct) in totals.items()]
+
+def _short_path(path):
+    """Projektin tiedostot suhteellisina, muut (kirjastot) sellaisenaan"""
+    if not path or not os.path.isabs(path):
+        return path
+    rel = os.path.relpath(path)
+    return path if rel.startswith("..") else rel
+
+def _top(rows, scope, top_n):
+    rows = sorted(rows, key=lambda r: r[4], reverse=True)[:top_n]
+    result = []
+    for rank, (func, file, line, ncalls, tt, ct) in enumerate(rows, start=1):
+        result.append({
+            "scope": scope, "rank": rank, "function": func,
+            "file": _short_path(file),
+            "line": line, "ncalls": ncalls if ncalls is not None else "",
+            "tottime_s": f"{tt:.6f}", "cumtime_s": f"{ct:.6f}",
+            "percall_ms": f"{tt / ncalls * 1000:.4f}" if ncalls else "",
+        })
+    return result
+
+def write_hotspot_report(output_dir, top_n=30, echo=True):
+    """
+    Kokoaa kansion logs/profiles profiileista hotspot-taulukon.
+
+    Returns:
+        str: reports/profile_hotspots.csv -polku tai None, jos profiileja ei ole
+    """
+    prof_files = sorted(glob.glob(os.path.join(profile_dir(output_dir), "*.prof")))
+    session_files = sorted(glob.glob(os.path.join(profile_dir(output_dir), "*.pyisession")))
+    if not prof_files and not session_files:
+        return None
+    table = []
+    all_rows = {}
+    for path in prof_files + session_files:
+        scope = os.path.splitext(os.path.basename(path))[0]
+        rows = _cprofile_rows(pstats.Stats(path)) if path.endswith(".prof") else _sampling_rows(path)
+        table.extend(_top(rows, scope, top_n))
+        for func, file, line, ncalls, tt, ct in rows:
+            key = (func, file, line)
+            prev = all_rows.get(key, (func, file, line, None, 0.0, 0.0))
+            calls = (prev[3] or 0) + ncalls if ncalls is not None else prev[3]
+            all_rows[key] = (func, file, line, calls, prev[4] + tt, prev[5] + ct)
+    overall = _top(list(all_rows.values()), "ALL", top_n)
+    reports_dir = os.path.join(output_dir, "reports")
+    os.makedirs(reports_dir, exist_ok=True)
+    report_file = os.path.join(reports_dir, HOTSPOTS_FILE_NAME)
+    with open(report_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=HOTSPOT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(overall + table)
+    if echo:
+        print(f"🔥 Profiloinnin hotspotit (koko ajo, top {min(top_n, 10)} oman ajan mukaan):")
+        for row in overall[:10]:
+            print(f"   {row['tottime_s']:>10} s  {row['function']}  ({row['file']}:{row['line']})")
+        print(f"   Profiilit: {profile_dir(output_dir)}  Taulukko: {report_file}")
+    return report_file
+
+@contextlib.contextmanager
+def profile_cli(mode, name, output_dir=None):
+    """
+    test_stepN-komentorivien --profile: profiloi with-lohkon ja kirjoittaa
+    hotspot-taulukon. mode=None ei tee mitään. Jos kansio syntyy vasta lohkossa
+    (vaihe 1), aseta profiler.output_dir lohkon sisällä.
+    """
+    if not mode:
+        yield None
+        return
+    profiler = StepProfiler(output_dir, mode)
+    with profiler.profile(name):
+        yield profiler
+    profiler.write_report()
+
+def profile_context(profiler, name):
+    """with-lohko, joka profiloi vain kun profiler on annettu (muuten ei kustannusta)"""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.profile(name)
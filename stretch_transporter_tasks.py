@@ -1,89 +1,108 @@
 import pandas as pd
 import os
 import shutil
-import datetime
 import math
+import heapq
+import config
 from simulation_logger import get_logger
 import numpy as np
-import datetime
-from transporter_physics import calculate_physics_transfer_time, calculate_lift_time, calculate_sink_time
+from transporter_physics import calculate_physics_transfer_times
+from table_io import read_table, write_table
+from run_metrics import inc, observe
+from time_utils import format_seconds_hhmmss
 
-def get_program_step_info(batch, program, stage, lift_stat, program_cache, logger, production_cache=None):
+def build_program_step_index(program_cache, production_cache=None):
     """
-    Hakee ohjelma-askeleen tiedot cache:sta tai Production.csv:stä Stage 0:lle
+    Rakentaa hakuindeksin käsittelyohjelmien askelille ja Production.csv:n aloitusajoille.
+
+    steps: (batch, program, stage, lift_stat) -> (ohjelmatiedosto, rivin sijainti)
+    programs: ohjelmatiedosto -> sarakkeet numpy-taulukkoina (CalcTime valmiiksi sekunteina)
+    production_rows: batch -> rivin sijainti Production.csv:ssä
+    production_seconds: aloitusajat sekunteina (Stage 0)
+    """
+    step_index = {
+        'steps': {},
+        'programs': {},
+        'production_rows': {},
+        'production_seconds': None,
+        'production_modified': set(),
+        'programs_modified': set(),
+    }
+    for prog_filename, prog_df in program_cache.items():
+        parts = prog_filename[:-4].split('_')
+        try:
+            batch = int(parts[1])
+            program = int(parts[-1])
+        except (IndexError, ValueError):
+            continue
+        arrays = {
+            'Stage': prog_df["Stage"].astype(int).to_numpy(),
+            'MinStat': prog_df["MinStat"].astype(int).to_numpy() if "MinStat" in prog_df.columns else None,
+            'MaxStat': prog_df["MaxStat"].astype(int).to_numpy() if "MaxStat" in prog_df.columns else None,
+            'MinTime': prog_df["MinTime"].to_numpy() if "MinTime" in prog_df.columns else None,
+            'MaxTime': prog_df["MaxTime"].to_numpy() if "MaxTime" in prog_df.columns else None,
+            'CalcTime_seconds': prog_df["CalcTime_seconds"].to_numpy(dtype=float).copy(),
+        }
+        step_index['programs'][prog_filename] = arrays
+        for pos, stage in enumerate(arrays['Stage']):
+            if arrays['MinStat'] is not None and arrays['MaxStat'] is not None:
+                stations = range(arrays['MinStat'][pos], arrays['MaxStat'][pos] + 1)
+            else:
+                stations = [None]
+            for station in stations:
+                # Ensimmäinen täsmäävä rivi voittaa (kuten aiempi maskihaku .iloc[0])
+                step_index['steps'].setdefault((batch, program, int(stage), station), (prog_filename, pos))
+    if production_cache is not None:
+        for pos, batch in enumerate(production_cache["Batch"].astype(int)):
+            step_index['production_rows'].setdefault(int(batch), pos)
+        if "Start_time_seconds" in production_cache.columns:
+            step_index['production_seconds'] = production_cache["Start_time_seconds"].to_numpy(dtype=float).copy()
+        elif "Start_time" in production_cache.columns:
+            step_index['production_seconds'] = pd.to_timedelta(production_cache["Start_time"]).dt.total_seconds().to_numpy(dtype=float).copy()
+    return step_index
+
+def get_program_step_info(batch, program, stage, lift_stat, step_index):
+    """
+    Hakee ohjelma-askeleen tiedot indeksistä tai Production.csv:stä Stage 0:lle (O(1)).
     """
     info = {
         'min_stat': None, 'max_stat': None,
         'min_time': None, 'max_time': None,
-        'calc_time': None, 'exists': False
+        'calc_time': None, 'exists': False,
+        'program_file': None, 'row': None
     }
     
     # ⭐ STAGE 0: Production.csv data
     if int(stage) == 0:
-        if production_cache is not None:
-            mask = production_cache["Batch"] == batch
-            if mask.any():
-                row = production_cache.loc[mask].iloc[0]
-                info['exists'] = True
-                if "Start_time_seconds" in production_cache.columns:
-                    info['calc_time'] = int(round(row["Start_time_seconds"]))
-                    if pd.isna(info['calc_time']):
-                        if int(batch) == 2:
-                            if int(batch) == 2:
-                                print(f"DEBUG: Production.csv batch={batch} row={row.to_dict()}")
-                elif "Start_time" in production_cache.columns:
-                    info['calc_time'] = int(round(pd.to_timedelta(row["Start_time"]).total_seconds()))
-                    if pd.isna(info['calc_time']):
-                        if int(batch) == 2:
-                            if int(batch) == 2:
-                                print(f"DEBUG: Production.csv batch={batch} row={row.to_dict()}")
-                if int(batch) == 2:
-                    logger.log_optimization(f"DEBUG: Stage 0 info for Batch {batch}: calc_time={info['calc_time']}")
+        pos = step_index['production_rows'].get(int(batch))
+        if pos is not None:
+            info['exists'] = True
+            info['row'] = pos
+            seconds = step_index['production_seconds']
+            if seconds is not None and not np.isnan(seconds[pos]):
+                info['calc_time'] = int(round(seconds[pos]))
         return info
     
     # Stage 1+: käsittelyohjelma data
-    batch_str = f"{int(batch):03d}"
-    program_str = f"{int(program):03d}"
-    prog_filename = f"Batch_{batch_str}_Treatment_program_{program_str}.csv"
-    
-    if prog_filename in program_cache:
-        try:
-            prog_df = program_cache[prog_filename]
-            # Maskaa vain Stage
-            mask = (prog_df["Stage"].astype(int) == int(stage))
-            # Etsi rivit, joilla lift_stat kuuluu MinStat–MaxStat-väliin
-            valid_rows = prog_df[mask]
-            if "MinStat" in valid_rows.columns and "MaxStat" in valid_rows.columns:
-                valid_rows = valid_rows[(valid_rows["MinStat"].astype(int) <= int(lift_stat)) & (valid_rows["MaxStat"].astype(int) >= int(lift_stat))]
-            if not valid_rows.empty:
-                row = valid_rows.iloc[0]
-                info['exists'] = True
-                info['min_stat'] = int(row.get("MinStat", lift_stat))
-                info['max_stat'] = int(row.get("MaxStat", lift_stat))
-                
-                if "MinTime" in prog_df.columns:
-                    info['min_time'] = row["MinTime"]
-                if "MaxTime" in prog_df.columns:
-                    info['max_time'] = row["MaxTime"]
-                if "CalcTime_seconds" in prog_df.columns:
-                    info['calc_time'] = int(round(row["CalcTime_seconds"]))
-                elif "CalcTime" in prog_df.columns:
-                    info['calc_time'] = int(round(pd.to_timedelta(row["CalcTime"]).total_seconds()))
-                    
-            else:
-                if int(batch) == 2:
-                    logger.log_error(f"get_program_step_info: Ei täsmää yhtään riviä ohjelmassa {prog_filename} (Stage={stage}, lift_stat={lift_stat})")
-                    logger.log_error(f"  Stage-sarakkeen arvot: {prog_df['Stage'].unique()}")
-                if 'MinStat' in prog_df.columns:
-                    if int(batch) == 2:
-                        logger.log_error(f"  MinStat-sarakkeen arvot: {prog_df['MinStat'].unique()}")
-                if 'MaxStat' in prog_df.columns:
-                    if int(batch) == 2:
-                        logger.log_error(f"  MaxStat-sarakkeen arvot: {prog_df['MaxStat'].unique()}")
-    
-        except Exception as e:
-            if int(batch) == 2:
-                logger.log_error(f"Error reading program info from cache: {e}")
+    key = (int(batch), int(program), int(stage), int(lift_stat))
+    entry = step_index['steps'].get(key)
+    if entry is None:
+        entry = step_index['steps'].get((int(batch), int(program), int(stage), None))
+    if entry is not None:
+        prog_filename, pos = entry
+        arrays = step_index['programs'][prog_filename]
+        info['exists'] = True
+        info['program_file'] = prog_filename
+        info['row'] = pos
+        info['min_stat'] = int(arrays['MinStat'][pos]) if arrays['MinStat'] is not None else int(lift_stat)
+        info['max_stat'] = int(arrays['MaxStat'][pos]) if arrays['MaxStat'] is not None else int(lift_stat)
+        if arrays['MinTime'] is not None:
+            info['min_time'] = arrays['MinTime'][pos]
+        if arrays['MaxTime'] is not None:
+            info['max_time'] = arrays['MaxTime'][pos]
+        calc_seconds = arrays['CalcTime_seconds'][pos]
+        if not np.isnan(calc_seconds):
+            info['calc_time'] = int(round(calc_seconds))
     
     return info
 
@@ -99,30 +118,42 @@ def find_previous_tasks_same_batch(df, current_index, batch, max_count=2):
                 break
     return previous_tasks
 
-def calculate_physics_move_time(x1, x2, max_speed, acc_time, dec_time):
-    distance = abs(x2 - x1)
-    if distance == 0:
-        return 0.0
-    acceleration = max_speed / acc_time
-    deceleration = max_speed / dec_time
-        # POISTETTU: käytä vain transporter_physics.py:n funktioita
-
-def stretch_tasks(output_dir="output", input_file=None):
+def stretch_tasks(output_dir="output", input_file=None, tasks_df=None, fixed_point=None, max_iterations=None, ctx=None):
+    """
+    Venyttää nostintehtävät siirtovälin mukaan ja päivittää käsittelyohjelmat.
+    Jos tasks_df annetaan, käytetään muistissa olevaa tyypitettyä tehtävätaulukkoa
+    eikä _resolved-tiedostoa lueta.
+    Oletuksena tehdään yksi eteenpäin kulkeva läpikäynti. fixed_point=True toistaa
+    venytyksen worklist-periaatteella kiintopisteeseen asti kaikilla nostimilla.
+    Jos kiintopistettä ei saavuteta max_iterations kierroksessa, nostetaan
+    RuntimeError eikä tuloksia kirjoiteta. Oletukset: config.STRETCH_FIXED_POINT
+    ja config.STRETCH_MAX_ITERATIONS.
+    Jos ctx (PipelineContext) annetaan, Production, ohjelmat, asemat ja nostimet
+    luetaan siitä ja tulokset tallennetaan siihen. output_dir=None (ctx ja tasks_df
+    pakollisia) ajaa venytyksen kokonaan muistissa ilman simulaatiokansiota.
+    """
     logger = get_logger()
     if logger is None:
         raise RuntimeError("Logger is not initialized. Please initialize logger in main pipeline before calling this function.")
     logger.log("STEP", "STEP 5 STARTED: STRETCHING TASKS")
+    if fixed_point is None:
+        fixed_point = getattr(config, "STRETCH_FIXED_POINT", False)
+    if max_iterations is None:
+        max_iterations = getattr(config, "STRETCH_MAX_ITERATIONS", 100)
+    in_memory = output_dir is None
+    if in_memory:
+        if ctx is None or tasks_df is None:
+            raise ValueError("stretch_tasks ilman output_dir-kansiota vaatii ctx- ja tasks_df-parametrit")
+        output_dir = ""  # Polkuja käytetään vain tiedostonimissä, ei levyllä
     
-    # --- Käsittelyohjelmien kopiointi optimized_programs kansioon ---
+    # --- Käsittelyohjelmat luetaan original_programs-kansiosta; optimized_programs
+    # kirjoitetaan vasta, kun venytys on onnistunut ---
     orig_dir = os.path.join(output_dir, "original_programs")
     optimized_dir = os.path.join(output_dir, "optimized_programs")
-    os.makedirs(optimized_dir, exist_ok=True)
-    if os.path.exists(orig_dir):
-        for fname in os.listdir(orig_dir):
-            src = os.path.join(orig_dir, fname)
-            dst = os.path.join(optimized_dir, fname)
-            if os.path.isfile(src):
-                shutil.copy2(src, dst)
+    if in_memory:
+        program_files = sorted(name.split("/", 1)[1] for name in ctx.tables if name.startswith("original_programs/"))
+    elif os.path.exists(orig_dir):
+        program_files = sorted(fname for fname in os.listdir(orig_dir) if os.path.isfile(os.path.join(orig_dir, fname)))
     else:
         logger.log_error(f"Original programs folder not found: {orig_dir}")
         raise FileNotFoundError(f"Original programs folder not found: {orig_dir}")
@@ -133,14 +164,20 @@ def stretch_tasks(output_dir="output", input_file=None):
     
     # Lataa Production.csv
     production_file = os.path.join(output_dir, "initialization", "Production.csv")
-    if os.path.exists(production_file):
+    if ctx is not None:
+        if ctx.has("production"):
+            production_cache = ctx.get("production").copy()
+    elif os.path.exists(production_file):
         production_cache = pd.read_csv(production_file)
     
     # Lataa kaikki käsittelyohjelmat
-    for fname in os.listdir(optimized_dir):
+    for fname in program_files:
         if fname.endswith('.csv') and fname.startswith('Batch_'):
-            prog_file = os.path.join(optimized_dir, fname)
-            prog_df = pd.read_csv(prog_file)
+            prog_file = os.path.join(orig_dir, fname)
+            if ctx is not None:
+                prog_df = ctx.get(f"original_programs/{fname}").copy()
+            else:
+                prog_df = pd.read_csv(prog_file)
             # Muunna CalcTime HH:MM:SS sekunneiksi uuteen sarakkeeseen
             if "CalcTime" in prog_df.columns:
                 prog_df["CalcTime_seconds"] = pd.to_timedelta(prog_df["CalcTime"]).dt.total_seconds()
@@ -149,180 +186,238 @@ def stretch_tasks(output_dir="output", input_file=None):
             program_cache[fname] = prog_df
     
     # --- Tehtävien venytys ---
-    logs_dir = os.path.join(output_dir, "Logs")
+    logs_dir = os.path.join(output_dir, "logs")
     resolved_file = os.path.join(logs_dir, "transporter_tasks_resolved.csv")
     stretched_file = os.path.join(logs_dir, "transporter_tasks_stretched.csv")
     stations_file = os.path.join(output_dir, "initialization", "Stations.csv")
     # Kopioi resolved-listan kaikki sarakkeet ja rivit stretched-listaan
-    df = pd.read_csv(resolved_file)
-    df_stretched = df.copy(deep=True)
+    if tasks_df is not None:
+        # Muistissa oleva taulukko on jo tyypitetty yhdistetyssä vaiheessa
+        df_stretched = tasks_df.copy(deep=True)
+    else:
+        df = read_table(input_file if input_file else resolved_file)
+        df_stretched = df.copy(deep=True)
+        # Pakota kaikki ohjelma-, vaihe-, asema- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella
+        for col in ["Batch", "Treatment_program", "Stage", "Lift_stat", "Sink_stat"]:
+            if col in df_stretched.columns:
+                df_stretched[col] = df_stretched[col].astype(int)
+        for col in ["Lift_time", "Sink_time"]:
+            if col in df_stretched.columns:
+                df_stretched[col] = df_stretched[col].apply(lambda x: int(round(x)))
     # Säilytä alkuperäinen järjestys indeksiin
     df_stretched["_orig_idx"] = range(len(df_stretched))
-    # Pakota kaikki ohjelma-, vaihe-, asema- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella
-    for col in ["Batch", "Treatment_program", "Stage", "Lift_stat", "Sink_stat"]:
-        if col in df_stretched.columns:
-            df_stretched[col] = df_stretched[col].astype(int)
-    for col in ["Lift_time", "Sink_time"]:
-        if col in df_stretched.columns:
-            df_stretched[col] = df_stretched[col].apply(lambda x: int(round(x)))
-    stations_df = pd.read_csv(stations_file)
+    stations_df = ctx.get("stations").copy() if ctx is not None else pd.read_csv(stations_file)
     if 'Number' in stations_df.columns:
         stations_df['Number'] = stations_df['Number'].astype(int)
-    station_x = dict(zip(stations_df['Number'], stations_df['X Position']))
     transporters_file = os.path.join(output_dir, "initialization", "Transporters.csv")
-    transp_df = pd.read_csv(transporters_file)
-    transp = transp_df.iloc[0]
-    max_speed = float(transp.get('Max_speed (mm/s)', 1000))
-    acc_time = float(transp.get('Acceleration_time (s)', 1.0))
-    dec_time = float(transp.get('Deceleration_time (s)', 1.0))
+    transp_df = ctx.get("transporters") if ctx is not None else pd.read_csv(transporters_file)
     n = len(df_stretched)
     if 'Phase_1' not in df_stretched.columns:
         df_stretched['Phase_1'] = 0.0
-    i = 0
-    while i < n-1:
-        # Pakota kaikki ohjelma-, vaihe-, asema- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella suoraan DataFrameen
-        for col in ["Batch", "Treatment_program", "Stage", "Lift_stat", "Sink_stat"]:
-            if col in df_stretched.columns:
-                df_stretched.at[i, col] = int(df_stretched.at[i, col])
-                df_stretched.at[i+1, col] = int(df_stretched.at[i+1, col])
-        for col in ["Lift_time", "Sink_time"]:
-            if col in df_stretched.columns:
-                df_stretched.at[i, col] = int(round(df_stretched.at[i, col]))
-                df_stretched.at[i+1, col] = int(round(df_stretched.at[i+1, col]))
-        # Phase_1 lasketaan aina fysiikan mukaan, mutta venytysvaiheessa required_gap = 0 (transporter oletetaan valmiiksi nostoasemalla)
-        # Käytä vain transporter_physics.py:n funktioita
-        # Hae asema- ja nostintiedot DataFrameistä
-        sink_stat = int(df_stretched.at[i, "Sink_stat"])
-        lift_stat = int(df_stretched.at[i+1, "Lift_stat"])
-        sink_row = stations_df[stations_df['Number'] == sink_stat]
-        lift_row = stations_df[stations_df['Number'] == lift_stat]
-        transporter_id = int(df_stretched.at[i, "Transporter_id"])
-        transporter_row = transp_df[transp_df['Transporter_id'] == transporter_id]
-        if sink_row.empty or lift_row.empty or transporter_row.empty:
-            print(f"[ERROR] Puuttuva asema- tai nostintieto: sink_stat={sink_stat}, lift_stat={lift_stat}, transporter_id={transporter_id}")
-            phase_1 = None
-        else:
-            phase_1 = int(round(calculate_physics_transfer_time(sink_row.iloc[0], lift_row.iloc[0], transporter_row.iloc[0])))
-        df_stretched.at[i+1, 'Phase_1'] = phase_1
-        if phase_1 is None:
-            raise RuntimeError(f"[ERROR] Liikeaikaa ei voitu laskea riville {i+1}: sink_stat={sink_stat}, lift_stat={lift_stat}, transporter_id={transporter_id}")
-        
-        # TÄRKEÄ: Venytys tehdään VAIN jos kyse on SAMAN NOSTIMEN tehtävistä
-        # Eri nostimien tehtävät eivät vaikuta toisiinsa
-        if df_stretched.at[i, "Transporter_id"] != df_stretched.at[i+1, "Transporter_id"]:
-            shift = 0  # Ei venytystä eri nostimien välillä
-        else:
-            # Jos peräkkäiset tehtävät ovat eri erää TAI eri nostinta, nostin joutuu siirtymään: käytä Phase_1 siirtoaikana
-            if (df_stretched.at[i, "Batch"] != df_stretched.at[i+1, "Batch"] or 
-                df_stretched.at[i, "Transporter_id"] != df_stretched.at[i+1, "Transporter_id"]):
-                required_gap = phase_1
-            else:
-                required_gap = 0
-            # Siirrettävä määrä (venytys) lasketaan vain saman nostimen tehtäville
-            actual_gap = df_stretched.at[i+1, "Lift_time"] - df_stretched.at[i, "Sink_time"]
-            shift = (df_stretched.at[i, "Sink_time"] + required_gap) - df_stretched.at[i+1, "Lift_time"]
+    # Silmukka käsittelee tavallisia numpy-taulukoita; DataFrame päivitetään kerran lopuksi
+    transporter_arr = df_stretched["Transporter_id"].to_numpy(dtype=np.int64)
+    batch_arr = df_stretched["Batch"].to_numpy(dtype=np.int64)
+    program_arr = df_stretched["Treatment_program"].to_numpy(dtype=np.int64)
+    stage_arr = df_stretched["Stage"].to_numpy(dtype=np.int64)
+    lift_stat_arr = df_stretched["Lift_stat"].to_numpy(dtype=np.int64)
+    sink_stat_arr = df_stretched["Sink_stat"].to_numpy(dtype=np.int64)
+    lift_base_arr = df_stretched["Lift_time"].to_numpy(dtype=np.int64)
+    sink_base_arr = df_stretched["Sink_time"].to_numpy(dtype=np.int64)
+    phase1_arr = df_stretched["Phase_1"].to_numpy(dtype=float).copy()
+
+    # Ohjelma-askeleet haetaan indeksistä maskien sijaan
+    step_index = build_program_step_index(program_cache, production_cache)
+
+    # Asemien X-koordinaatit ja nostinrivit haetaan sanakirjasta maskien sijaan
+    station_x = stations_df.drop_duplicates('Number').set_index('Number')['X Position'].astype(float)
+    transporter_rows = {}
+    for _, row in transp_df.iterrows():
+        transporter_rows.setdefault(int(row['Transporter_id']), row)
+    missing_stations = sorted(set(lift_stat_arr) - set(station_x.index) | set(sink_stat_arr) - set(station_x.index))
+    missing_transporters = sorted(set(transporter_arr) - set(transporter_rows))
+    if missing_stations or missing_transporters:
+        print(f"[ERROR] Puuttuva asema- tai nostintieto: asemat={missing_stations}, nostimet={missing_transporters}")
+        raise RuntimeError(f"[ERROR] Liikeaikaa ei voitu laskea: puuttuvat asemat={missing_stations}, nostimet={missing_transporters}")
+    lift_x = pd.Series(lift_stat_arr).map(station_x).to_numpy(dtype=float)
+    sink_x = pd.Series(sink_stat_arr).map(station_x).to_numpy(dtype=float)
+
+    def transfer_times(from_pos, to_pos):
+        # Siirtoaika (kokonaisina sekunteina) from-tehtävän laskuasemalta to-tehtävän nostoasemalle from-tehtävän nostimella
+        result = np.zeros(len(from_pos), dtype=np.int64)
+        for tid in np.unique(transporter_arr[from_pos]):
+            sel = transporter_arr[from_pos] == tid
+            times = calculate_physics_transfer_times(sink_x[from_pos[sel]], lift_x[to_pos[sel]], transporter_rows[int(tid)])
+            result[sel] = np.rint(times).astype(np.int64)
+        return result
+
+    # Phase_1 lasketaan aina fysiikan mukaan edellisen rivin laskuasemalta nykyisen rivin nostoasemalle
+    if n > 1:
+        phase1_arr[1:] = transfer_times(np.arange(n - 1), np.arange(1, n))
+
+    # Saman nostimen edellinen ja seuraava tehtävä listajärjestyksessä
+    pred = np.full(n, -1, dtype=np.int64)
+    succ = np.full(n, -1, dtype=np.int64)
+    by_transporter = np.argsort(transporter_arr, kind='stable')
+    same = transporter_arr[by_transporter[1:]] == transporter_arr[by_transporter[:-1]]
+    pred[by_transporter[1:][same]] = by_transporter[:-1][same]
+    succ[by_transporter[:-1][same]] = by_transporter[1:][same]
+    # Vaadittu väli: eri erien välillä nostin joutuu siirtymään (Phase_1), saman erän välillä 0
+    has_pred = np.flatnonzero(pred >= 0)
+    required_gap = np.zeros(n, dtype=np.int64)
+    if len(has_pred) > 0:
+        gaps = transfer_times(pred[has_pred], has_pred)
+        required_gap[has_pred] = np.where(batch_arr[pred[has_pred]] != batch_arr[has_pred], gaps, 0)
 
-            # DEBUG: Nostin 2, erät 5,6,7 ja asemat 110-124
-            curr_transporter = int(df_stretched.at[i, "Transporter_id"])
-            curr_batch = int(df_stretched.at[i, "Batch"])
-            curr_sink_stat = int(df_stretched.at[i, "Sink_stat"])
-            next_batch = int(df_stretched.at[i+1, "Batch"])
-            next_lift_stat = int(df_stretched.at[i+1, "Lift_stat"])
+    # ⭐ Laiska eräkohtainen siirtymä: erän tehtävät järjestetään erän sisäiseen järjestykseen
+    # (rank), ja venytys lisätään erän siirtymätaulukkoon kohdasta rank alkaen. Siirtymä
+    # lisätään tehtävän aikoihin vasta luettaessa ja materialisoidaan kerran ennen tallennusta.
+    # - Oletus (yksi läpikäynti): siirto koskee erän tehtäviä listassa konfliktista eteenpäin.
+    # - fixed_point=True: siirto koskee erän vaiheita >= Stage kaikilla nostimilla. Jo venytetty
+    #   myöhempi vaihe imee siirron venytyksestään (sen nosto pysyy paikallaan), joten sama
+    #   viive ei kasaudu vaiheesta toiseen. Vaihekohtaiset venytykset kirjataan
+    #   käsittelyohjelmiin kerran, kun kiintopiste on saavutettu.
+    batch_codes, batch_idx = np.unique(batch_arr, return_inverse=True)
+    if fixed_point:
+        by_batch = np.lexsort((np.arange(n), stage_arr, batch_idx))
+    else:
+        by_batch = np.lexsort((np.arange(n), batch_idx))
+    batch_tasks = np.split(by_batch, np.flatnonzero(np.diff(batch_idx[by_batch])) + 1) if n > 0 else []
+    rank = np.zeros(n, dtype=np.int64)
+    for tasks_b in batch_tasks:
+        rank[tasks_b] = np.arange(len(tasks_b))
+    batch_offset = np.zeros((len(batch_codes), max((len(t) for t in batch_tasks), default=0)), dtype=np.int64)
+    stage_stretch = np.zeros_like(batch_offset)
+
+    def lift_time(k):
+        return lift_base_arr[k] + batch_offset[batch_idx[k], rank[k]]
+
+    def sink_time(k):
+        return sink_base_arr[k] + batch_offset[batch_idx[k], rank[k]]
+
+    def shift_stages(q, shift_ceil):
+        """
+        fixed_point: venyttää tehtävän q vaihetta ja siirtää erän myöhempiä vaiheita,
+        kunnes jo venytetyt vaiheet ovat imeneet siirron. Palauttaa siirtyneet tehtävät.
+        """
+        b = batch_idx[q]
+        tasks_b = batch_tasks[b]
+        start = int(np.searchsorted(stage_arr[tasks_b], stage_arr[q]))
+        stage_stretch[b, start] += shift_ceil
+        remaining = shift_ceil
+        segment_start = start
+        moved_end = len(tasks_b)
+        for r in list(np.flatnonzero(stage_stretch[b, start + 1:len(tasks_b)]) + start + 1) + [len(tasks_b)]:
+            batch_offset[b, segment_start:r] += remaining
+            if r == len(tasks_b):
+                break
+            absorbed = min(int(stage_stretch[b, r]), remaining)
+            stage_stretch[b, r] -= absorbed
+            remaining -= absorbed
+            segment_start = r
+            if remaining == 0:
+                moved_end = r
+                break
+        return tasks_b[start:moved_end]
+
+    def update_program(q, shift_ceil):
+        """Kasvattaa tehtävän q ohjelma-askeleen CalcTime-arvoa (Stage 0: Production.csv:n aloitusaikaa) indeksissä"""
+        task2_info = get_program_step_info(
+            batch_arr[q],
+            program_arr[q],
+            stage_arr[q],
+            lift_stat_arr[q],
+            step_index
+        )
+        if not task2_info['exists']:
+            logger.log_error(f"Ohjelma-askelta ei löydy: Batch={batch_arr[q]} Program={program_arr[q]} Stage={stage_arr[q]} Lift_stat={lift_stat_arr[q]}")
+        new_calctime = task2_info['calc_time'] + shift_ceil if task2_info['calc_time'] and not pd.isna(task2_info['calc_time']) else None
+        # Päivitä käsittelyohjelmat indeksissä (ei tallenneta vielä tiedostoon)
+        if task2_info['calc_time'] and new_calctime and not pd.isna(new_calctime):
+            if int(stage_arr[q]) == 0:
+                # Stage 0: Päivitä Production.csv:n aloitusaika
+                step_index['production_seconds'][task2_info['row']] = new_calctime
+                step_index['production_modified'].add(task2_info['row'])
+            else:
+                prog_filename = task2_info['program_file']
+                calc_seconds = step_index['programs'][prog_filename]['CalcTime_seconds']
+                old_calctime = calc_seconds[task2_info['row']]
+                # Muokkaa suoraan sekuntiarvoa
+                calc_seconds[task2_info['row']] = new_calctime
+                step_index['programs_modified'].add(prog_filename)
+                # TERMINAALITULOSTUS: Ilmoita kun venytys vaikuttaa käsittelyohjelmaan
+                print(f"[VENYTYS] Päivitetään käsittelyohjelma: {prog_filename} | Stage={stage_arr[q]} | Lift_stat={lift_stat_arr[q]} | CalcTime {old_calctime} -> {new_calctime} (shift={shift_ceil})")
 
-            # ...debug-tulostukset poistettu, ei if-haaraa...
+    # === WORKLIST: tarkistetaan tehtäväparit (pred[q], q) ===
+    # Oletus: yksi läpikäynti listajärjestyksessä. fixed_point=True: tarkistetaan nostoajan
+    # mukaisessa järjestyksessä, ja kun erää siirretään, vain siirtyneiden tehtävien seuraajat
+    # (myös muilla nostimilla ja aiemmissa sijainneissa) lisätään uudelleen tarkistettaviksi,
+    # kunnes saavutetaan kiintopiste. Kierros vaihtuu, kun sama tehtävä tarkistetaan uudelleen.
+    def worklist_key(k):
+        return (int(lift_time(k)), int(k)) if fixed_point else (int(k),)
 
-            # Yksinkertainen debug kaikille nostimen 1 tehtäville (säilytetään entisellään)
-            # Kaikki debug-tulostukset poistettu vaiheesta 5
+    worklist = [worklist_key(q) for q in has_pred]
+    heapq.heapify(worklist)
+    queued = np.zeros(n, dtype=bool)
+    queued[has_pred] = True
+    iterations = 1 if worklist else 0
+    checks = 0
+    shifts = 0
+    converged = True
+    checked_round = np.zeros(n, dtype=np.int64)
+    while worklist:
+        q = heapq.heappop(worklist)[-1]
+        queued[q] = False
+        if checked_round[q] == iterations:
+            # Tehtävä on jo tarkistettu tällä kierroksella: uusi kierros
+            iterations += 1
+            if iterations > max_iterations:
+                converged = False
+                break
+        checked_round[q] = iterations
+        checks += 1
+        # TÄRKEÄ: Venytys tehdään VAIN saman nostimen peräkkäisille tehtäville
+        shift = (sink_time(pred[q]) + required_gap[q]) - lift_time(q)
         
         # === YKSINKERTAISTETTU KONFLIKTINRATKAISU: VAIN VAIHE 1 ===
         if shift > 0:
-            # Batch 2: tulosta kun venytystarve havaitaan
-            # (poistettu print, ei toimintoa)
-            # Hae jälkimmäisen tehtävän ohjelma-askel tiedot
-            task2_info = get_program_step_info(
-                df_stretched.at[i+1, "Batch"], 
-                df_stretched.at[i+1, "Treatment_program"], 
-                df_stretched.at[i+1, "Stage"], 
-                df_stretched.at[i+1, "Lift_stat"], 
-                program_cache, logger, production_cache
-            )
-            # ...
-            # (poistettu print, ei toimintoa)
-            # VAIN VAIHE 1: Venytä jälkimmäisen tehtävän CalcTime-arvoa
+            shifts += 1
+            observe("stretch_shift_seconds", shift)
             shift_ceil = math.ceil(shift)
-            new_calctime = task2_info['calc_time'] + shift_ceil if task2_info['calc_time'] and not pd.isna(task2_info['calc_time']) else None
-            
-            # === SUORITA MUUTOKSET ===
-            
-            # 1. Päivitä KAIKKI tehtävät (alkaen konfliktista i+1)
-            batch = df_stretched.at[i+1, "Batch"]
-            # ⭐ KORJAUS: Aloita i+1:stä, ei i+2:sta!
-            for j in range(i+1, n):
-                if df_stretched.at[j, "Batch"] == batch:
-                    old_lift = df_stretched.at[j, "Lift_time"]
-                    old_sink = df_stretched.at[j, "Sink_time"]
-                    shift_int = math.ceil(shift)
-                    df_stretched.at[j, "Lift_time"] += shift_int
-                    df_stretched.at[j, "Sink_time"] += shift_int
-                    # Batch 2, stage 1: tulosta kun venytys päivitetään _stretched-tiedostoon
-                    # (poistettu print, ei toimintoa)
-                    # Debug: transporter 1 tarkka seuranta
-                    # ...
-            
-            # 2. Päivitä käsittelyohjelmat CACHE:ssa (ei tallenneta vielä tiedostoon)
-            # Tulosta käsittelyohjelman päivitys vain jos prog_filename on olemassa (eli stage != 0)
-            # Tulosta käsittelyohjelman päivitys vain jos prog_filename on olemassa (eli else-haarassa, jossa ohjelmatiedosto päivitetään)
-            # (poistettu print, ei toimintoa)
-            if task2_info['calc_time'] and new_calctime and not pd.isna(new_calctime):
-                batch = df_stretched.at[i+1, "Batch"]
-                program = df_stretched.at[i+1, "Treatment_program"]
-                stage = df_stretched.at[i+1, "Stage"]
-                lift_stat = df_stretched.at[i+1, "Lift_stat"]
-                batch_str = f"{int(batch):03d}"
-                program_str = f"{int(program):03d}"
-                prog_filename = f"Batch_{batch_str}_Treatment_program_{program_str}.csv"
-                if int(stage) == 0:
-                    # Stage 0: Päivitä Production.csv cache
-                    if production_cache is not None:
-                        mask = production_cache["Batch"] == batch
-                        if mask.any():
-                            td = datetime.timedelta(seconds=int(new_calctime))
-                            new_calctime_str = f'{int(td.total_seconds()//3600):02d}:{int((td.total_seconds()%3600)//60):02d}:{int(td.total_seconds()%60):02d}'
-                            production_cache.loc[mask, "Start_time"] = new_calctime_str
-                            production_cache.loc[mask, "Start_time_seconds"] = new_calctime
-                            # ...
-                else:
-                    if prog_filename in program_cache:
-                        prog_df = program_cache[prog_filename]
-                        mask_stage = (prog_df["Stage"].astype(int) == int(stage))
-                        mask = mask_stage
-                        mask_log = f"mask_stage: Stage=={int(stage)} => {mask_stage.sum()} matches"
-                        if "MinStat" in prog_df.columns and "MaxStat" in prog_df.columns:
-                            minstat = prog_df["MinStat"].astype(int)
-                            maxstat = prog_df["MaxStat"].astype(int)
-                            mask_stat = (minstat <= int(lift_stat)) & (int(lift_stat) <= maxstat)
-                            mask = mask & mask_stat
-                            mask_log += f", mask_stat: MinStat<={int(lift_stat)}<=MaxStat => {mask_stat.sum()} matches (MinStat={list(minstat)}, MaxStat={list(maxstat)})"
-                        # ...
-                        if mask.any():
-                            old_calctime = prog_df.loc[mask, "CalcTime_seconds"].iloc[0]
-                            # Muokkaa suoraan sekuntiarvoa
-                            program_cache[prog_filename].loc[mask, "CalcTime_seconds"] = new_calctime
-                            # TERMINAALITULOSTUS: Ilmoita kun venytys vaikuttaa käsittelyohjelmaan
-                            print(f"[VENYTYS] Päivitetään käsittelyohjelma: {prog_filename} | Stage={stage} | Lift_stat={lift_stat} | CalcTime {old_calctime} -> {new_calctime} (shift={shift_ceil})")
-                        else:
-                            logger.log_error(f"VENYTYS EI ONNISTU: {prog_filename} Stage={stage} lift_stat={lift_stat} | Ei täsmää yhtään riviä (mask.any() == False)")
-                            logger.log_error(f"  Stage-sarakkeen arvot: {prog_df['Stage'].unique()}")
-                            if 'MinStat' in prog_df.columns:
-                                logger.log_error(f"  MinStat-sarakkeen arvot: {prog_df['MinStat'].unique()}")
-                    else:
-                        logger.log_error(f"VENYTYS EI ONNISTU: Ohjelmaa {prog_filename} ei löydy cache:sta")
-        else:
-            # Ei konfliktia, ei muutoksia tarvita
-            shift = 0
-        
-    # --- ÄLÄ VAIHDA RIVIEN JÄRJESTYSTÄ! Järjestys pysyy kuten _resolved-listassa. ---
-        i += 1
+            if fixed_point:
+                # Siirtyneiden tehtävien seuraajat tarkistetaan uudelleen
+                for t in succ[shift_stages(q, shift_ceil)]:
+                    if t >= 0 and not queued[t]:
+                        queued[t] = True
+                        heapq.heappush(worklist, worklist_key(t))
+            else:
+                # Siirrä erän tehtävät konfliktista eteenpäin (laiska siirtymä) ja venytä ohjelma-askelta
+                batch_offset[batch_idx[q], rank[q]:] += shift_ceil
+                update_program(q, shift_ceil)
+
+    inc("stretch_checks_total", checks)
+    inc("stretch_shifts_total", shifts)
+    inc("stretch_iterations_total", iterations)
+    if not fixed_point:
+        logger.log("INFO", f"Venytys: yksi läpikäynti, {checks} tarkistusta, {shifts} siirtoa", value=shifts)
+    elif converged:
+        logger.log("INFO", f"Venytys konvergoi: {iterations} kierrosta, {checks} tarkistusta, {shifts} siirtoa", value=shifts)
+    else:
+        # Keskeneräistä aikataulua ei tallenneta: tulokset jäävät koskematta
+        message = f"Venytys ei konvergoinut {max_iterations} kierroksessa ({checks} tarkistusta, {shifts} siirtoa)"
+        logger.log_error(message)
+        raise RuntimeError(message)
+    if fixed_point:
+        # Kirjaa vaihekohtaiset venytykset käsittelyohjelmiin kerran
+        for b, tasks_b in enumerate(batch_tasks):
+            for r in np.flatnonzero(stage_stretch[b, :len(tasks_b)]):
+                update_program(tasks_b[r], int(stage_stretch[b, r]))
+    
+    # Materialisoi eräkohtaiset siirtymät kerran ennen tallennusta
+    if n > 0:
+        offsets = batch_offset[batch_idx, rank]
+        df_stretched["Lift_time"] = lift_base_arr + offsets
+        df_stretched["Sink_time"] = sink_base_arr + offsets
+    df_stretched["Phase_1"] = phase1_arr
     
     # ⭐ KRIITTINEN: ÄLÄ muuta _resolved-listan järjestystä! Venytys vain siirtää aikoja, ei järjestä rivejä uudelleen.
     # Järjestys säilyy täsmälleen kuten _resolved-listassa.
@@ -337,28 +432,56 @@ def stretch_tasks(output_dir="output", input_file=None):
     for col in ["Lift_time", "Sink_time"]:
         if col in df_stretched.columns:
             df_stretched[col] = df_stretched[col].apply(lambda x: int(round(x)))
-    df_stretched.to_csv(stretched_file, index=False)
+    if ctx is not None:
+        ctx.put("transporter_tasks_stretched", df_stretched)
+    else:
+        write_table(df_stretched, stretched_file)
     
-    # --- UUSI: Tallenna kaikki muokatut tiedostot cache:sta takaisin levylle ---
-    # ...
+    # --- Käsittelyohjelmien kopiointi optimized_programs kansioon ---
+    if in_memory:
+        for fname in program_files:
+            ctx.put(f"optimized_programs/{fname}", ctx.get(f"original_programs/{fname}"))
+    else:
+        os.makedirs(optimized_dir, exist_ok=True)
+        for fname in program_files:
+            src = os.path.join(orig_dir, fname)
+            dst = os.path.join(optimized_dir, fname)
+            # Kopioi vain jos kohde puuttuu tai poikkeaa alkuperäisestä (copy2 säilyttää mtime:n)
+            if os.path.isfile(dst):
+                src_stat = os.stat(src)
+                dst_stat = os.stat(dst)
+                if src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) == int(dst_stat.st_mtime):
+                    continue
+            shutil.copy2(src, dst)
+            if ctx is not None:
+                ctx.discard(f"optimized_programs/{fname}")
+
+    # --- Tallenna vain muokatut tiedostot cache:sta takaisin levylle ---
     
-    # Tallenna Production.csv jos muokattu
-    if production_cache is not None:
+    # Tallenna Production.csv vain jos muokattu
+    if production_cache is not None and step_index['production_modified']:
+        modified_rows = production_cache.index[sorted(step_index['production_modified'])]
+        modified_seconds = step_index['production_seconds'][sorted(step_index['production_modified'])]
+        production_cache.loc[modified_rows, "Start_time"] = format_seconds_hhmmss(modified_seconds).to_numpy()
+        production_cache.loc[modified_rows, "Start_time_seconds"] = modified_seconds
         production_file = os.path.join(output_dir, "initialization", "Production.csv")
-        production_cache.to_csv(production_file, index=False)
-    # ...
+        if ctx is not None:
+            ctx.put("production", production_cache)
+        else:
+            production_cache.to_csv(production_file, index=False)
     
-    # Tallenna kaikki käsittelyohjelmat
-    for prog_filename, prog_df in program_cache.items():
+    # Tallenna vain ne käsittelyohjelmat, joiden CalcTime-arvoja venytettiin
+    for prog_filename in sorted(step_index['programs_modified']):
+        prog_df = program_cache[prog_filename]
         # Konvertoi CalcTime_seconds takaisin HH:MM:SS-muotoon CalcTime-sarakkeeseen
-        if "CalcTime_seconds" in prog_df.columns:
-            prog_df["CalcTime"] = prog_df["CalcTime_seconds"].apply(
-                lambda s: f"{int(s//3600):02d}:{int((s%3600)//60):02d}:{int(s%60):02d}" if not pd.isna(s) else "00:00:00"
-            )
-            prog_df = prog_df.drop(columns=["CalcTime_seconds"])
+        prog_df["CalcTime"] = format_seconds_hhmmss(step_index['programs'][prog_filename]['CalcTime_seconds']).to_numpy()
+        prog_df = prog_df.drop(columns=["CalcTime_seconds"])
         prog_file = os.path.join(optimized_dir, prog_filename)
-        prog_df.to_csv(prog_file, index=False)
-    # ...
+        if ctx is not None:
+            ctx.put(f"optimized_programs/{prog_filename}", prog_df)
+        else:
+            prog_df.to_csv(prog_file, index=False)
+    logger.log("INFO", f"Venytys tallensi {len(step_index['programs_modified'])}/{len(program_cache)} käsittelyohjelmaa")
     
     logger.log("STEP", "STEP 5 COMPLETED: STRETCHING TASKS")
     return df_stretched
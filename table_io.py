@@ -0,0 +1,179 @@
+"""
+Välitaulukoiden luku ja kirjoitus valittavassa tiedostomuodossa.
+
+Välitaulukot (line_matrix_*, transporter_tasks_*, transporters_movement) voidaan
+kirjoittaa CSV:n sijaan sarakepohjaisena binäärinä:
+- "parquet" / "feather" (vaatii pyarrow-kirjaston)
+- "npz" (numpy, ei lisäriippuvuuksia; käytetään myös, jos pyarrow puuttuu)
+
+Muoto valitaan config.OUTPUT_FORMAT-asetuksella, ympäristömuuttujalla
+SIM_OUTPUT_FORMAT tai set_output_format()-funktiolla. Polut annetaan aina
+.csv-päätteisinä; read_table() lukee läpinäkyvästi minkä tahansa muodon
+(uusin tiedosto voittaa, jos samasta taulukosta on useita versioita).
+Muut tiedostot (Production.csv, ohjelmat, raportit) pysyvät aina CSV:nä.
+
+numpy ja pandas ladataan vasta taulukoita luettaessa tai kirjoitettaessa,
+jotta tämän moduulin import (esim. main.py --help) pysyy kevyenä.
+"""
+
+import os
+import config
+
+FORMATS = ("csv", "parquet", "feather", "npz")
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather", "npz": ".npz"}
+
+# Välitaulukot, jotka kirjoitetaan valitussa muodossa (tiedostonimen alku)
+INTERMEDIATE_PREFIXES = ("line_matrix_", "transporter_tasks_", "transporters_movement")
+
+# Sarakkeet, jotka tallennetaan binäärimuodoissa eksplisiittisesti int64:nä (jos häviötöntä)
+INT_COLUMNS = {
+    "Batch", "Program", "Treatment_program", "Stage", "Station", "MinStat", "MaxStat",
+    "Transporter", "Transporter_id", "Phase", "From_Station", "To_Station", "Movement_ID",
+    "Lift_stat", "Sink_stat", "Lift_time", "Sink_time", "Start_Time", "End_Time",
+    "EntryTime", "ExitTime", "MinTime", "MaxTime", "CalcTime",
+    "Phase_0_start", "Phase_1_start", "Phase_2_start", "Phase_3_start", "Phase_4_start", "Phase_4_stop",
+}
+
+_output_format = None
+_fallback_warned = False
+
+def get_output_format():
+    """Palauttaa käytössä olevan muodon (csv, parquet, feather tai npz)"""
+    fmt = _output_format or os.environ.get("SIM_OUTPUT_FORMAT") or getattr(config, "OUTPUT_FORMAT", "csv")
+    fmt = str(fmt).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Tuntematon tiedostomuoto '{fmt}'. Sallitut: {', '.join(FORMATS)}")
+    return fmt
+
+def set_output_format(fmt):
+    """Asettaa välitaulukoiden tiedostomuodon tälle prosessille (None = asetuksen oletus)"""
+    global _output_format
+    if fmt is not None and str(fmt).lower() not in FORMATS:
+        raise ValueError(f"Tuntematon tiedostomuoto '{fmt}'. Sallitut: {', '.join(FORMATS)}")
+    _output_format = str(fmt).lower() if fmt is not None else None
+
+def has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def is_intermediate(path):
+    """Kuuluuko tiedosto välitaulukoihin, joille tiedostomuoto valitaan"""
+    return os.path.basename(path).startswith(INTERMEDIATE_PREFIXES)
+
+def _resolve_format(fmt):
+    global _fallback_warned
+    if fmt in ("parquet", "feather") and not has_pyarrow():
+        if not _fallback_warned:
+            print(f"[VAROITUS] pyarrow puuttuu - välitaulukot tallennetaan {fmt}-muodon sijaan npz-muodossa")
+            _fallback_warned = True
+        return "npz"
+    return fmt
+
+def _base_path(path):
+    root, ext = os.path.splitext(path)
+    return root if ext in EXTENSIONS.values() else path
+
+def _with_int_dtypes(df):
+    """Muuntaa tunnetut kokonaislukusarakkeet int64:ksi, jos muunnos on häviötön"""
+    import numpy as np
+    import pandas as pd
+    out = df.copy()
+    for col in out.columns:
+        if col not in INT_COLUMNS or not pd.api.types.is_numeric_dtype(out[col]):
+            continue
+        values = out[col].to_numpy()
+        if pd.api.types.is_integer_dtype(out[col]):
+            out[col] = values.astype(np.int64)
+        elif not np.isnan(values).any() and np.array_equal(values, np.round(values)):
+            out[col] = values.astype(np.int64)
+    return out
+
+def _write_npz(df, path):
+    import numpy as np
+    import pandas as pd
+    arrays = {}
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            arrays[f"c{i}"] = series.to_numpy()
+        else:
+            # Puuttuvat arvot tallennetaan erillisenä maskina (muuten ne lukeutuisivat tekstinä "nan")
+            missing = series.isna().to_numpy()
+            if missing.any():
+                arrays[f"m{i}"] = missing
+            arrays[f"c{i}"] = series.where(~missing, "").astype(str).to_numpy(dtype=str)
+    arrays["__columns__"] = np.array([str(c) for c in df.columns], dtype=str)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+def _read_npz(path):
+    import numpy as np
+    import pandas as pd
+    with np.load(path, allow_pickle=False) as data:
+        columns = {}
+        for i, col in enumerate(data["__columns__"]):
+            values = data[f"c{i}"]
+            if f"m{i}" in data.files:
+                values = values.astype(object)
+                values[data[f"m{i}"]] = np.nan
+            columns[str(col)] = values
+        return pd.DataFrame(columns)
+
+def table_path_for(path, fmt=None):
+    """Tiedostopolku, johon taulukko kirjoitetaan annetulla (tai asetetulla) muodolla"""
+    if not is_intermediate(path):
+        return path
+    fmt = _resolve_format(fmt or get_output_format())
+    return _base_path(path) + EXTENSIONS[fmt]
+
+def write_table(df, path, fmt=None, **csv_kwargs):
+    """
+    Kirjoittaa taulukon. Välitaulukot valitussa muodossa, muut aina CSV:nä.
+    csv_kwargs (esim. float_format) koskevat vain CSV-muotoa.
+
+    Returns:
+        str: Kirjoitetun tiedoston polku
+    """
+    target = table_path_for(path, fmt)
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    ext = os.path.splitext(target)[1]
+    if ext == ".csv":
+        csv_kwargs.setdefault("index", False)
+        df.to_csv(target, **csv_kwargs)
+    elif ext == ".npz":
+        _write_npz(_with_int_dtypes(df), target)
+    elif ext == ".parquet":
+        _with_int_dtypes(df).reset_index(drop=True).to_parquet(target, index=False)
+    elif ext == ".feather":
+        _with_int_dtypes(df).reset_index(drop=True).to_feather(target)
+    return target
+
+def find_table(path):
+    """Palauttaa olemassa olevan tiedoston polun (mikä tahansa muoto, uusin ensin) tai None"""
+    base = _base_path(path)
+    candidates = [base + ext for ext in EXTENSIONS.values() if os.path.exists(base + ext)]
+    if not candidates:
+        return path if os.path.exists(path) else None
+    return max(candidates, key=os.path.getmtime)
+
+def table_exists(path):
+    """Onko taulukko olemassa jossain tuetussa muodossa"""
+    return find_table(path) is not None
+
+def read_table(path, **csv_kwargs):
+    """Lukee taulukon muodosta riippumatta (csv, parquet, feather tai npz)"""
+    found = find_table(path)
+    if found is None:
+        raise FileNotFoundError(f"Taulukkoa ei löydy: {path}")
+    import pandas as pd
+    ext = os.path.splitext(found)[1]
+    if ext == ".npz":
+        return _read_npz(found)
+    if ext == ".parquet":
+        return pd.read_parquet(found)
+    if ext == ".feather":
+        return pd.read_feather(found)
+    return pd.read_csv(found, **csv_kwargs)
@@ -19,19 +19,6 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # Tuo vain tarvittava moduuli
 from create_simulation_directory import create_simulation_directory
 
-class SimulationLogger:
-    def __init__(self, output_dir):
-        self.log_file = os.path.join(output_dir, "Logs", "simulation_log.csv")
-        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                f.write("Timestamp,Type,Description\n")
-    def log(self, log_type, description):
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(self.log_file, 'a', encoding='utf-8') as f:
-            f.write(f"{timestamp},{log_type},{description}\n")
-
 def test_step_1():
     """
     VAIHE 1: Luo simulaatiokansio ja aloita loki
@@ -53,8 +40,11 @@ def test_step_1():
 if __name__ == "__main__":
     import argparse
     import glob
+    from step_profiler import PROFILE_MODES, profile_cli
     parser = argparse.ArgumentParser(description="VAIHE 1: Luo simulaatiokansio ja kopioi Initialization")
     parser.add_argument("--output_dir", required=False, help="Simulaatiokansion polku (valinnainen, luodaan jos puuttuu)")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=PROFILE_MODES, default=None,
+                        help="Profiloi vaihe (logs/profiles, reports/profile_hotspots.csv)")
     args = parser.parse_args()
     output_dir = args.output_dir
 
@@ -71,7 +61,10 @@ if __name__ == "__main__":
             output_dir = os.path.join(script_dir, output_dir)
 
     if output_dir:
-        tulos = test_step_1()  # Luo uusi, jos output_dir puuttui
+        with profile_cli(args.profile, "setup") as profiler:
+            tulos = test_step_1()  # Luo uusi, jos output_dir puuttui
+            if profiler is not None:
+                profiler.output_dir = tulos
         if tulos:
             output_dir = tulos
     else:
@@ -20,20 +20,21 @@ import sys
 from datetime import datetime
 from generate_batch_treatment_programs_original import generate_batch_treatment_programs_original
 
-def create_original_programs(output_dir):
+def create_original_programs(output_dir, ctx=None):
     """
     Luo original_programs-kansio ja kopioi käsittelyohjelmat eräkohtaisesti Production.csv:n mukaan.
     """
-    return generate_batch_treatment_programs_original(output_dir)
+    return generate_batch_treatment_programs_original(output_dir, ctx=ctx)
 
-def test_step_2(output_dir):
+def test_step_2(output_dir, ctx=None):
     """
     VAIHE 2: Luo original_programs ja käsittelyohjelmat
+    ctx (PipelineContext) pitää luodut ohjelmat muistissa seuraaville vaiheille.
     """
     from datetime import datetime
     start = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
     print(f"[{start}] VAIHE 2 - KÄSITTELYOHJELMIEN LUONTI - ALKAA")
-    result = create_original_programs(output_dir)
+    result = create_original_programs(output_dir, ctx=ctx)
     if not result:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')}] VIRHE: Vaihe 2 epäonnistui!")
         sys.exit(1)
@@ -43,8 +44,11 @@ def test_step_2(output_dir):
 if __name__ == "__main__":
     import argparse
     import glob
+    from step_profiler import PROFILE_MODES, profile_cli
     parser = argparse.ArgumentParser(description="VAIHE 2: Luo original_programs ja käsittelyohjelmat")
     parser.add_argument("--output_dir", required=False, help="Simulaatiokansion polku")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=PROFILE_MODES, default=None,
+                        help="Profiloi vaihe (logs/profiles, reports/profile_hotspots.csv)")
     args = parser.parse_args()
     output_dir = args.output_dir
 
@@ -61,4 +65,5 @@ if __name__ == "__main__":
         if not os.path.isabs(output_dir):
             output_dir = os.path.join(script_dir, output_dir)
 
-    test_step_2(output_dir)
+    with profile_cli(args.profile, "programs", output_dir):
+        test_step_2(output_dir)
@@ -12,7 +12,6 @@ Tekee vain yhden vaiheen:
 
 import os
 import sys
-from datetime import datetime
 import pandas as pd
 from generate_matrix_original import generate_matrix_original
 from generate_transporter_tasks_original import complete_transfer_task
@@ -22,16 +21,13 @@ import argparse
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 def append_to_log(output_dir, log_type, description):
-    """Lisää merkinnän simulation_log.csv:hen"""
-    log_file = os.path.join(output_dir, "Logs", "simulation_log.csv")
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(f"{timestamp},{log_type},{description}\n")
+    """Lisää merkinnän ajon lokiin (simulation_log.csv ja events.jsonl)"""
+    from simulation_logger import init_logger
+    init_logger(output_dir).log(log_type, description)
 
 def load_stations(output_dir):
     """Lataa asemien tiedot Stations.csv:stä"""
-    file_path = os.path.join(output_dir, "Initialization", "Stations.csv")
+    file_path = os.path.join(output_dir, "initialization", "Stations.csv")
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Stations.csv ei löydy: {file_path}")
     
@@ -39,7 +35,7 @@ def load_stations(output_dir):
 
 def load_production_batches(output_dir):
     """Lataa Production.csv ja palauttaa tuotantoerien tiedot"""
-    file_path = os.path.join(output_dir, "Initialization", "Production.csv")
+    file_path = os.path.join(output_dir, "initialization", "Production.csv")
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Production.csv ei löydy: {file_path}")
     
@@ -164,9 +160,9 @@ def create_processing_matrix_for_batch(prog_df, batch_id, start_time_seconds, ou
         })    # Poistetaan Unloading-aseman (111) ylimääräinen lisäys
     return rows
 
-def generate_matrix_step3(output_dir):
+def generate_matrix_step3(output_dir, ctx=None):
     """Kutsuu generate_matrix_original.py:n matriisigeneraattoria, jotta kaikki debugit ja muutokset ovat aina mukana."""
-    return generate_matrix_original(output_dir)
+    return generate_matrix_original(output_dir, ctx=ctx)
 
 def calculate_physics_transfer_time_with_phases(from_station, to_station, stations_df):
     """Laskee siirtoajan asemien välillä fysiikkapohjaisesti ja palauttaa vaiheajat"""
@@ -203,9 +199,11 @@ def calculate_physics_transfer_time(from_station, to_station, stations_df):
     transfer_time, _ = calculate_physics_transfer_time_with_phases(from_station, to_station, stations_df)
     return transfer_time
 
-def test_step_3(output_dir):
+def test_step_3(output_dir, ctx=None):
     """
     VAIHE 3: Luo alkuperäinen line-matriisi
+
+    Jos ctx (PipelineContext) annetaan, matriisi ja päivitetty Production jäävät siihen muistiin.
     """
     from datetime import datetime
     from production_version_manager import save_production_original, save_production_after_conflicts
@@ -215,9 +213,9 @@ def test_step_3(output_dir):
     try:
         # Tarkista että tarvittavat kansiot ovat olemassa
         required_paths = [
-            os.path.join(output_dir, "Initialization"),
+            os.path.join(output_dir, "initialization"),
             os.path.join(output_dir, "original_programs"),
-            os.path.join(output_dir, "Logs")
+            os.path.join(output_dir, "logs")
         ]
         for path in required_paths:
             if not os.path.exists(path):
@@ -227,7 +225,7 @@ def test_step_3(output_dir):
         save_production_original(output_dir)
         
         # Luo line-matriisi (tämä voi muuttaa Production.csv:tä konfliktien ratkaisun vuoksi)
-        matrix = generate_matrix_step3(output_dir)
+        matrix = generate_matrix_step3(output_dir, ctx=ctx)
         
         # TALLENNA PRODUCTION.CSV ASEMAKONFLIKTIEN RATKAISUN JÄLKEEN
         save_production_after_conflicts(output_dir)
@@ -262,9 +260,9 @@ def main():
         
         # Tarkista että tarvittavat kansiot ovat olemassa
         required_paths = [
-            os.path.join(output_dir, "Initialization"),
+            os.path.join(output_dir, "initialization"),
             os.path.join(output_dir, "original_programs"),
-            os.path.join(output_dir, "Logs")
+            os.path.join(output_dir, "logs")
         ]
         
         for path in required_paths:
@@ -294,8 +292,11 @@ def main():
 if __name__ == "__main__":
     import argparse
     import glob
+    from step_profiler import PROFILE_MODES, profile_cli
     parser = argparse.ArgumentParser(description="Suorita vaihe 3: Luo line-matriisi.")
     parser.add_argument('--output_dir', type=str, required=False, help='Simulaatiokansion polku')
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=PROFILE_MODES, default=None,
+                        help="Profiloi vaihe (logs/profiles, reports/profile_hotspots.csv)")
     args = parser.parse_args()
     output_dir = args.output_dir
 
@@ -316,6 +317,7 @@ if __name__ == "__main__":
     if not os.path.exists(output_dir):
         print(f"Annettu output_dir ei ole olemassa: {output_dir}")
         sys.exit(1)
-    main()
+    with profile_cli(args.profile, "matrix_original", output_dir):
+        main()
     print("\nSeuraava vaihe: Visualisoi line-matriisi komennolla:")
     print(f"python test_step4.py --output_dir {output_dir}")
@@ -12,7 +12,6 @@ Tekee vain yhden vaiheen:
 
 import os
 import sys
-from datetime import datetime
 
 # Lisää projektin juuri Python-polkuun
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -20,27 +19,26 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # Import timeline visualization
 from visualize_original_matrix import visualize_original_matrix
 from generate_tasks import *
-from test_step1 import SimulationLogger
+from table_io import table_exists
 
 def append_to_log(output_dir, log_type, description):
-    """Lisää merkinnän simulation_log.csv:hen"""
-    log_file = os.path.join(output_dir, "Logs", "simulation_log.csv")
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(f"{timestamp},{log_type},{description}\n")
+    """Lisää merkinnän ajon lokiin (simulation_log.csv ja events.jsonl)"""
+    from simulation_logger import init_logger
+    init_logger(output_dir).log(log_type, description)
 
-def test_step_4(output_dir):
+def test_step_4(output_dir, ctx=None):
     """
     VAIHE 4: Visualisoi alkuperäinen line-matriisi timeline-muodossa
+
+    Jos ctx (PipelineContext) annetaan, matriisi luetaan siitä.
     """
     from datetime import datetime
     start = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
     print(f"[{start}] VAIHE 4 - ALKUPERÄISEN MATRIISIN VISUALISOINTI - ALKAA")
     try:
         # Tarkista että tarvittavat tiedostot löytyvät
-        matrix_file = os.path.join(output_dir, "Logs", "line_matrix_original.csv")
-        if not os.path.exists(matrix_file):
+        matrix_file = os.path.join(output_dir, "logs", "line_matrix_original.csv")
+        if ctx is None and not table_exists(matrix_file):
             error_msg = f"Original matrix file not found: {matrix_file}"
             raise FileNotFoundError(error_msg)
         
@@ -48,7 +46,7 @@ def test_step_4(output_dir):
         from simulation_logger import init_logger
         init_logger(output_dir)
         
-        visualization_file = visualize_original_matrix(output_dir)
+        visualization_file = visualize_original_matrix(output_dir, ctx=ctx)
         end = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
         print(f"[{end}] VAIHE 4 - ALKUPERÄISEN MATRIISIN VISUALISOINTI - VALMIS")
         return visualization_file
@@ -59,8 +57,11 @@ def test_step_4(output_dir):
 if __name__ == "__main__":
     import argparse
     import glob
+    from step_profiler import PROFILE_MODES, profile_cli
     parser = argparse.ArgumentParser(description="VAIHE 4: Visualisoi alkuperäinen line-matriisi")
     parser.add_argument("--output_dir", required=False, help="Simulaatiokansion polku")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=PROFILE_MODES, default=None,
+                        help="Profiloi vaihe (logs/profiles, reports/profile_hotspots.csv)")
     args = parser.parse_args()
     output_dir = args.output_dir
 
@@ -84,6 +85,7 @@ if __name__ == "__main__":
         print(f"Virhe: Annettua output_dir-kansiota ei löydy: {output_dir}")
         sys.exit(1)
 
-    test_step_4(output_dir)
+    with profile_cli(args.profile, "visualize_original", output_dir):
+        test_step_4(output_dir)
     print("\nSeuraava vaihe: Venytä tehtävät komennolla:")
     print(f"python test_step5.py --output_dir {output_dir}")
@@ -23,69 +23,63 @@ import sys
 import pandas as pd
 from datetime import datetime
 
-# Import the logger from test_step1.py
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from test_step1 import SimulationLogger
+from simulation_logger import init_logger
 from generate_tasks import *
-from stretch_transporter_tasks import stretch_tasks
-from order_tasks import order_tasks
-from resolve_station_conflicts import resolve_station_conflicts
+from process_transporter_tasks import process_transporter_tasks
+from table_io import table_exists
+from perf_spans import span
 
-def generate_transporter_tasks(output_dir):
+def generate_transporter_tasks(output_dir, debug=False, ctx=None, fixed_point=None):
     """
     Generate transporter tasks from original line matrix.
     
     Args:
         output_dir (str): Path to simulation output directory
+        debug (bool): Also write intermediate _ordered and _resolved CSVs
+        ctx (PipelineContext): Optional in-memory pipeline state shared between steps
+        fixed_point (bool): Stretch to a fixed point on all transporters (None = config.STRETCH_FIXED_POINT)
         
     Returns:
         tuple: (tasks_df, tasks_csv_path)
     """
     
-    # Initialize logger
-    logger = SimulationLogger(output_dir)
+    # Ajon loki (sama avoin loki kuin muilla vaiheilla)
+    logger = init_logger(output_dir)
     
     logger.log("TASK", "Step 5 started: Generate transporter tasks from original matrix")
     
     # Read original line matrix
-    matrix_file = os.path.join(output_dir, "Logs", "line_matrix_original.csv")
-    if not os.path.exists(matrix_file):
+    matrix_file = os.path.join(output_dir, "logs", "line_matrix_original.csv")
+    if not (ctx.has("line_matrix_original") if ctx is not None else table_exists(matrix_file)):
         error_msg = f"Original matrix file not found: {matrix_file}"
         logger.log("ERROR", error_msg)
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')}] VIRHE: {error_msg}")
         return None, None
     
     logger.log("READ", f"Reading original matrix: {os.path.basename(matrix_file)}")
-    matrix_df = pd.read_csv(matrix_file)
-    # Pakota kaikki ohjelma-, vaihe-, asema- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella
-    for col in ["Batch", "Program", "Stage", "Station"]:
-        if col in matrix_df.columns:
-            matrix_df[col] = matrix_df[col].astype(int)
-    for col in ["EntryTime", "ExitTime"]:
-        if col in matrix_df.columns:
-            matrix_df[col] = matrix_df[col].apply(lambda x: int(round(x)))
-    # Käytä generate_tasks.py:n korjattua logiikkaa
+    # Käytä generate_tasks.py:n korjattua logiikkaa (lukee matriisin itse)
     from generate_tasks import generate_tasks
-    tasks_df, _ = generate_tasks(output_dir)
+    with span("task_generation"):
+        tasks_df, _ = generate_tasks(output_dir, save_ordered=debug, ctx=ctx)
     if tasks_df is None or len(tasks_df) == 0:
         logger.log("WARNING", "No transporter tasks generated from matrix")
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')}] VIRHE: Ei nostintehtäviä generoitu!")
         return None, None
     logger.log("TASK", f"Generated {len(tasks_df)} transporter tasks from matrix")
-    tasks_csv = os.path.join(output_dir, "Logs", "transporter_tasks_raw.csv")
+    tasks_csv = os.path.join(output_dir, "logs", "transporter_tasks_raw.csv")
     logger.log("SAVE", f"Transporter tasks saved: {os.path.basename(tasks_csv)}")
-    # Järjestä tehtävät
-    order_tasks(output_dir)
-    # Ratkaise konfliktit
-    resolve_station_conflicts(output_dir)
-    # Venytys: SHIFT_GAP
-    stretch_tasks(output_dir)
+    # Järjestys, konfliktien ratkaisu ja venytys yhdellä muistissa olevalla taulukolla
+    process_transporter_tasks(output_dir, tasks_df=tasks_df, debug=debug, fixed_point=fixed_point, ctx=ctx)
     logger.log("TASK", "Step 5 completed: Transporter tasks generation successful")
     return tasks_df, tasks_csv
 
-def test_step_5(output_dir):
+def test_step_5(output_dir, debug=False, ctx=None, fixed_point=None):
     """
     VAIHE 5: Nostimien tehtävien käsittely
+    debug=True kirjoittaa myös välitiedostot _ordered ja _resolved.
+    ctx (PipelineContext) kuljettaa matriisin ja tehtävälistat muistissa.
+    fixed_point valitsee venytyksen tilan (None = config.STRETCH_FIXED_POINT).
     """
     from datetime import datetime
     start = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
@@ -95,7 +89,7 @@ def test_step_5(output_dir):
     init_logger(output_dir)
     import traceback
     try:
-        generate_transporter_tasks(output_dir)
+        generate_transporter_tasks(output_dir, debug=debug, ctx=ctx, fixed_point=fixed_point)
         end = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
         print(f"[{end}] VAIHE 5 - NOSTIMIEN TEHTÄVIEN KÄSITTELY - VALMIS")
     except Exception as e:
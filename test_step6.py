@@ -21,10 +21,12 @@ from visualize_stretched_matrix import visualize_stretched_matrix
 from simulation_logger import init_logger
 from generate_matrix_stretched import generate_matrix_stretched
 from create_sorted_line_matrix import create_sorted_line_matrix
+from table_io import table_exists
 
-def test_step_6(output_dir):
+def test_step_6(output_dir, ctx=None):
     """
     VAIHE 6: Visualisoi muokatun (venytetyn) line-matriisin timeline-muodossa
+    ctx (PipelineContext) kuljettaa matriisin ja liikkeet muistissa.
     """
     from datetime import datetime
     start = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
@@ -34,22 +36,22 @@ def test_step_6(output_dir):
     init_logger(output_dir)
     try:
         # Käytä optimoitua matriisia jos on saatavilla
-        matrix_file = os.path.join(output_dir, "Logs", "line_matrix_stretched.csv")
-        if not os.path.exists(matrix_file):
-            generate_matrix_stretched(output_dir)
+        matrix_file = os.path.join(output_dir, "logs", "line_matrix_stretched.csv")
+        if not (ctx.has("line_matrix_stretched") if ctx is not None else table_exists(matrix_file)):
+            generate_matrix_stretched(output_dir, ctx=ctx)
         
-        create_sorted_line_matrix(output_dir)
+        create_sorted_line_matrix(output_dir, ctx=ctx)
         
         # Käytä optimoituja nostinliikkeitä jos saatavilla  
-        movement_file = os.path.join(output_dir, "Logs", "transporters_movement.csv")
-        if not os.path.exists(movement_file):
+        movement_file = os.path.join(output_dir, "logs", "transporters_movement.csv")
+        if not (ctx.has("transporters_movement") if ctx is not None else table_exists(movement_file)):
             # Luo transporter_tasks_final.csv ennen liiketiedoston muodostusta
             from generate_transporter_tasks import create_transporter_tasks_final
             create_transporter_tasks_final(output_dir)
             from generate_transporters_movement import generate_transporters_movement
             generate_transporters_movement(output_dir)
         
-        vis_file = visualize_stretched_matrix(output_dir)
+        vis_file = visualize_stretched_matrix(output_dir, ctx=ctx)
         end = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
         print(f"[{end}] VAIHE 6 - MUOKATUN MATRIISIN VISUALISOINTI - VALMIS")
         return vis_file
@@ -60,8 +62,11 @@ def test_step_6(output_dir):
 if __name__ == "__main__":
     import argparse
     import glob
+    from step_profiler import PROFILE_MODES, profile_cli
     parser = argparse.ArgumentParser(description="VAIHE 6: Visualisoi venytetty line-matriisi")
     parser.add_argument("--output_dir", required=False, help="Simulaatiokansion polku")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=PROFILE_MODES, default=None,
+                        help="Profiloi vaihe (logs/profiles, reports/profile_hotspots.csv)")
     args = parser.parse_args()
     output_dir = args.output_dir
 
@@ -83,5 +88,6 @@ if __name__ == "__main__":
         # Poistettu ylimääräinen print
         sys.exit(1)
 
-    test_step_6(output_dir)
+    with profile_cli(args.profile, "visualize_stretched", output_dir):
+        test_step_6(output_dir)
     # Poistettu ylimääräiset printit
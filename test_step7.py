@@ -1,20 +1,60 @@
 import os
 import pandas as pd
+from table_io import read_table, table_exists
 
 TIME_SLICE_SECONDS = 300  # 5 min
 
-def test_step_7(output_dir):
+# Toisistaan riippumattomat raportit: nimi -> (moduuli ja funktio, virheilmoitus)
+REPORTS = {
+    "treatment_program_report": ("generate_treatment_program_report", "Virhe käsittelyohjelmien raportissa"),
+    "station_report": ("generate_station_report", "Virhe asematietojen raportissa"),
+    "transporter_report": ("generate_transporter_report", "Virhe nostinparametrien raportissa"),
+    "production_report": ("generate_production_report", "Virhe tuotannon raportissa"),
+}
+
+def generate_report(output_dir, name, raise_errors=True):
     """
-    VAIHE 7: Raporttien muodostus - kuormitusanalyysi ja kaikki raportit
+    Luo yhden raportin (REPORTS). Virhe kirjataan lokiin ja nostetaan, jotta
+    putken vaihe merkitään epäonnistuneeksi eikä sitä tallenneta välimuistiin.
+    raise_errors=False jatkaa virheen jälkeen (test_step_7).
     """
+    import importlib
     from simulation_logger import get_logger
+    module_name, error_text = REPORTS[name]
+    generator = getattr(importlib.import_module(module_name), module_name)
+    try:
+        generator(output_dir)
+    except Exception as e:
+        logger = get_logger()
+        if logger:
+            logger.log_error(f"{error_text}: {e}")
+        if raise_errors:
+            raise
+
+def test_step_7(output_dir, ctx=None):
+    """
+    VAIHE 7: Raporttien muodostus - kuormitusanalyysi ja kaikki raportit
+    ctx (PipelineContext) kuljettaa nostinliikkeet muistissa.
+    """
     from datetime import datetime
     
     start = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
     print(f"[{start}] VAIHE 7 - RAPORTTIEN MUODOSTUS - ALKAA")
+
+    generate_transporter_workload(output_dir, ctx=ctx)
+
+    # Luo kaikki muut raportit (virhe yhdessä raportissa ei estä muita)
+    for name in REPORTS:
+        generate_report(output_dir, name, raise_errors=False)
     
-    logger = get_logger()
-    
+    end = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+    print(f"[{end}] VAIHE 7 - RAPORTTIEN MUODOSTUS - VALMIS")
+
+def generate_transporter_workload(output_dir, ctx=None):
+    """
+    Nostimien kuormitusanalyysi 5 min aikaikkunoissa:
+    logs/transporters_workload.csv ja reports/transporter_workload.png
+    """
     reports_dir = os.path.join(output_dir, "reports")
     os.makedirs(reports_dir, exist_ok=True)
     logs_dir = os.path.join(output_dir, "logs")
@@ -25,7 +65,9 @@ def test_step_7(output_dir):
 
 
     # Luo esimerkkitiedosto, jos sitä ei ole olemassa
-    if not os.path.exists(movement_path):
+    if ctx is not None and ctx.has("transporters_movement"):
+        df = ctx.get("transporters_movement").copy()
+    elif not table_exists(movement_path):
         # Luo esimerkkidata: StartTime, EndTime, Phase_1, Phase_2, Phase_3, Phase_4
         example_data = [
             {"StartTime": 0, "EndTime": 120, "Phase_1": 30, "Phase_2": 30, "Phase_3": 30, "Phase_4": 30},
@@ -34,8 +76,9 @@ def test_step_7(output_dir):
         ]
         pd.DataFrame(example_data).to_csv(movement_path, index=False)
         # Poistettu ylimääräinen print
-
-    df = pd.read_csv(movement_path)
+        df = read_table(movement_path)
+    else:
+        df = read_table(movement_path)
     # Sarakkeet: Transporter,Batch,Phase,Start_Time,End_Time,From_Station,To_Station,Description,Movement_ID
     df["Start_Time"] = pd.to_numeric(df["Start_Time"], errors="coerce")
     df["End_Time"] = pd.to_numeric(df["End_Time"], errors="coerce")
@@ -83,7 +126,10 @@ def test_step_7(output_dir):
         })
 
     workload_df = pd.DataFrame(rows)
-    workload_df.to_csv(workload_path, index=False)
+    if ctx is not None:
+        ctx.put("transporters_workload", workload_df)
+    else:
+        workload_df.to_csv(workload_path, index=False)
 
     # Visualisointi: palkkikaavio
     import matplotlib.pyplot as plt
@@ -106,36 +152,3 @@ def test_step_7(output_dir):
     plot_path = os.path.join(reports_dir, "transporter_workload.png")
     plt.savefig(plot_path)
     plt.close()
-    
-    # Luo kaikki muut raportit
-    from generate_treatment_program_report import generate_treatment_program_report
-    from generate_station_report import generate_station_report
-    from generate_transporter_report import generate_transporter_report
-    from generate_production_report import generate_production_report
-    
-    try:
-        generate_treatment_program_report(output_dir)
-    except Exception as e:
-        if logger:
-            logger.log_error(f"Virhe käsittelyohjelmien raportissa: {e}")
-    
-    try:
-        generate_station_report(output_dir)
-    except Exception as e:
-        if logger:
-            logger.log_error(f"Virhe asematietojen raportissa: {e}")
-    
-    try:
-        generate_transporter_report(output_dir)
-    except Exception as e:
-        if logger:
-            logger.log_error(f"Virhe nostinparametrien raportissa: {e}")
-    
-    try:
-        generate_production_report(output_dir)
-    except Exception as e:
-        if logger:
-            logger.log_error(f"Virhe tuotannon raportissa: {e}")
-    
-    end = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-    print(f"[{end}] VAIHE 7 - RAPORTTIEN MUODOSTUS - VALMIS")
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Testaa nostimien aikajana-analyysin tarkistukset (analyze_transporter_timeline)
+"""
+import pandas as pd
+from analyze_transporter_timeline import find_movement_overlaps, find_negative_durations
+
+def movements(rows):
+    return pd.DataFrame(rows, columns=["Transporter", "Start_Time", "End_Time"])
+
+def test_nested_movement_overlaps():
+    # Pitkän liikkeen [0,100] sisään jäävät molemmat myöhemmät liikkeet
+    df = movements([(1, 0, 100), (1, 10, 20), (1, 30, 40)])
+    overlaps = find_movement_overlaps(df)
+    assert list(overlaps["Start"]) == [10, 30]
+    assert list(overlaps["Prev_End"]) == [100, 100]
+
+def test_overlaps_per_transporter():
+    # Eri nostimien liikkeet eivät ole päällekkäisiä keskenään
+    df = movements([(1, 0, 100), (2, 10, 20), (1, 100, 120), (2, 15, 30)])
+    overlaps = find_movement_overlaps(df)
+    assert list(zip(overlaps["Transporter"], overlaps["Start"])) == [(2, 15)]
+
+def test_negative_durations():
+    df = movements([(1, 0, 10), (1, 20, 15)])
+    assert list(find_negative_durations(df)["Start"]) == [20]
+
+if __name__ == "__main__":
+    test_nested_movement_overlaps()
+    test_overlaps_per_transporter()
+    test_negative_durations()
+    print("OK")
@@ -0,0 +1,16 @@
+# Aikamuunnokset, joita käsittelyohjelmien ja Production.csv:n kirjoittajat jakavat
+
+import numpy as np
+import pandas as pd
+
+def format_seconds_hhmmss(seconds):
+    """
+    Muuntaa sekunnit HH:MM:SS-merkkijonoiksi vektoroidusti (NaN -> "00:00:00").
+    """
+    secs = pd.Series(seconds, dtype=float)
+    valid = secs.notna()
+    filled = secs.fillna(0)
+    hours = (filled // 3600).astype(np.int64).astype(str).str.zfill(2)
+    minutes = ((filled % 3600) // 60).astype(np.int64).astype(str).str.zfill(2)
+    secs_part = (filled % 60).astype(np.int64).astype(str).str.zfill(2)
+    return (hours + ":" + minutes + ":" + secs_part).where(valid, "00:00:00")
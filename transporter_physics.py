@@ -1,7 +1,10 @@
 # Tämä tiedosto sisältää kaikki transporter-liikkeiden fysiikkalogiikan funktiot
 # (aiemmin hoist_physics.py)
+# Skalaarifunktiot eivät kasvata metriikkaa itse: kutsujat laskevat laskentakerrat
+# silmukassa ja kirjaavat ne kerran count_physics_evaluations-funktiolla.
 
 import numpy as np
+from run_metrics import inc
 
 def calculate_physics_transfer_time(from_station_row, to_station_row, transporter_row):
     """
@@ -61,3 +64,35 @@ def calculate_sink_time(station_row, transporter_row):
     slow_down = z_slow / z_slow_speed
     sink_time = device_delay + fast_down + slow_down
     return sink_time
+
+def count_physics_evaluations(transfer=0, lift=0, sink=0):
+    """Kirjaa skalaarifunktioiden laskentakerrat (physics_evaluations_total) lajeittain"""
+    for kind, n in (("transfer", transfer), ("lift", lift), ("sink", sink)):
+        if n:
+            inc("physics_evaluations_total", n, kind=kind)
+
+def calculate_physics_transfer_times(x_from, x_to, transporter_row):
+    """
+    Vektoroitu versio calculate_physics_transfer_time-funktiosta.
+    x_from, x_to: numpy-taulukot asemien X-koordinaateista
+    transporter_row: pandas DataFrame -rivi, jossa on transporter-parametrit
+    Palauttaa siirtoajat numpy-taulukkona (sama kaava kuin yksittäisversiossa).
+    """
+    distance = np.abs(np.asarray(x_to, dtype=float) - np.asarray(x_from, dtype=float))
+    inc("physics_evaluations_total", distance.size, kind="transfer_vectorized")
+    max_speed = float(transporter_row.get('Max_speed (mm/s)', 0))
+    acc_time = float(transporter_row.get('Acceleration_time (s)', 0))
+    dec_time = float(transporter_row.get('Deceleration_time (s)', 0))
+    if max_speed == 0 or acc_time == 0 or dec_time == 0:
+        return np.zeros_like(distance)
+    accel = max_speed / acc_time
+    decel = max_speed / dec_time
+    t_accel = max_speed / accel
+    t_decel = max_speed / decel
+    s_accel = 0.5 * accel * t_accel ** 2
+    s_decel = 0.5 * decel * t_decel ** 2
+    # Kolmion muotoinen profiili lyhyille siirroille, trapezoidinen muille
+    triangle = np.sqrt(distance / accel) + np.sqrt(distance / decel)
+    trapezoid = t_accel + (distance - s_accel - s_decel) / max_speed + t_decel
+    times = np.where(distance < s_accel + s_decel, triangle, trapezoid)
+    return np.where(distance == 0, 0.0, times)
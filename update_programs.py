@@ -1,83 +1,154 @@
 import pandas as pd
+import numpy as np
 import os
 from simulation_logger import get_logger
+from time_utils import format_seconds_hhmmss
 
-def update_programs(output_dir, adjustment_file="calc_time_adjustments.csv"):
-    """Päivittää eräkohtaiset ohjelmatiedostot calc_time_adjustments.csv:n mukaan"""
+def program_filename(batch, program):
+    """Eräkohtaisen ohjelmatiedoston nimi (esim. Batch_001_Treatment_program_001.csv)"""
+    return f"Batch_{int(batch):03d}_Treatment_program_{int(program):03d}.csv"
+
+def load_program_table(programs_dir, keys):
+    """
+    Lukee annettujen (Batch, Program) -parien ohjelmatiedostot yhdeksi taulukoksi.
+    CalcTime muunnetaan sekunneiksi. Puuttuvat tiedostot palautetaan erikseen.
+    """
+    frames = []
+    missing = []
+    for batch, program in keys:
+        path = os.path.join(programs_dir, program_filename(batch, program))
+        if not os.path.exists(path):
+            missing.append((batch, program))
+            continue
+        program_df = pd.read_csv(path)
+        program_df.insert(0, "Program", int(program))
+        program_df.insert(0, "Batch", int(batch))
+        frames.append(program_df)
+    if not frames:
+        return pd.DataFrame(columns=["Batch", "Program", "Stage", "CalcTime"]), missing
+    return pd.concat(frames, ignore_index=True), missing
+
+def apply_adjustments_df(programs_df, adjustments_df):
+    """
+    Soveltaa kaikki CalcTime-muutokset kerralla yhdistettyyn ohjelmataulukkoon.
+
+    Saman (Batch, Program, Stage) -avaimen muutokset summataan ja yhdistetään
+    ohjelmariveihin yhdellä merge-operaatiolla. Muutos sovelletaan vain, jos
+    avaimella on täsmälleen yksi ohjelmarivi (kuten aiemmin).
+
+    Args:
+        programs_df (DataFrame): Sarakkeet Batch, Program, Stage, CalcTime (sekunteina tai HH:MM:SS)
+        adjustments_df (DataFrame): Sarakkeet Batch, Program, Stage, Adjustment (sekunteina)
+
+    Returns:
+        tuple: (päivitetty ohjelmataulukko, sovelletut muutokset, hylätyt muutokset)
+    """
+    keys = ["Batch", "Program", "Stage"]
+    programs = programs_df.copy()
+    for col in keys:
+        programs[col] = programs[col].astype(int)
+    if pd.api.types.is_string_dtype(programs["CalcTime"]):
+        programs["CalcTime"] = pd.to_timedelta(programs["CalcTime"]).dt.total_seconds()
+    programs["CalcTime"] = np.rint(programs["CalcTime"].astype(float)).astype(np.int64)
+
+    adj = adjustments_df[keys + ["Adjustment"]].copy()
+    for col in keys:
+        adj[col] = adj[col].astype(int)
+    adj["Adjustment"] = np.rint(adj["Adjustment"].astype(float)).astype(np.int64)
+    adj = adj.groupby(keys, as_index=False, sort=False)["Adjustment"].sum()
+
+    # Hyväksy vain avaimet, joilla on täsmälleen yksi ohjelmarivi
+    row_counts = programs.groupby(keys).size().rename("Rows").reset_index()
+    adj = adj.merge(row_counts, on=keys, how="left")
+    valid = adj["Rows"] == 1
+    rejected = adj[~valid].drop(columns="Rows").reset_index(drop=True)
+    applied = adj[valid].drop(columns="Rows")
+
+    merged = programs.merge(applied, on=keys, how="left")
+    delta = merged["Adjustment"].fillna(0).astype(np.int64)
+    applied = applied.merge(programs[keys + ["CalcTime"]], on=keys, how="left").rename(columns={"CalcTime": "Old_CalcTime"})
+    applied["New_CalcTime"] = applied["Old_CalcTime"] + applied["Adjustment"]
+    programs["CalcTime"] = programs["CalcTime"].to_numpy() + delta.to_numpy()
+    return programs, applied.reset_index(drop=True), rejected
+
+def update_programs(output_dir, adjustment_file="calc_time_adjustments.csv", programs_df=None, adjustments_df=None, save=True):
+    """
+    Päivittää eräkohtaiset ohjelmatiedostot calc_time_adjustments.csv:n mukaan.
+
+    Kaikki muutokset sovelletaan kerralla yhdistettyyn ohjelmataulukkoon
+    (apply_adjustments_df), ja päivitetyt ohjelmat kirjoitetaan yhdellä
+    läpikäynnillä updated_programs-kansioon.
+
+    Args:
+        output_dir (str): Simulaatiokansion polku
+        adjustment_file (str): Muutostiedosto logs-kansiossa (jos adjustments_df puuttuu)
+        programs_df (DataFrame): Muistissa oleva ohjelmataulukko (Batch, Program, Stage, CalcTime, ...).
+            Jos None, ohjelmat luetaan original_programs-kansiosta.
+        adjustments_df (DataFrame): Muistissa olevat muutokset. Jos None, luetaan adjustment_file.
+        save (bool): Kirjoita päivitetyt ohjelmat updated_programs-kansioon
+
+    Returns:
+        DataFrame: Päivitetyt ohjelmat (vain muutetut erät) tai None, jos muutoksia ei ollut
+    """
     logger = get_logger()
     if logger is None:
         raise RuntimeError("Logger is not initialized. Please initialize logger in main pipeline before calling this function.")
     logger.log_phase("Updating program files started")
     print("🛠️ Päivitetään ohjelmatiedostoja...")
-    adjustment_path = os.path.join(output_dir, "logs", adjustment_file)
-    if not os.path.exists(adjustment_path):
-        logger.log_error(f"Adjustment file not found: {adjustment_file}")
-        print(f"⚠️  Ei päivityksiä tehtäväksi - tiedosto puuttuu: {adjustment_file}")
-        return
-    df = pd.read_csv(adjustment_path)
-    # Pakota kaikki ohjelma-, vaihe-, asema- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella
-    for col in ["Batch", "Program", "Stage"]:
-        if col in df.columns:
-            df[col] = df[col].astype(int)
-    for col in ["Adjustment"]:
-        if col in df.columns:
-            df[col] = df[col].apply(lambda x: int(round(x)))
-    if len(df) == 0:
+    if adjustments_df is None:
+        adjustment_path = os.path.join(output_dir, "logs", adjustment_file)
+        if not os.path.exists(adjustment_path):
+            logger.log_error(f"Adjustment file not found: {adjustment_file}")
+            print(f"⚠️  Ei päivityksiä tehtäväksi - tiedosto puuttuu: {adjustment_file}")
+            return None
+        adjustments_df = pd.read_csv(adjustment_path)
+    if len(adjustments_df) == 0:
         logger.log_phase("No CalcTime adjustments needed")
         print("✅ Ei päivityksiä tehtäväksi - ei aikamuutoksia")
-        return
-    logger.log_data(f"Processing {len(df)} CalcTime adjustments")
-    print(f"📊 Käsitellään {len(df)} CalcTime-päivitystä")
-    grouped = df.groupby(["Batch", "Program"])
-    for (batch, program), group in grouped:
-        batch_str = str(int(batch)).zfill(3)  # esim. "001"
-        source_file = f"Treatment_program_batch_{batch_str}.csv"
-        source_path = os.path.join(output_dir, "original_programs", source_file)
-        if not os.path.exists(source_path):
-            logger.log_error(f"Source program not found: {source_file}")
-            print(f"❌ Lähdeohjelmaa ei löydy: {source_file}")
-            continue
-        logger.log_data(f"Updating batch {batch} program {program} with {len(group)} adjustments")
-        print(f"   📦 Päivitetään erä {batch} ({len(group)} muutosta)")
-        program_df = pd.read_csv(source_path)
-        # Pakota kaikki ohjelma-, vaihe- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella
-        for col in ["Stage"]:
-            if col in program_df.columns:
-                program_df[col] = program_df[col].astype(int)
-        for col in ["CalcTime"]:
-            if col in program_df.columns:
-                program_df[col] = program_df[col].apply(lambda x: int(round(x)))
-        if pd.api.types.is_string_dtype(program_df["CalcTime"]):
-            program_df["CalcTime"] = pd.to_timedelta(program_df["CalcTime"]).dt.total_seconds()
-        for _, row in group.iterrows():
-            stage = int(row["Stage"])
-            add_time = int(row["Adjustment"])
-            mask = program_df["Stage"] == stage
-            if mask.sum() == 1:
-                old_time = program_df.loc[mask, "CalcTime"].iloc[0]
-                program_df.loc[mask, "CalcTime"] += add_time
-                new_time = program_df.loc[mask, "CalcTime"].iloc[0]
-                logger.log_optimization(f"Batch {batch} Program {program} Stage {stage}: {int(old_time)}s → {int(new_time)}s (+{add_time}s)")
-                print(f"      🔧 Vaihe {stage}: {int(old_time)}s → {int(new_time)}s (+{add_time}s)")
-            else:
-                logger.log_error(f"Stage {stage} not found in batch {batch} program {program}")
-                print(f"      ⚠️  Vaihe {stage} ei löytynyt erän {batch} ohjelmasta")
+        return None
+    logger.log_data(f"Processing {len(adjustments_df)} CalcTime adjustments")
+    print(f"📊 Käsitellään {len(adjustments_df)} CalcTime-päivitystä")
+
+    batch_keys = adjustments_df[["Batch", "Program"]].astype(int).drop_duplicates()
+    batch_keys = list(batch_keys.itertuples(index=False, name=None))
+    string_times = False
+    if programs_df is None:
+        programs_df, missing = load_program_table(os.path.join(output_dir, "original_programs"), batch_keys)
+        for batch, program in missing:
+            logger.log_error(f"Source program not found: {program_filename(batch, program)}")
+            print(f"❌ Lähdeohjelmaa ei löydy: {program_filename(batch, program)}")
+    else:
+        # Käsitellään vain ne erät, joihin muutoksia kohdistuu
+        wanted = pd.DataFrame(batch_keys, columns=["Batch", "Program"])
+        programs_df = programs_df.merge(wanted, on=["Batch", "Program"], how="inner")
+    if len(programs_df) > 0 and pd.api.types.is_string_dtype(programs_df["CalcTime"]):
+        string_times = True
+
+    updated, applied, rejected = apply_adjustments_df(programs_df, adjustments_df)
+
+    for row in applied.itertuples(index=False):
+        logger.log_optimization(f"Batch {row.Batch} Program {row.Program} Stage {row.Stage}: {row.Old_CalcTime}s → {row.New_CalcTime}s (+{row.Adjustment}s)")
+    present = set(zip(updated["Batch"], updated["Program"]))
+    for row in rejected.itertuples(index=False):
+        if (row.Batch, row.Program) in present:
+            logger.log_error(f"Stage {row.Stage} not found in batch {row.Batch} program {row.Program}")
+            print(f"      ⚠️  Vaihe {row.Stage} ei löytynyt erän {row.Batch} ohjelmasta")
+    print(f"   🔧 Sovellettu {len(applied)} vaihemuutosta {len(present)} erään")
+
+    if save and len(updated) > 0:
         out_dir = os.path.join(output_dir, "updated_programs")
         os.makedirs(out_dir, exist_ok=True)
-        output_file = f"Treatment_program_batch_{batch_str}_updated.csv"
-        output_path = os.path.join(out_dir, output_file)
-        # Pakota vielä ennen tallennusta kaikki ohjelma-, vaihe- ja aikakentät kokonaisluvuiksi sekuntitarkkuudella
-        for col in ["Stage"]:
-            if col in program_df.columns:
-                program_df[col] = program_df[col].astype(int)
-        for col in ["CalcTime"]:
-            if col in program_df.columns:
-                program_df[col] = program_df[col].apply(lambda x: int(round(x)))
-        program_df.to_csv(output_path, index=False)
-        logger.log_io(f"Saved updated program: {output_file}")
-        print(f"Tallennettu korjattu {output_file}")
+        to_write = updated.copy()
+        if string_times:
+            to_write["CalcTime"] = format_seconds_hhmmss(to_write["CalcTime"]).to_numpy()
+        for (batch, program), group in to_write.groupby(["Batch", "Program"], sort=True):
+            output_file = program_filename(batch, program).replace(".csv", "_updated.csv")
+            group.drop(columns=["Batch", "Program"]).to_csv(os.path.join(out_dir, output_file), index=False)
+            logger.log_io(f"Saved updated program: {output_file}")
+        print(f"Tallennettu {len(present)} korjattua ohjelmaa: {out_dir}")
     logger.log_phase("Updating program files completed")
     print("✅ Ohjelmatiedostot päivitetty!")
+    return updated
 
 # Vanha funktio yhteensopivuudelle
 def apply_adjustments(output_dir, adjustment_file="calc_time_adjustments.csv"):
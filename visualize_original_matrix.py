@@ -17,38 +17,45 @@ Date: 2025-06-21
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
 from simulation_logger import get_logger
+from table_io import read_table, table_exists
+from perf_spans import start_span
 
 
-def visualize_original_matrix(output_dir):
+def visualize_original_matrix(output_dir, ctx=None):
     """
     Visualizes original matrix as timeline showing batch movement through stations.
     
     Args:
         output_dir: Path to the simulation output directory
+        ctx: Optional PipelineContext; matrix and stations are read from it when given
         
     Returns:
         str: Path to saved visualization file
     """
+    import matplotlib.pyplot as plt
     
     logger = get_logger()
     if logger is None:
         raise RuntimeError("Logger is not initialized. Please initialize logger in main pipeline before calling this function.")
     logger.log_data("Original matrix visualization started")
     # Load required files
-    matrix_file = os.path.join(output_dir, "Logs", "line_matrix_original.csv")
-    stations_file = os.path.join(output_dir, "Initialization", "Stations.csv")
+    matrix_file = os.path.join(output_dir, "logs", "line_matrix_original.csv")
+    stations_file = os.path.join(output_dir, "initialization", "Stations.csv")
     
-    for file_path in [matrix_file, stations_file]:
-        if not os.path.exists(file_path):
-            logger.log_error(f"Required file not found: {file_path}")
-            print(f"ERROR: Required file not found: {file_path}")
-            raise FileNotFoundError(f"Required file not found: {file_path}")
-    
-    df = pd.read_csv(matrix_file)
-    stations_df = pd.read_csv(stations_file)
+    if ctx is not None:
+        df = ctx.get("line_matrix_original").copy()
+        stations_df = ctx.get("stations").copy()
+    else:
+        for file_path in [matrix_file, stations_file]:
+            if not table_exists(file_path):
+                logger.log_error(f"Required file not found: {file_path}")
+                print(f"ERROR: Required file not found: {file_path}")
+                raise FileNotFoundError(f"Required file not found: {file_path}")
+
+        df = read_table(matrix_file)
+        stations_df = pd.read_csv(stations_file)
     logger.log_data(f"Loaded original matrix: {len(df)} stages, {len(stations_df)} stations")
     
     # X-AKSELI ALKAA AINA NOLLASTA, ei pienimmästä EntryTime:sta
@@ -62,6 +69,7 @@ def visualize_original_matrix(output_dir):
     output_files = []
     
     for page in range(n_pages):
+        page_span = start_span("render_page", page=page + 1, pages=n_pages)
         # Sivut alkavat aina nollasta: 0-5400, 5400-10800, jne.
         page_start = page * PAGE_SECONDS  # 0, 5400, 10800, ...
         page_end = page_start + PAGE_SECONDS  # 5400, 10800, 16200, ...
@@ -118,10 +126,11 @@ def visualize_original_matrix(output_dir):
         # Legend poistettu käyttäjän pyynnöstä
         
         # Save chart for this page
-        output_file = os.path.join(output_dir, "Logs", f"original_matrix_timeline_page_{page+1}.png")
+        output_file = os.path.join(output_dir, "logs", f"original_matrix_timeline_page_{page+1}.png")
         plt.tight_layout()
         plt.savefig(output_file, dpi=300, bbox_inches='tight')
         plt.close(fig)
+        page_span.end()
         logger.log_viz(f"Original matrix timeline page {page+1} saved: {output_file}")
         output_files.append(output_file)
     logger.log_data("Original matrix visualization completed (paged)")
@@ -1,25 +1,31 @@
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
 from simulation_logger import get_logger
+from table_io import read_table, table_exists
+from perf_spans import start_span
 
-def visualize_stretched_matrix(output_dir):
+def visualize_stretched_matrix(output_dir, ctx=None):
+    """
+    Piirtää venytetyn matriisin ja nostinliikkeet sivuittain.
+    Jos ctx (PipelineContext) annetaan, matriisi, asemat, liikkeet ja ohjelmat luetaan siitä.
+    """
+    import matplotlib.pyplot as plt
     logger = get_logger()
     if logger is None:
         raise RuntimeError("Logger is not initialized. Please initialize logger in main pipeline before calling this function.")
     logger.log_data("Stretched matrix visualization started")
     logs_dir = os.path.join(output_dir, "logs")
-    log_file = os.path.join(logs_dir, "simulation_log.csv")
     matrix_file = os.path.join(logs_dir, "line_matrix_stretched.csv")
     stations_file = os.path.join(output_dir, "initialization", "Stations.csv")
 
-    for file_path in [matrix_file, stations_file]:
-        if not os.path.exists(file_path):
-            logger.log_error(f"Required file not found: {file_path}")
-            raise FileNotFoundError(f"Required file not found: {file_path}")
+    if ctx is None:
+        for file_path in [matrix_file, stations_file]:
+            if not table_exists(file_path):
+                logger.log_error(f"Required file not found: {file_path}")
+                raise FileNotFoundError(f"Required file not found: {file_path}")
 
     # Read data
-    df = pd.read_csv(matrix_file)
+    df = ctx.get("line_matrix_stretched").copy() if ctx is not None else read_table(matrix_file)
     # Pakota kokonaisluvut ohjelma-, vaihe- ja asemakenttiin
     for col in ["Batch", "Treatment_program", "Stage", "Station"]:
         if col in df.columns:
@@ -30,7 +36,7 @@ def visualize_stretched_matrix(output_dir):
         for time_col in ["EntryTime", "ExitTime"]:
             if time_col in df.columns:
                 df[time_col] = df[time_col] - min_time
-    stations_df = pd.read_csv(stations_file)
+    stations_df = ctx.get("stations").copy() if ctx is not None else pd.read_csv(stations_file)
     if 'Number' in stations_df.columns:
         stations_df['Number'] = stations_df['Number'].astype(int)
     logger.log_data(f"Loaded stretched matrix: {len(df)} stages, {len(stations_df)} stations")
@@ -57,21 +63,31 @@ def visualize_stretched_matrix(output_dir):
         4: '#96CEB4'   # Vihreä
     }
     output_files = []
+
+    # Nostinliikkeet luetaan kerran kaikille sivuille
+    movement_file = os.path.join(logs_dir, "transporters_movement.csv")
+    move_df = None
+    if ctx is not None and ctx.has("transporters_movement"):
+        move_df = ctx.get("transporters_movement").copy()
+    elif table_exists(movement_file):
+        move_df = read_table(movement_file)
+    if move_df is not None:
+        # Pakota kokonaisluvut
+        for col in ["Transporter", "Batch", "Phase", "Start_Time", "End_Time", "From_Station", "To_Station"]:
+            if col in move_df.columns:
+                move_df[col] = move_df[col].astype(int)
+    # Ohjelmatiedostot luetaan kerran (avain: tiedostopolku)
+    program_cache = {}
     
     for page in range(n_pages):
+        page_span = start_span("render_page", page=page + 1, pages=n_pages)
         # Sivut alkavat aina nollasta: 0-5400, 5400-10800, jne.
         page_start = page * PAGE_SECONDS  # 0, 5400, 10800, ...
         page_end = page_start + PAGE_SECONDS  # 5400, 10800, 16200, ...
         
         fig, ax = plt.subplots(figsize=(16, 10))
         # --- PIIRRETÄÄN NOSTIMEN LIIKKEET TÄMÄN SIVUN AIKAVÄLILLÄ ---
-        movement_file = os.path.join(logs_dir, "transporters_movement.csv")
-        if os.path.exists(movement_file):
-            move_df = pd.read_csv(movement_file)
-            # Pakota kokonaisluvut
-            for col in ["Transporter", "Batch", "Phase", "Start_Time", "End_Time", "From_Station", "To_Station"]:
-                if col in move_df.columns:
-                    move_df[col] = move_df[col].astype(int)
+        if move_df is not None:
             # Filter moves for this page
             move_df_page = move_df[(move_df['Start_Time'] < page_end) & (move_df['End_Time'] > page_start)]
             for _, move in move_df_page.iterrows():
@@ -156,9 +172,16 @@ def visualize_stretched_matrix(output_dir):
                     max_time_prog = None
                     calc_time_prog = None
                     try:
-                        prog_df = pd.read_csv(program_file)
-                        if 'Stage' in prog_df.columns:
-                            prog_df['Stage'] = prog_df['Stage'].astype(int)
+                        if program_file not in program_cache:
+                            program_name = os.path.relpath(program_file, output_dir).replace(os.sep, "/")
+                            if ctx is not None and ctx.has(program_name):
+                                prog_df = ctx.get(program_name).copy()
+                            else:
+                                prog_df = pd.read_csv(program_file)
+                            if 'Stage' in prog_df.columns:
+                                prog_df['Stage'] = prog_df['Stage'].astype(int)
+                            program_cache[program_file] = prog_df
+                        prog_df = program_cache[program_file]
                         stage_row = prog_df[prog_df['Stage'] == stage_int]
                         if not stage_row.empty:
                             min_time_prog = int(round(pd.to_timedelta(stage_row.iloc[0]['MinTime']).total_seconds()))
@@ -237,6 +260,7 @@ def visualize_stretched_matrix(output_dir):
         plt.tight_layout()
         plt.savefig(output_file, dpi=300, bbox_inches='tight')
         plt.close(fig)
+        page_span.end()
         logger.log_viz(f"Stretched matrix timeline page {page+1} saved: {output_file}")
         output_files.append(output_file)
     logger.log_data("Stretched matrix visualization completed (paged)")